@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Synthetic `pdftotext -layout` page streams for the pipeline benchmarks.
+
+The fixtures are rendered from the committed extraction outputs
+(cartilla_medica/output/cartilla_medica.json and
+berlin_photo_guide/output/places.json) in the layout the parsers expect, and
+replicated `scale` times. Each copy gets distinct names, street numbers, place
+numbers and slightly shifted coordinates so no stage sees the same record
+twice, while the mix of record shapes (wrapped addresses, section headings,
+two-column blocks, ...) stays that of the real documents.
+
+    python benchmarks/fixtures.py --scale 100 --out /tmp/fixtures
+
+writes cartilla_x100.txt and berlin_x100.txt with pages separated by form
+feeds, exactly as `pdftotext -layout` would.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CARTILLA_JSON = ROOT / "cartilla_medica" / "output" / "cartilla_medica.json"
+BERLIN_JSON = ROOT / "berlin_photo_guide" / "output" / "places.json"
+
+# Berlin guide: pages before the first place, and the column the right-hand block starts at.
+BERLIN_INTRO_PAGES = 21
+BERLIN_LEFT_WIDTH = 40
+BERLIN_TWO_COLUMN = [
+    ("Hours", "Gear", "hours", "gear"),
+    ("Best time to visit", "Settings", "best_time_to_visit", "settings"),
+    ("Entry Fee", "Tripod", "entry_fee", "tripod"),
+]
+CARTILLA_ADDRESS_WIDTH = 40
+
+FIRST_NUMBER = re.compile(r"\d+")
+
+
+def load_json(path: Path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _shift_number(text: str, copy: int) -> str:
+    return FIRST_NUMBER.sub(lambda m: str(int(m.group()) + copy), text, count=1)
+
+
+# Cartilla médica -----------------------------------------------------------
+
+
+def scaled_providers(document: dict, scale: int) -> list[dict]:
+    """The document's providers repeated `scale` times, each copy made distinct."""
+    providers = document.get("providers", [])
+    pages_per_copy = max((p.get("source_page") or 1 for p in providers), default=1)
+    scaled = []
+    for copy in range(scale):
+        for provider in providers:
+            scaled.append(
+                {
+                    **provider,
+                    "name": f"{provider['name']} {copy}" if copy else provider["name"],
+                    "address": _shift_number(provider.get("address") or "", copy),
+                    "source_page": (provider.get("source_page") or 1) + copy * pages_per_copy,
+                }
+            )
+    return scaled
+
+
+def _wrap_address(address: str) -> list[str]:
+    if len(address) <= CARTILLA_ADDRESS_WIDTH:
+        return [address]
+    cut = address.rfind(" ", 0, CARTILLA_ADDRESS_WIDTH)
+    if cut <= 0:
+        return [address]
+    return [address[:cut], address[cut + 1 :]]
+
+
+def cartilla_pages(providers: list[dict], patient: str | None = "PACIENTE DE PRUEBA") -> list[str]:
+    """Render providers as cartilla pages: section headings, Nombre/Dirección/Teléfono blocks, page footers."""
+    lines_by_page: dict[int, list[str]] = {}
+    section = None
+    for provider in providers:
+        lines = lines_by_page.setdefault(provider["source_page"], [])
+        key = (provider.get("specialty"), provider.get("location"))
+        if key != section:
+            section = key
+            heading = f"  {key[0]}"
+            if key[1]:
+                heading += f"                       {key[1]}"
+            lines.append(heading)
+        lines.append(f"    Nombre: {provider['name']}")
+        address = _wrap_address(provider.get("address") or "")
+        lines.append(f"    Dirección: {address[0]}")
+        lines.extend(f"               {rest}" for rest in address[1:])
+        lines.append(f"    Teléfono: {provider.get('phone') or '-'}")
+        lines.append("")
+
+    header = ["      Cartilla médica", ""]
+    if patient:
+        header += [f"    {patient}", "    Afiliado: 000000000000", "   Resultados", ""]
+    pages = []
+    for page_number in range(1, max(lines_by_page, default=0) + 1):
+        lines = lines_by_page.get(page_number, [])
+        if page_number == 1:
+            lines = header + lines
+        pages.append("\n".join(lines + ["", f"                                 Pág. {page_number}"]) + "\n")
+    return pages
+
+
+# Berlin photo guide -------------------------------------------------------
+
+
+def scaled_places(places: list[dict], scale: int) -> list[dict]:
+    scaled = []
+    for copy in range(scale):
+        for place in places:
+            lat, lng = place["coordinates"]["lat"], place["coordinates"]["lng"]
+            shift = copy * 0.0001
+            scaled.append(
+                {
+                    **place,
+                    "place_number": place["place_number"] + copy * len(places),
+                    "title_lines": (
+                        [f"{place['title_lines'][0]} {copy}", *place["title_lines"][1:]]
+                        if copy
+                        else place["title_lines"]
+                    ),
+                    "coordinates_raw": f"{lat + shift:.6f}, {lng + shift:.6f}",
+                }
+            )
+    return scaled
+
+
+def _two_columns(left: list[str], right: list[str]) -> list[str]:
+    rows = []
+    for row in range(max(len(left), len(right))):
+        a = left[row] if row < len(left) else ""
+        b = right[row] if row < len(right) else ""
+        rows.append(f"    {a.ljust(BERLIN_LEFT_WIDTH)}  {b}" if b else f"    {a}")
+    return rows
+
+
+def berlin_pages(places: list[dict]) -> list[str]:
+    """Render places as guide pages: intro pages, then a location page and a detail page per place."""
+    pages = [
+        f"\n    Berlin Photo Guide\n\n    Intro page {n}\n    Some text about photography in Berlin.\n"
+        for n in range(1, BERLIN_INTRO_PAGES + 1)
+    ]
+    for place in places:
+        lines = ["", f"    {place['place_number']}", *(f"    {t}" for t in place["title_lines"]), ""]
+        location = place.get("location_lines") or []
+        lines.append(f"    Location        {location[0]}" if location else "    Location")
+        lines.extend(f"                    {line}" for line in location[1:])
+        lines.append("                    Click to open in Google Maps")
+        lines.append(f"    Coordinates     {place['coordinates_raw']}")
+        lines.append(f"    Accessibility   {place.get('accessibility') or ''}")
+        pages.append("\n".join(lines) + "\n")
+
+        detail = [""]
+        for left_heading, right_heading, left_key, right_key in BERLIN_TWO_COLUMN:
+            detail.append(f"    {left_heading.ljust(BERLIN_LEFT_WIDTH)}  {right_heading}")
+            detail.extend(_two_columns(place.get(left_key) or [], place.get(right_key) or []))
+            detail.append("")
+        detail.append("    Tips & additional information")
+        detail.extend(f"    {tip}" for tip in place.get("tips") or [])
+        pages.append("\n".join(detail) + "\n")
+    return pages
+
+
+def write_stream(path: Path, pages: list[str]) -> None:
+    path.write_text("".join(page + "\f" for page in pages), encoding="utf-8")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Write synthetic pdftotext -layout streams for benchmarking.")
+    parser.add_argument("--scale", type=int, default=10, help="Copies of the current documents")
+    parser.add_argument("--out", default=".", help="Output directory")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    document = load_json(CARTILLA_JSON)
+    cartilla_path = out_dir / f"cartilla_x{args.scale}.txt"
+    patient = (document.get("patient") or {}).get("display_name")
+    write_stream(cartilla_path, cartilla_pages(scaled_providers(document, args.scale), patient))
+    berlin_path = out_dir / f"berlin_x{args.scale}.txt"
+    write_stream(berlin_path, berlin_pages(scaled_places(load_json(BERLIN_JSON), args.scale)))
+    for path in (cartilla_path, berlin_path):
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Time each parsing stage of the three pipeline scripts on synthetic fixtures.
+
+Every stage runs in-process on pages from `fixtures.py`, so pdftotext, pdfinfo
+and the network are out of the picture and only the Python parsing code is
+measured:
+
+    cartilla.classify_page          classify_page() over every page
+    cartilla.parse                  CartillaParser.parse(), i.e. parse_document minus pdftotext
+    berlin.parse_location_page      parse_place_tokens() on pre-tokenized place pages
+    berlin.parse_places_from_pages  page tokenizing and pagination plus parse_place_tokens()
+    geocode.normalize_address       normalize_address() on every provider address
+    geocode.build_query_variants    build_query_variants() for every provider
+    geocode.group_by_address        group_pending(), the geocode queue's address grouping
+
+Each stage is timed `--repeat` times (best run kept), then run once more under
+tracemalloc for its peak allocation. Stage outputs are counted, not kept, so
+the peak is the stage's own working set rather than the size of its result.
+Results are appended as JSON lines, tagged with the git commit, to
+benchmarks/results.jsonl; `--compare REV` prints the ratio against the latest
+results recorded for another commit. Results only exist for commits that
+contain this suite (cfa5a91 and later), recorded by checking the commit out
+and running it there, so comparisons only work between such commits.
+
+    python benchmarks/run_benchmarks.py                       # 10x and 100x
+    python benchmarks/run_benchmarks.py --scales 1000 --repeat 1
+    python benchmarks/run_benchmarks.py --stages cartilla --compare cfa5a91
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path[:0] = [str(ROOT / "cartilla_medica" / "scripts"), str(ROOT / "berlin_photo_guide" / "scripts")]
+
+import fixtures  # noqa: E402
+from extract_cartilla_medica import CartillaParser, classify_page  # noqa: E402
+from extract_places import iter_place_pages, parse_place_tokens, parse_places_from_pages  # noqa: E402
+from geocode_cartilla_medica import build_query_variants, group_pending, normalize_address  # noqa: E402
+
+RESULTS_PATH = BENCH_DIR / "results.jsonl"
+
+
+class Fixtures:
+    """Synthetic inputs for one scale, generated on first use."""
+
+    def __init__(self, scale: int) -> None:
+        self.scale = scale
+        self._cache: dict[str, object] = {}
+
+    def _get(self, name, factory):
+        if name not in self._cache:
+            self._cache[name] = factory()
+        return self._cache[name]
+
+    @property
+    def providers(self) -> list[dict]:
+        return self._get(
+            "providers", lambda: fixtures.scaled_providers(fixtures.load_json(fixtures.CARTILLA_JSON), self.scale)
+        )
+
+    @property
+    def cartilla_pages(self) -> list[str]:
+        return self._get("cartilla_pages", lambda: fixtures.cartilla_pages(self.providers))
+
+    @property
+    def berlin_pages(self) -> list[str]:
+        return self._get(
+            "berlin_pages",
+            lambda: fixtures.berlin_pages(fixtures.scaled_places(fixtures.load_json(fixtures.BERLIN_JSON), self.scale)),
+        )
+
+    @property
+    def berlin_place_pages(self) -> list[tuple]:
+        return self._get("berlin_place_pages", lambda: list(iter_place_pages(self.berlin_pages)))
+
+
+def text_bytes(pages: list[str]) -> int:
+    return sum(len(page.encode("utf-8")) for page in pages)
+
+
+# Each stage returns (func, input_bytes, unit); func() returns the number of units processed.
+
+
+def stage_cartilla_classify(data: Fixtures):
+    pages = data.cartilla_pages
+
+    def run():
+        for page_number, page in enumerate(pages, 1):
+            classify_page(page_number, page)
+        return len(pages)
+
+    return run, text_bytes(pages), "pages"
+
+
+def stage_cartilla_parse(data: Fixtures):
+    pages = data.cartilla_pages
+    return lambda: sum(1 for _ in CartillaParser().parse(pages)), text_bytes(pages), "providers"
+
+
+def stage_berlin_location_page(data: Fixtures):
+    place_pages = data.berlin_place_pages
+
+    def run():
+        return sum(1 for pdf_page, detail, tokens, _ in place_pages if parse_place_tokens(tokens, pdf_page, detail))
+
+    input_bytes = sum(len(token[2].encode("utf-8")) for _, _, tokens, _ in place_pages for token in tokens)
+    return run, input_bytes, "places"
+
+
+def stage_berlin_places(data: Fixtures):
+    pages = data.berlin_pages
+    return lambda: len(parse_places_from_pages(pages)), text_bytes(pages), "places"
+
+
+def provider_text_bytes(providers: list[dict], *fields: str) -> int:
+    return sum(len((p.get(field) or "").encode("utf-8")) for p in providers for field in fields)
+
+
+def stage_normalize_address(data: Fixtures):
+    addresses = [p.get("address") for p in data.providers]
+
+    def run():
+        for address in addresses:
+            normalize_address(address)
+        return len(addresses)
+
+    return run, provider_text_bytes(data.providers, "address"), "addresses"
+
+
+def stage_query_variants(data: Fixtures):
+    providers = data.providers
+
+    def run():
+        for provider in providers:
+            build_query_variants(provider)
+        return len(providers)
+
+    return run, provider_text_bytes(providers, "address", "location"), "providers"
+
+
+def stage_group_by_address(data: Fixtures):
+    providers = data.providers
+
+    def run():
+        group_pending(providers, range(len(providers)))
+        return len(providers)
+
+    return run, provider_text_bytes(providers, "address", "location"), "providers"
+
+
+STAGES = {
+    "cartilla.classify_page": stage_cartilla_classify,
+    "cartilla.parse": stage_cartilla_parse,
+    "berlin.parse_location_page": stage_berlin_location_page,
+    "berlin.parse_places_from_pages": stage_berlin_places,
+    "geocode.normalize_address": stage_normalize_address,
+    "geocode.build_query_variants": stage_query_variants,
+    "geocode.group_by_address": stage_group_by_address,
+}
+
+
+def measure(func, repeat: int) -> tuple[float, int, int]:
+    """Best wall time over `repeat` runs, units processed, and peak traced bytes of one more run."""
+    best = float("inf")
+    units = 0
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        units = func()
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, units, peak
+
+
+def git_revision() -> tuple[str, bool]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def load_results(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline_for(results: list[dict], revision: str) -> dict[tuple[str, int], dict]:
+    """Latest recorded result per (stage, scale) for a commit (prefix match)."""
+    baseline = {}
+    for row in results:
+        if row["commit"].startswith(revision) or revision.startswith(row["commit"]):
+            baseline[(row["stage"], row["scale"])] = row
+    return baseline
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline parsing stages on synthetic fixtures.")
+    parser.add_argument("--scales", default="10,100", help="Comma-separated fixture scales, e.g. 10,100,1000")
+    parser.add_argument(
+        "--stages", default="", help="Comma-separated stage names or prefixes (default: all), e.g. cartilla,geocode"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best is recorded")
+    parser.add_argument("--results", default=str(RESULTS_PATH), help="JSON lines file to append results to")
+    parser.add_argument("--no-save", action="store_true", help="Print results without recording them")
+    parser.add_argument("--compare", metavar="REV", help="Compare against the latest results recorded for this commit")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    wanted = [s.strip() for s in args.stages.split(",") if s.strip()]
+    stages = [name for name in STAGES if not wanted or any(name.startswith(w) for w in wanted)]
+    if not stages:
+        parser.error(f"No stage matches {args.stages!r}; choose from {', '.join(STAGES)}")
+
+    results_path = Path(args.results)
+    baseline = baseline_for(load_results(results_path), args.compare) if args.compare else {}
+    if args.compare and not baseline:
+        print(
+            f"No recorded results for {args.compare} in {results_path}; run the suite at that commit first "
+            "(only commits that contain it, cfa5a91 or later, can be compared)"
+        )
+
+    commit, dirty = git_revision()
+    timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    rows = []
+    print(f"{'stage':32} {'scale':>6} {'units':>9} {'seconds':>9} {'units/s':>11} {'MB/s':>8} {'peak MB':>8}")
+    for scale in scales:
+        data = Fixtures(scale)
+        for name in stages:
+            func, input_bytes, unit = STAGES[name](data)
+            seconds, units, peak = measure(func, args.repeat)
+            row = {
+                "commit": commit,
+                "dirty": dirty,
+                "timestamp": timestamp,
+                "python": platform.python_version(),
+                "stage": name,
+                "scale": scale,
+                "unit": unit,
+                "units": units,
+                "input_bytes": input_bytes,
+                "seconds": round(seconds, 6),
+                "units_per_s": round(units / seconds, 1) if seconds else None,
+                "mb_per_s": round(input_bytes / 1e6 / seconds, 3) if seconds else None,
+                "peak_bytes": peak,
+            }
+            rows.append(row)
+            line = (
+                f"{name:32} {scale:>5}x {units:>9} {seconds:>9.3f} {row['units_per_s']:>11,.0f} "
+                f"{row['mb_per_s']:>8.2f} {peak / 1e6:>8.2f}"
+            )
+            previous = baseline.get((name, scale))
+            if previous:
+                speedup = previous["seconds"] / seconds
+                memory = peak / max(1, previous["peak_bytes"])
+                line += f"   {speedup:5.2f}x speed, {memory:5.2f}x memory vs {previous['commit']}"
+            print(line, flush=True)
+        del data
+
+    if not args.no_save:
+        with results_path.open("a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        print(f"Appended {len(rows)} results for {commit}{' (dirty)' if dirty else ''} to {results_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Time the photo-tour planner against the number of candidate places.
+
+Synthetic cartillas of places are drawn from places.json: each point copies
+the hours and best-time hints of a random real place and is moved a random
+few kilometres (normal, `--spread` km) from it, so windows and density stay
+realistic as the count grows. For every count this reports the time to build
+the windows, the travel matrix, the nearest-neighbour tour and the full solve
+(2-opt, Or-opt and insertion), with the resulting stops and travel distance.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date as Date
+from pathlib import Path
+
+import numpy as np
+
+from plan_photo_tour import TourSolver, place_windows, plan_day, sun_times, travel_matrix
+
+
+def synthetic_places(places, count, spread_km, rng):
+    located = [place for place in places if (place.get("coordinates") or {}).get("lat")]
+    if count <= len(located):
+        return located[:count]
+    result = list(located)
+    for _ in range(count - len(located)):
+        source = rng.choice(located)
+        lat = source["coordinates"]["lat"] + rng.gauss(0, spread_km / 111.0)
+        lng = source["coordinates"]["lng"] + rng.gauss(0, spread_km / 68.0)
+        result.append({**source, "coordinates": {"lat": lat, "lng": lng}})
+    return result
+
+
+def check_unreachable_places():
+    """Places that cannot be shot that day must leave an empty tour, not a solver stuck inserting them."""
+    closed = {"title": "Closed", "coordinates": {"lat": 52.52, "lng": 13.405}, "hours": ["Saturday closed"]}
+    morning = {**closed, "title": "Morning only", "hours": ["Saturday 6am - 7am"]}
+    saturday = Date(2026, 6, 20)
+    tour = plan_day([(1, closed)], saturday)
+    assert not tour["stops"] and [s["reason"] for s in tour["skipped"]] == ["closed"], tour
+    tour = plan_day([(1, closed), (2, morning)], saturday, span=(10 * 60, 18 * 60))
+    assert not tour["stops"] and len(tour["skipped"]) == 2, tour
+
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+
+def main():
+    default_places = Path(__file__).resolve().parent.parent / "output" / "places.json"
+    parser = argparse.ArgumentParser(description="Benchmark plan_photo_tour.py solve time against place count.")
+    parser.add_argument("places", nargs="?", default=str(default_places), help="places.json from extract_places.py")
+    parser.add_argument("--counts", default="111,250,500,1000,2000,4000", help="Comma-separated place counts")
+    parser.add_argument("--date", default="2026-06-20", help="Shoot date, YYYY-MM-DD")
+    parser.add_argument("--dwell", type=float, default=20, help="Minutes spent at each place")
+    parser.add_argument("--speed-kmh", type=float, default=12)
+    parser.add_argument("--spread", type=float, default=2.0, help="Jitter around real places, in km")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check_unreachable_places()
+    places = json.loads(Path(args.places).read_text(encoding="utf-8"))
+    day = Date.fromisoformat(args.date)
+    sunrise, sunset = sun_times(day, 52.52, 13.405, "Europe/Berlin")
+    span = (sunrise - 45, sunset + 45)
+    minutes_per_metre = 1.3 / (args.speed_kmh * 1000 / 60)
+
+    print(
+        f"{'places':>7s} {'windows':>9s} {'matrix':>9s} {'nn':>9s} {'solve':>9s} "
+        f"{'stops':>6s} {'km':>7s} {'checks':>7s}"
+    )
+    for count in (int(value) for value in args.counts.split(",")):
+        sample = synthetic_places(places, count, args.spread, random.Random(args.seed))
+        windows, windows_s = timed(
+            lambda: [place_windows(p, day, sunrise, sunset, span, args.dwell)[0] for p in sample]
+        )
+        lat = [p["coordinates"]["lat"] for p in sample]
+        lng = [p["coordinates"]["lng"] for p in sample]
+        travel, matrix_s = timed(lambda: travel_matrix(lat, lng, minutes_per_metre))
+        _, nn_s = timed(lambda: TourSolver(travel, windows, args.dwell, span[0]).nearest_neighbour())
+        solver = TourSolver(travel, windows, args.dwell, span[0])
+        route, solve_s = timed(solver.solve)
+        km = float(travel[np.asarray(route[1:-2]), np.asarray(route[2:-1])].sum()) / minutes_per_metre / 1000
+        print(
+            f"{count:7d} {windows_s * 1000:7.1f}ms {matrix_s * 1000:7.1f}ms {nn_s * 1000:7.1f}ms "
+            f"{solve_s * 1000:7.1f}ms {len(route) - 2:6d} {km:7.1f} {solver.checks:7d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Build responsive width/format variants of the place images.
+
+Runs after extract_places.py's image step. For every image referenced by
+places.json it writes resized copies into images/variants/ and records them on
+the place as `image_variants` ({image path: [{path, width, format, bytes}]}),
+so the web app can use thumbnails in lists and tooltips and only load the
+full-size file on demand. Variant names carry a hash of the source's path, so
+sources that share a file name (a.jpg and a.png, or two directories' a.jpg)
+do not overwrite each other's variants. Sources whose content hash and options
+are unchanged since the last run are skipped; variants of sources that are no
+longer referenced, or that were rebuilt under other options, are deleted.
+
+Requires Pillow (pip install Pillow); AVIF output needs a Pillow build with
+AVIF support.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+FORMATS = {
+    "avif": ("AVIF", ".avif"),
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def place_image_paths(place):
+    paths = []
+    if isinstance(place.get("images"), list):
+        paths.extend(place["images"])
+    for key in ("image_path", "image"):
+        if place.get(key):
+            paths.append(place[key])
+            break
+    return list(dict.fromkeys(paths))
+
+
+def resolve_image(root, image_path):
+    path = root / image_path
+    if path.exists():
+        return path
+    # extract_places.py stores a bare file name in "image" and the relative path in "image_path".
+    fallback = root / "images" / image_path
+    return fallback if fallback.exists() else None
+
+
+def target_widths(source_width, widths):
+    chosen = [w for w in widths if w < source_width]
+    # Never upscale; a source smaller than every tier gets one variant at its own width.
+    return chosen or [source_width]
+
+
+def variant_stem(root, src_path):
+    """`<source stem>-<hash of the source path relative to root>`, unique per source file."""
+    rel_path = os.path.relpath(src_path, root).replace(os.sep, "/")
+    return f"{src_path.stem}-{hashlib.sha256(rel_path.encode('utf-8')).hexdigest()[:8]}"
+
+
+def build_variants(src_path, stem, rel_prefix, variants_dir, widths, formats, quality):
+    from PIL import Image, ImageOps
+
+    results = []
+    with Image.open(src_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width in target_widths(image.width, widths):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                pil_format, suffix = FORMATS[fmt]
+                frame = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+                name = f"{stem}-{width}w{suffix}"
+                dest = variants_dir / name
+                tmp = dest.with_name(dest.name + ".tmp")
+                frame.save(tmp, pil_format, quality=quality)
+                os.replace(tmp, dest)
+                results.append(
+                    {
+                        "path": f"{rel_prefix}/{name}",
+                        "width": width,
+                        "height": height,
+                        "format": fmt,
+                        "bytes": dest.stat().st_size,
+                    }
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build responsive image variants for the Berlin Photo Guide.")
+    parser.add_argument("places", help="places.json to read and update in place")
+    parser.add_argument(
+        "--root",
+        default=None,
+        help="Directory image paths are relative to (default: the directory containing places.json)",
+    )
+    parser.add_argument("--widths", default="320,640,1280", help="Comma-separated target widths in pixels")
+    parser.add_argument(
+        "--formats",
+        default="webp,jpeg",
+        help=f"Comma-separated output formats, best first ({', '.join(FORMATS)})",
+    )
+    parser.add_argument("--quality", type=int, default=75, help="Encoder quality (0-100)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Worker processes")
+    parser.add_argument("--force", action="store_true", help="Rebuild every variant even if the source is unchanged")
+    args = parser.parse_args()
+
+    places_path = Path(args.places)
+    root = Path(args.root) if args.root else places_path.parent
+    widths = sorted({int(w) for w in args.widths.split(",") if w.strip()})
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"Unsupported format(s): {', '.join(unknown)}")
+    if "avif" in formats:
+        from PIL import features
+
+        if not features.check("avif"):
+            parser.error("This Pillow build cannot write AVIF; drop it from --formats or upgrade Pillow")
+
+    variants_dir = root / "images" / "variants"
+    variants_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = variants_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    options = {"widths": widths, "formats": formats, "quality": args.quality}
+
+    places = json.loads(places_path.read_text(encoding="utf-8"))
+    sources = {}
+    for place in places:
+        for image_path in place_image_paths(place):
+            src = resolve_image(root, image_path)
+            if src is not None:
+                sources[image_path] = src
+
+    # Variant files recorded for sources that are gone or about to be rebuilt.
+    stale = set()
+    for image_path in [image_path for image_path in manifest if image_path not in sources]:
+        stale.update(v["path"] for v in manifest.pop(image_path).get("variants", []))
+
+    todo = {}
+    for image_path, src in sources.items():
+        digest = file_hash(src)
+        stem = variant_stem(root, src)
+        entry = manifest.get(image_path)
+        current = (
+            not args.force
+            and entry
+            and entry.get("sha256") == digest
+            and entry.get("stem") == stem
+            and entry.get("options") == options
+            and all((root / v["path"]).exists() for v in entry.get("variants", []))
+        )
+        if not current:
+            todo[image_path] = (src, digest, stem)
+            if entry:
+                stale.update(v["path"] for v in entry.get("variants", []))
+
+    rel_prefix = variants_dir.relative_to(root).as_posix()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            image_path: pool.submit(build_variants, src, stem, rel_prefix, variants_dir, widths, formats, args.quality)
+            for image_path, (src, _, stem) in todo.items()
+        }
+        for image_path, future in futures.items():
+            manifest[image_path] = {
+                "sha256": todo[image_path][1],
+                "stem": todo[image_path][2],
+                "options": options,
+                "variants": future.result(),
+            }
+
+    # Two keys can name the same source file ("a.jpg" and "images/a.jpg"), so keep what is still listed.
+    live = {v["path"] for entry in manifest.values() for v in entry["variants"]}
+    stale -= live
+    for path in stale:
+        (root / path).unlink(missing_ok=True)
+
+    for place in places:
+        variants = {
+            image_path: manifest[image_path]["variants"]
+            for image_path in place_image_paths(place)
+            if image_path in manifest and image_path in sources
+        }
+        if variants:
+            place["image_variants"] = variants
+        else:
+            place.pop("image_variants", None)
+
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    with places_path.open("w", encoding="utf-8") as f:
+        json.dump(places, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+    source_bytes = sum(src.stat().st_size for src in sources.values())
+    smallest = sum(
+        min(v["bytes"] for v in manifest[image_path]["variants"]) for image_path in sources if image_path in manifest
+    )
+    print(
+        f"Built variants for {len(todo)} of {len(sources)} images ({len(sources) - len(todo)} unchanged), "
+        f"{len(stale)} stale variant files removed"
+    )
+    print(f"Full-size: {source_bytes / 1e6:.1f} MB, smallest variants: {smallest / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Export places.json as a split, minified, content-hashed bundle for the web app.
+
+The web app only needs id, title, coordinates and accessibility to draw its
+markers, so those go into a small index file fetched up front. Everything shown
+in the side panel (hours, gear, settings, tips, images, ...) is written to
+detail shards that are fetched the first time one of their places is opened.
+
+Index and shard file names carry a hash of their content so they can be served
+with long-lived cache headers. `bundle.json` is the only fixed name and just
+points at the current index. `report.json` records the payload sizes, including
+the bytes fetched before the first marker can be drawn, so they can be tracked
+across exports.
+
+The bundle is build output and is not committed: the web app prefers it over
+data/places.json, so re-run this export whenever places.json changes.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+INDEX_FIELDS = ["id", "title", "lat", "lng", "accessibility", "thumb"]
+DETAIL_EXCLUDE = {"title", "coordinates", "accessibility"}
+
+
+def minify(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_hashed(out_dir, stem, payload):
+    data = payload.encode("utf-8")
+    name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.json"
+    path = out_dir / name
+    if not path.exists() or path.read_bytes() != data:
+        path.write_bytes(data)
+    return name, data
+
+
+def smallest_variant(place):
+    images = place.get("images") or ([place["image"]] if place.get("image") else [])
+    variants = (place.get("image_variants") or {}).get(images[0], []) if images else []
+    if not variants:
+        return None
+    return min(variants, key=lambda variant: variant["bytes"])["path"]
+
+
+def index_row(place_id, place):
+    coords = place.get("coordinates") or {}
+    thumb = smallest_variant(place)
+    row = [place_id, place.get("title") or "", coords.get("lat"), coords.get("lng"), place.get("accessibility") or ""]
+    if thumb:
+        row.append(thumb)
+    return row
+
+
+def sizes(data):
+    return {"bytes": len(data), "gzip_bytes": len(gzip.compress(data, 9))}
+
+
+def main():
+    web_dir = Path(__file__).resolve().parent.parent / "web"
+    parser = argparse.ArgumentParser(description="Split places.json into a marker index and lazily loaded detail shards.")
+    parser.add_argument("places", nargs="?", default=str(web_dir / "data" / "places.json"), help="Input places.json")
+    parser.add_argument("--out", default=str(web_dir / "data" / "bundle"), help="Output directory")
+    parser.add_argument("--shard-size", type=int, default=16, help="Places per detail shard")
+    args = parser.parse_args()
+
+    places_path = Path(args.places)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    places = json.loads(places_path.read_text(encoding="utf-8"))
+
+    shard_names = []
+    written = set()
+    shard_bytes = []
+    for start in range(0, len(places), args.shard_size):
+        details = {
+            str(place_id): {k: v for k, v in places[place_id].items() if k not in DETAIL_EXCLUDE}
+            for place_id in range(start, min(start + args.shard_size, len(places)))
+        }
+        name, data = write_hashed(out_dir, "details", minify(details))
+        shard_names.append(name)
+        shard_bytes.append(len(data))
+        written.add(name)
+
+    index = {
+        "fields": INDEX_FIELDS,
+        "shard_size": args.shard_size,
+        "shards": shard_names,
+        "places": [index_row(place_id, place) for place_id, place in enumerate(places)],
+    }
+    index_name, index_data = write_hashed(out_dir, "index", minify(index))
+    written.add(index_name)
+
+    source_data = places_path.read_bytes()
+    pointer_data = minify({"index": index_name}).encode("utf-8")
+    (out_dir / "bundle.json").write_bytes(pointer_data)
+    first_marker = sizes(pointer_data + index_data)
+    stats = {
+        "places": len(places),
+        "source": sizes(source_data),
+        "first_marker": first_marker,
+        "shards": len(shard_names),
+        "largest_shard_bytes": max(shard_bytes, default=0),
+    }
+    (out_dir / "report.json").write_text(json.dumps(stats, indent=2) + "\n", encoding="utf-8")
+
+    # Drop hashed files left over from previous exports.
+    for pattern in ("index.*.json", "details.*.json"):
+        for path in out_dir.glob(pattern):
+            if path.name not in written:
+                path.unlink()
+
+    print(f"Wrote {len(shard_names)} shards and {index_name} to {out_dir}")
+    print(
+        f"Bytes to first marker: {first_marker['bytes']} ({first_marker['gzip_bytes']} gzipped), "
+        f"was {stats['source']['bytes']} ({stats['source']['gzip_bytes']} gzipped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
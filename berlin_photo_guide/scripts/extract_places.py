@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 import argparse
+import fcntl
+import hashlib
 import json
 import os
 import re
 import shutil
-import subprocess
+import sys
 import tempfile
 import unicodedata
 from contextlib import contextmanager
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from pipeline_common.metrics import METRICS, add_metrics_arguments, metrics_session  # noqa: E402
+from pipeline_common.pdf_backends import images_digest  # noqa: E402
+from pipeline_common.pdf_text import PdfTextLayer, add_text_cache_arguments  # noqa: E402
+
 HEADINGS = [
     "Location",
     "Coordinates",
@@ -23,15 +30,19 @@ HEADINGS = [
     "Tips & additional information",
 ]
 
+# Headings that open a single-column section, in the order lines are tested against them.
+SINGLE_COLUMN_HEADINGS = ["Location", "Coordinates", "Accessibility", "Tips & additional information"]
+
 TWO_COLUMN_HEADINGS = [
     ("Hours", "Gear"),
     ("Best time to visit", "Settings"),
     ("Entry Fee", "Tripod"),
 ]
 
+IMAGE_FILE_RE = re.compile(r"img-(\d+)-(\d+)\.(\w+)$")
 
-def run(cmd):
-    subprocess.run(cmd, check=True)
+# ioctl(FICLONE) from linux/fs.h: share the source's extents (btrfs, XFS, ...).
+FICLONE = 0x40049409
 
 
 def slugify(value):
@@ -41,31 +52,80 @@ def slugify(value):
     return ascii_str.lower() or "place"
 
 
-def parse_pages(pdf_path):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as tmp:
-        tmp_path = tmp.name
-    try:
-        run(["pdftotext", "-layout", pdf_path, tmp_path])
-        text = Path(tmp_path).read_text(errors="ignore")
-    finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
-    return text.split("\f")
+def parse_pages(pdf_path, text_layer=None):
+    # A memory-mapped PageStore when the text cache is on, so page ranges only decode what they use.
+    return (text_layer or PdfTextLayer()).pages(pdf_path)
+
+
+def tokenize_page(page_text):
+    """Classify every non-blank line of a page, once.
+
+    Returns `(tokens, has_location)`. Each token is `(kind, stripped, line, value)`
+    where `line` is the line with trailing whitespace removed (its columns
+    still line up with the page layout) and `kind` is one of:
+
+    * a heading from SINGLE_COLUMN_HEADINGS, with `value` the text after it;
+    * "columns" for a two-column heading row, with `value` the
+      `(left, right, offset)` headings and the offset of the right column;
+    * "text" for anything else, with `value` None.
+
+    `has_location` tells whether the page starts a place.
+    """
+    tokens = []
+    has_location = False
+    for raw in page_text.splitlines():
+        line = raw.rstrip()
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        kind, value = "text", None
+        for heading in SINGLE_COLUMN_HEADINGS:
+            if stripped.startswith(heading):
+                if heading == "Location" and stripped.startswith("Location changed"):
+                    continue
+                kind, value = heading, stripped[len(heading):].strip()
+                break
+        else:
+            for left, right in TWO_COLUMN_HEADINGS:
+                if left in stripped and right in stripped:
+                    kind, value = "columns", (left, right, line.rfind(right))
+                    break
+        has_location = has_location or kind == "Location"
+        tokens.append((kind, stripped, line, value))
+    return tokens, has_location
+
+
+def split_columns(line, offset):
+    """Split a two-column row at `offset`, where its heading row put the right column.
+
+    A word straddling the offset goes to the right cell when a gap of two or
+    more spaces precedes it (the cell starts a little early), otherwise to the
+    left cell (the left value overflows).
+    """
+    if offset >= len(line):
+        return line.strip(), ""
+    cut = offset
+    if cut > 0 and not line[cut].isspace() and not line[cut - 1].isspace():
+        start = line.rfind(" ", 0, cut) + 1
+        if start >= 2 and line[start - 2] == " ":
+            cut = start
+        else:
+            while cut < len(line) and not line[cut].isspace():
+                cut += 1
+    return line[:cut].strip(), line[cut:].strip()
 
 
 def parse_location_page(page_text, pdf_page_number, pdf_page_detail=None):
-    lines = [line.rstrip("\n") for line in page_text.splitlines()]
-    def is_location_heading(text):
-        stripped = text.strip()
-        return stripped.startswith("Location") and not stripped.startswith("Location changed")
+    tokens, _ = tokenize_page(page_text)
+    return parse_place_tokens(tokens, pdf_page_number, pdf_page_detail)
 
-    if not any(is_location_heading(line) for line in lines):
-        return None
 
-    loc_idx = next(i for i, line in enumerate(lines) if is_location_heading(line))
-    header_lines = [line.strip() for line in lines[:loc_idx] if line.strip()]
+def parse_place_tokens(tokens, pdf_page_number, pdf_page_detail=None):
+    """Build a place from the tokens of its page(s) (see `tokenize_page`)."""
+    loc_idx = next((i for i, token in enumerate(tokens) if token[0] == "Location"), None)
+    if loc_idx is None:
+        return None
+    header_lines = [token[1] for token in tokens[:loc_idx]]
 
     place_number = None
     if header_lines and re.fullmatch(r"\d+", header_lines[0]):
@@ -85,72 +145,30 @@ def parse_location_page(page_text, pdf_page_number, pdf_page_detail=None):
         title = " ".join(title_lines).strip()
         sections["Tips & additional information"].append("Location changed!")
     current_single = None
-    left_section = None
-    right_section = None
-
-    for raw in lines[loc_idx:]:
-        line = raw.rstrip()
-        stripped = line.strip()
-        if not stripped:
-            continue
-
-        # Single-line sections with inline values.
-        if stripped.startswith("Location") and not stripped.startswith("Location changed"):
-            current_single = "Location"
-            left_section = right_section = None
-            value = stripped[len("Location"):].strip()
-            if value:
-                sections["Location"].append(value)
-            continue
-        if stripped.startswith("Coordinates"):
-            current_single = "Coordinates"
-            left_section = right_section = None
-            value = stripped[len("Coordinates"):].strip()
-            if value:
-                sections["Coordinates"].append(value)
-            continue
-        if stripped.startswith("Accessibility"):
-            current_single = "Accessibility"
-            left_section = right_section = None
-            value = stripped[len("Accessibility"):].strip()
-            if value:
-                sections["Accessibility"].append(value)
-            continue
-
-        # Tips section.
-        if stripped.startswith("Tips & additional information"):
-            current_single = "Tips & additional information"
-            left_section = right_section = None
-            continue
-
-        # Two-column headings.
-        matched_two_col = False
-        for left, right in TWO_COLUMN_HEADINGS:
-            if left in line and right in line:
-                left_section, right_section = left, right
-                current_single = None
-                matched_two_col = True
-                break
-        if matched_two_col:
-            continue
-
-        # Two-column entries.
-        if left_section and right_section:
-            parts = re.split(r"\s{2,}", stripped)
-            if len(parts) >= 2:
-                left_val = parts[0].strip()
-                right_val = parts[1].strip()
+    left_section = right_section = None
+    column = 0
+
+    for index in range(loc_idx, len(tokens)):
+        kind, stripped, line, value = tokens[index]
+        if kind == "text":
+            if left_section:
+                left_val, right_val = split_columns(line, column)
                 if left_val:
                     sections[left_section].append(left_val)
                 if right_val:
                     sections[right_section].append(right_val)
-            else:
-                sections[left_section].append(parts[0].strip())
-            continue
-
-        # Single-column continuation.
-        if current_single in sections:
-            sections[current_single].append(stripped)
+            elif current_single in sections:
+                # Single-column continuation.
+                sections[current_single].append(stripped)
+        elif kind == "columns":
+            left_section, right_section, column = value
+            current_single = None
+        else:
+            current_single = kind
+            left_section = right_section = None
+            # Location, Coordinates and Accessibility may carry their value inline.
+            if value and kind != "Tips & additional information":
+                sections[kind].append(value)
 
     location_lines = [
         line for line in sections["Location"]
@@ -186,51 +204,93 @@ def parse_location_page(page_text, pdf_page_number, pdf_page_detail=None):
     }
 
 
-def parse_places_from_pages(pages):
-    places = []
-    index = 0
-    while index < len(pages):
-        page_text = pages[index]
-        has_location = any(
-            line.strip().startswith("Location")
-            and not line.strip().startswith("Location changed")
-            for line in page_text.splitlines()
-        )
-        if not has_location:
-            index += 1
-            continue
+def iter_place_pages(pages, first_page=1):
+    """Yield `(pdf_page, detail_page, tokens, text_sha256)` for each place in `pages`.
+
+    A page with a `Location` line starts a place; if the following page has
+    none, it is the place's detail page, its tokens are appended and it gives
+    the place its `pdf_page`. Page numbers are absolute, with the first page being PDF page `first_page`.
+    Each page is tokenized once and `pages` may be any iterable, so a long
+    guide streams through with one page of lookahead. `text_sha256` hashes
+    the place's page texts joined by a newline.
+    """
+    pending = None
+    for pdf_page, page_text in enumerate(pages, first_page):
+        tokens, has_location = tokenize_page(page_text)
+        if pending is not None:
+            start_page, start_text, start_tokens = pending
+            pending = None
+            if not has_location:
+                # A merged place is numbered by its detail page, as it always has been.
+                yield pdf_page, pdf_page, start_tokens + tokens, text_hash(start_text, page_text)
+                continue
+            yield start_page, None, start_tokens, text_hash(start_text)
+        if has_location:
+            pending = (pdf_page, page_text, tokens)
+    if pending is not None:
+        start_page, start_text, start_tokens = pending
+        yield start_page, None, start_tokens, text_hash(start_text)
 
-        merged_text = page_text
-        detail_page = None
-        if index + 1 < len(pages):
-            next_text = pages[index + 1]
-            next_has_location = any(
-                line.strip().startswith("Location")
-                and not line.strip().startswith("Location changed")
-                for line in next_text.splitlines()
-            )
-            if not next_has_location:
-                merged_text = f"{page_text}\n{next_text}"
-                detail_page = index + 2
-                index += 1
 
-        place = parse_location_page(merged_text, index + 1, detail_page)
+def parse_places_from_pages(pages, first_page=1):
+    places = []
+    for pdf_page, detail_page, tokens, _ in iter_place_pages(pages, first_page):
+        place = parse_place_tokens(tokens, pdf_page, detail_page)
         if place:
             places.append(place)
-        index += 1
-
     return places
 
 
+def text_hash(*parts):
+    """sha256 of the parts joined by newlines, without building the joined string."""
+    digest = hashlib.sha256()
+    for index, part in enumerate(parts):
+        if index:
+            digest.update(b"\n")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    if not path.exists():
+        return {"version": 1, "places": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(path, manifest):
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(path)
+
+
 @contextmanager
-def extract_images_batch(pdf_path, page_min, page_max):
-    with tempfile.TemporaryDirectory() as tmpdir:
+def extract_images_batch(pdf_path, pages, jobs=4, native=False, tmp_parent=None, text_layer=None):
+    """Extract the images of `pages` into a temp dir; yields {page: [paths]}.
+
+    Only the requested pages are decoded, by the text layer's PDF backend
+    (one `pdfimages` per page concurrently with poppler, in-process with
+    PyMuPDF). With `native`, images are written in their embedded format
+    instead of being re-encoded as PNG. `tmp_parent` should be on the same
+    filesystem as the destination so the files can be moved or linked into
+    place instead of copied.
+    """
+    backend = (text_layer or PdfTextLayer()).backend(pdf_path)
+    with tempfile.TemporaryDirectory(dir=tmp_parent) as tmpdir:
         prefix = os.path.join(tmpdir, "img")
-        run(["pdfimages", "-png", "-p", "-f", str(page_min), "-l", str(page_max), pdf_path, prefix])
-        files = list(Path(tmpdir).glob("img-*.png"))
+        with METRICS.stage("pdfimages"):
+            backend.extract_images(pages, prefix, jobs=jobs, native=native)
+
         image_files = {}
-        for path in files:
-            match = re.search(r"img-(\d+)-(\d+)\.png$", path.name)
+        for path in Path(tmpdir).glob("img-*"):
+            match = IMAGE_FILE_RE.search(path.name)
             if not match:
                 continue
             page = int(match.group(1))
@@ -238,12 +298,126 @@ def extract_images_batch(pdf_path, page_min, page_max):
         yield image_files
 
 
+def reflink(src, dest):
+    with open(src, "rb") as src_f, open(dest, "wb") as dest_f:
+        fcntl.ioctl(dest_f.fileno(), FICLONE, src_f.fileno())
+
+
+def place_file(src, dest, mode="move"):
+    """Put `src` at `dest` by moving, hard-linking, reflinking or copying it.
+
+    Links and reflinks fall back to a copy when the filesystem refuses them
+    (different devices, no reflink support).
+    """
+    tmp_dest = dest.with_name(dest.name + ".tmp")
+    if mode == "move":
+        shutil.move(str(src), tmp_dest)
+    elif mode == "hardlink":
+        try:
+            os.link(src, tmp_dest)
+        except OSError:
+            shutil.copy2(src, tmp_dest)
+    elif mode == "reflink":
+        try:
+            reflink(src, tmp_dest)
+        except OSError:
+            shutil.copy2(src, tmp_dest)
+    else:
+        shutil.copy2(src, tmp_dest)
+    os.replace(tmp_dest, dest)
+    METRICS.count(f"images_{mode}")
+    METRICS.add_bytes("written", dest.stat().st_size)
+
+
 def choose_largest_image(candidates):
     if not candidates:
         return None
     return max(candidates, key=lambda p: p.stat().st_size)
 
 
+def remove_placed_image(images_dir, entry, keep=None):
+    """Delete the image the manifest entry says was placed for its page, unless it is named `keep`."""
+    name = entry.get("image")
+    if name and name != keep:
+        (images_dir / name).unlink(missing_ok=True)
+        METRICS.count("images_removed")
+
+
+def image_is_current(images_dir, place, entry, source_digest):
+    """True when the page's embedded images match the manifest and the placed file is intact.
+
+    `source_digest` hashes the image bytes in the PDF (see `image_digests` of
+    the PDF backends), so a photo replaced under unchanged page text is
+    re-extracted; the placed file's own hash catches edits to the output.
+    """
+    if not entry or not source_digest or entry.get("source_sha256") != source_digest:
+        return False
+    name = place.get("image")
+    if entry.get("image") != name:
+        return False
+    if not name:
+        return True
+    dest_path = images_dir / name
+    return dest_path.exists() and file_hash(dest_path) == entry.get("image_sha256")
+
+
+def place_images(
+    pdf_path,
+    images_dir,
+    page_to_place,
+    manifest_places,
+    source_digests,
+    jobs=4,
+    native=False,
+    link_mode="move",
+    text_layer=None,
+):
+    """Extract and place the largest image of each page; returns the number of files written.
+
+    Each page's source digest is recorded in the manifest for the next
+    `--incremental` run to compare against: from `source_digests` ({page:
+    sha256}) when given, else hashed from the files just extracted.
+    """
+    if not page_to_place:
+        return 0
+    written = 0
+
+    with extract_images_batch(
+        pdf_path, page_to_place.keys(), jobs=jobs, native=native, tmp_parent=images_dir.parent, text_layer=text_layer
+    ) as image_files:
+        for page_num, place in page_to_place.items():
+            entry = manifest_places.setdefault(str(page_num), {})
+            slug = slugify(place["title"] or f"page_{page_num}")
+            candidates = image_files.get(page_num, [])
+            with METRICS.stage("hash_images"):
+                entry["source_sha256"] = source_digests.get(page_num) or images_digest(candidates)
+            with METRICS.stage("select_images"):
+                chosen = choose_largest_image(candidates)
+            if not chosen:
+                place["image"] = None
+                place["image_path"] = None
+                remove_placed_image(images_dir, entry)
+                entry.pop("image", None)
+                entry.pop("image_sha256", None)
+                continue
+            dest_name = f"{page_num:03d}_{slug}{chosen.suffix}"
+            dest_path = images_dir / dest_name
+            with METRICS.stage("hash_images"):
+                digest = file_hash(chosen)
+                current = dest_path.exists() and file_hash(dest_path) == digest
+            if not current:
+                with METRICS.stage("place_images"):
+                    place_file(chosen, dest_path, link_mode)
+                written += 1
+            # A renamed place gets a new file name; drop the file placed under the old one.
+            remove_placed_image(images_dir, entry, keep=dest_name)
+            place["image"] = dest_name
+            place["image_path"] = str(Path("images") / dest_name)
+            entry["image"] = dest_name
+            entry["image_sha256"] = digest
+    return written
+
+
 def main():
     parser = argparse.ArgumentParser(description="Extract places and images from Berlin Photo Guide PDF.")
     parser.add_argument("pdf", help="Path to PDF")
@@ -251,61 +425,148 @@ def main():
     parser.add_argument("--page-min", type=int, default=None, help="First PDF page to process (1-based)")
     parser.add_argument("--page-max", type=int, default=None, help="Last PDF page to process (1-based)")
     parser.add_argument("--append", action="store_true", help="Append to existing places.json if present")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-parse only places whose page text changed since the last run (per manifest.json) "
+        "and update places.json in place",
+    )
     parser.add_argument("--skip-images", action="store_true", help="Skip extracting images")
+    parser.add_argument(
+        "--image-jobs", type=int, default=os.cpu_count() or 4, help="Concurrent pdfimages workers (poppler backend)"
+    )
+    parser.add_argument(
+        "--native-images",
+        action="store_true",
+        help="Keep images in their embedded format (pdfimages -all) instead of re-encoding to PNG",
+    )
+    parser.add_argument(
+        "--image-link",
+        choices=["move", "hardlink", "reflink", "copy"],
+        default="move",
+        help="How extracted images are placed into images/ (default: move out of the temp dir)",
+    )
+    add_text_cache_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    with metrics_session(args):
+        extract(args)
+
 
+def extract(args):
     pdf_path = args.pdf
     out_dir = Path(args.out)
     images_dir = out_dir / "images"
     images_dir.mkdir(parents=True, exist_ok=True)
-
-    pages = parse_pages(pdf_path)
-    if args.page_min or args.page_max:
-        page_min = args.page_min or 1
-        page_max = args.page_max or len(pages)
-        pages_slice = pages[page_min - 1:page_max]
-        places = parse_places_from_pages(pages_slice)
-        # Adjust page numbers when slicing.
-        for place in places:
-            place["pdf_page"] = (place["pdf_page"] or 0) + (page_min - 1)
-            if place.get("pdf_page_detail"):
-                place["pdf_page_detail"] = place["pdf_page_detail"] + (page_min - 1)
-    else:
-        places = parse_places_from_pages(pages)
+    output_path = out_dir / "places.json"
+    manifest_path = out_dir / "manifest.json"
+    manifest = load_manifest(manifest_path)
+    manifest_places = manifest.setdefault("places", {})
+
+    text_layer = PdfTextLayer.from_args(args)
+    with METRICS.stage("pdftotext"):
+        pages = parse_pages(pdf_path, text_layer)
+    page_min = args.page_min or 1
+    page_max = args.page_max or len(pages)
+    METRICS.count("pages", len(pages))
+
+    existing = []
+    if (args.append or args.incremental) and output_path.exists():
+        existing = json.loads(output_path.read_text(encoding="utf-8"))
+    existing_by_page = {p.get("pdf_page"): p for p in existing if isinstance(p, dict)}
+
+    with METRICS.stage("parse"):
+        page_range = (pages[index] for index in range(page_min - 1, min(page_max, len(pages))))
+        places = []
+        added, changed, unchanged = [], [], []
+        for pdf_page, detail_page, tokens, digest in iter_place_pages(page_range, page_min):
+            entry = manifest_places.get(str(pdf_page), {})
+            previous = existing_by_page.get(pdf_page)
+            if args.incremental and previous is not None and entry.get("text_sha256") == digest:
+                places.append(previous)
+                unchanged.append(previous)
+                continue
+            place = parse_place_tokens(tokens, pdf_page, detail_page)
+            if not place:
+                continue
+            new_entry = {"text_sha256": digest}
+            if entry.get("image"):
+                # Kept so place_images can remove the old file if the place's image name changes.
+                new_entry["image"] = entry["image"]
+            manifest_places[str(pdf_page)] = new_entry
+            places.append(place)
+            (changed if previous is not None else added).append(place)
+    METRICS.count("places_parsed", len(added) + len(changed))
+    METRICS.count("places_unchanged", len(unchanged))
 
     page_to_place = {place["pdf_page"]: place for place in places if place.get("pdf_page")}
 
+    images_written = 0
+    unchanged_pages = {place["pdf_page"] for place in unchanged}
     if places and not args.skip_images:
-        pages_with_places = sorted(page_to_place.keys())
-        page_min, page_max = pages_with_places[0], pages_with_places[-1]
-
-        with extract_images_batch(pdf_path, page_min, page_max) as image_files:
-            for page_num, place in page_to_place.items():
-                slug = slugify(place["title"] or f"page_{page_num}")
-                candidates = image_files.get(page_num, [])
-                chosen = choose_largest_image(candidates)
-                if not chosen:
-                    place["image"] = None
-                    place["image_path"] = None
-                    continue
-                dest_name = f"{page_num:03d}_{slug}{chosen.suffix}"
-                dest_path = images_dir / dest_name
-                shutil.copy2(chosen, dest_path)
-                place["image"] = dest_name
-                place["image_path"] = str(Path("images") / dest_name)
+        backend = text_layer.backend(pdf_path)
+        # Only pages whose text is unchanged can keep their image, so only those are hashed up front.
+        skippable = [page_num for page_num in page_to_place if args.incremental and page_num in unchanged_pages]
+        with METRICS.stage("hash_image_sources"):
+            source_digests = backend.image_digests(skippable, jobs=args.image_jobs, native=args.native_images)
+        needs_images = {
+            page_num: place
+            for page_num, place in page_to_place.items()
+            if not (
+                args.incremental
+                and page_num in unchanged_pages
+                and image_is_current(
+                    images_dir, place, manifest_places.get(str(page_num)), source_digests.get(page_num)
+                )
+            )
+        }
+        if not backend.digests_extracted_images:
+            with METRICS.stage("hash_image_sources"):
+                source_digests.update(
+                    backend.image_digests(needs_images, jobs=args.image_jobs, native=args.native_images)
+                )
+        with METRICS.stage("images"):
+            images_written = place_images(
+                pdf_path,
+                images_dir,
+                needs_images,
+                manifest_places,
+                source_digests,
+                jobs=args.image_jobs,
+                native=args.native_images,
+                link_mode=args.image_link,
+                text_layer=text_layer,
+            )
 
     out_dir.mkdir(parents=True, exist_ok=True)
-    output_path = out_dir / "places.json"
-    if args.append and output_path.exists():
-        existing = json.loads(output_path.read_text(encoding="utf-8"))
-        existing_pages = {p.get("pdf_page") for p in existing if isinstance(p, dict)}
+    if args.incremental:
+        # Places in the processed range that no longer parse are removed; the rest are kept.
+        in_range = {pdf_page for pdf_page in existing_by_page if pdf_page and page_min <= pdf_page <= page_max}
+        removed = [existing_by_page[pdf_page] for pdf_page in in_range - set(page_to_place)]
+        for place in removed:
+            remove_placed_image(images_dir, manifest_places.pop(str(place["pdf_page"]), {}))
+        kept = [p for p in existing if isinstance(p, dict) and p.get("pdf_page") not in in_range]
+        merged = sorted(kept + places, key=lambda p: p.get("pdf_page") or 0)
+    elif args.append and existing:
+        existing_pages = set(existing_by_page)
         merged = existing + [p for p in places if p.get("pdf_page") not in existing_pages]
     else:
         merged = places
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
+    with METRICS.stage("write_json"):
+        with output_path.open("w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        save_manifest(manifest_path, manifest)
+    METRICS.add_bytes("written", output_path.stat().st_size + manifest_path.stat().st_size)
 
     print(f"Wrote {len(merged)} places to {output_path}")
+    if args.incremental:
+        print(
+            f"Added {len(added)}, changed {len(changed)}, removed {len(removed)}, "
+            f"unchanged {len(unchanged)}; {images_written} image(s) written"
+        )
+        for label, group in (("+", added), ("~", changed), ("-", removed)):
+            for place in group:
+                print(f"  {label} p{place['pdf_page']:03d} {place.get('title')}")
 
 
 if __name__ == "__main__":
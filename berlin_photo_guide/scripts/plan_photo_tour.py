@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""Plan a one-day photo tour over places.json.
+
+Every selected place gets the time windows it can be shot in on the chosen
+date: its opening hours (`hours`, e.g. "Monday - Friday 9am - 6pm", "Always
+except ...") intersected with its `best_time_to_visit` hints ("Golden hour",
+"Sunrise", "During daytime", ...), which are turned into clock times with the
+sunrise and sunset of that date. A place whose best time does not fit its
+opening hours falls back to the opening hours (or is dropped with --strict).
+
+Travel times come from a haversine distance matrix (NumPy, float32, built in
+row blocks from unit-vector dot products) scaled by a detour factor and an
+average speed. The tour is built by a time-aware nearest neighbour (next stop
+= the one that can be started soonest), then improved with 2-opt and Or-opt
+moves and extended by cheapest feasible insertion of the places left out,
+until neither helps. Move deltas are evaluated for all positions at once with
+NumPy; only the best few are checked against the time windows, so a day over
+thousands of candidate points still solves in well under a second.
+
+    python plan_photo_tour.py --date 2026-06-20 --accessibility easy,medium
+    python plan_photo_tour.py --from 52.5200,13.4050 --dwell 15 -o tour.json
+"""
+import argparse
+import json
+import math
+import re
+from datetime import date as Date
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+DAY = (0, 24 * 60)
+DAY_WORDS = {
+    "mo": 0, "mon": 0, "monday": 0,
+    "tu": 1, "tue": 1, "tues": 1, "tuesday": 1,
+    "we": 2, "wed": 2, "wednesday": 2,
+    "th": 3, "thu": 3, "thur": 3, "thurs": 3, "thursday": 3,
+    "fr": 4, "fri": 4, "friday": 4,
+    "sa": 5, "sat": 5, "saturday": 5,
+    "su": 6, "sun": 6, "sunday": 6,
+}  # fmt: skip
+DAY_PATTERN = re.compile(r"\b(" + "|".join(sorted(DAY_WORDS, key=len, reverse=True)) + r")\b")
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+SEASON_PATTERN = re.compile(r"^([a-z]{3})[a-z]*\s*(?:-|–|until|to)\s*([a-z]{3})[a-z]*$")
+TIME = r"(\d{1,2})(?:[:.](\d{2}))?\s*([ap]m)?"
+# "3" stands in for a dash in at least one place's hours ("10:30am 3 6.30 pm").
+TIME_RANGE = re.compile(TIME + r"\s*(?:-|–|\bto\b|\b3\b)\s*" + TIME)
+UNTIL_SUNSET = re.compile(TIME + r"\s*until\s+sunset")
+BUSINESS_HOURS = (9 * 60, 18 * 60)
+INSERTION_CHECKS = 64
+MOVE_CHECKS = 32
+
+
+def clock(minutes):
+    minutes = int(round(minutes))
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def parse_clock(text):
+    hours, _, minutes = text.partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def to_minutes(hour, minute, suffix):
+    hour = int(hour)
+    if suffix:
+        hour = hour % 12 + (12 if suffix == "pm" else 0)
+    return hour * 60 + int(minute or 0)
+
+
+def time_range(match):
+    start_hour, start_minute, start_suffix, end_hour, end_minute, end_suffix = match.groups()
+    end = to_minutes(end_hour, end_minute, end_suffix) or DAY[1]
+    # "7-8pm", "9-10am": the start takes the end's suffix unless that puts it after the end.
+    start = to_minutes(start_hour, start_minute, start_suffix or end_suffix)
+    if start > end and not start_suffix:
+        start = to_minutes(start_hour, start_minute, "am")
+    # The guide writes noon as "12am" ("Tuesday - Sunday 12am - 6pm").
+    if start_hour == "12" and start_suffix == "am" and end > 12 * 60:
+        start = 12 * 60
+    return start, end
+
+
+def parse_days(text):
+    if "daily" in text or "every day" in text:
+        return set(range(7))
+    days = set()
+    previous = None
+    position = 0
+    for match in DAY_PATTERN.finditer(text):
+        day = DAY_WORDS[match.group(1)]
+        between = text[position : match.start()]
+        if previous is not None and ("-" in between or "–" in between or "until" in between or " to " in between):
+            day_range = range(previous, previous + (day - previous) % 7 + 1)
+            days.update(d % 7 for d in day_range)
+        else:
+            days.add(day)
+        previous, position = day, match.end()
+    return days
+
+
+def merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        elif start < end:
+            merged.append((start, end))
+    return merged
+
+
+def intersect(first, second):
+    return merge(
+        (max(a_start, b_start), min(a_end, b_end))
+        for a_start, a_end in first
+        for b_start, b_end in second
+        if max(a_start, b_start) < min(a_end, b_end)
+    )
+
+
+def subtract(intervals, removed):
+    result = merge(intervals)
+    for cut_start, cut_end in merge(removed):
+        pieces = []
+        for start, end in result:
+            for piece in ((start, min(end, cut_start)), (max(start, cut_end), end)):
+                if piece[0] < piece[1]:
+                    pieces.append(piece)
+        result = pieces
+    return result
+
+
+def opening_hours(lines, day, sunset):
+    """Open intervals (minutes after midnight) on `day`, or None when the hours say nothing usable."""
+    weekday = day.weekday()
+    always = excepting = closed = explicit = False
+    in_season = True
+    intervals = []
+    for line in lines or []:
+        text = " ".join(line.lower().split())
+        if text.startswith("always"):
+            always, excepting = True, "except" in text
+            continue
+        if "reopening" in text:
+            return []
+        season = SEASON_PATTERN.match(text)
+        if season and season.group(1) in MONTHS and season.group(2) in MONTHS:
+            first, last = MONTHS.index(season.group(1)), MONTHS.index(season.group(2))
+            in_season = (day.month - 1 - first) % 12 <= (last - first) % 12
+            explicit = True
+            continue
+        if not in_season:
+            continue
+
+        ranges = [time_range(match) for match in TIME_RANGE.finditer(text)]
+        ranges += [(to_minutes(*match.groups()), sunset) for match in UNTIL_SUNSET.finditer(text)]
+        head = text[: min((m.start() for m in re.finditer(r"\d", text)), default=len(text))]
+        days = parse_days(head)
+        if not ranges:
+            if days and "business" in text:
+                ranges = [BUSINESS_HOURS]
+            elif days and ("closed" in text or "appointment" in text):
+                explicit = True
+                closed = closed or weekday in days
+                continue
+            else:
+                continue  # gear, remarks and wrapped notes
+        explicit = True
+        if weekday in (days or range(7)):
+            intervals.extend(ranges)
+
+    if always:
+        return subtract([DAY], intervals) if excepting else [DAY]
+    if closed:
+        return []
+    return merge(intervals) if explicit else None
+
+
+def best_time_windows(hints, day, sunrise, sunset, opens_at):
+    """Union of the windows the `best_time_to_visit` hints ask for on `day`."""
+    weekday = day.weekday()
+    windows = []
+    for hint in hints or []:
+        text = hint.lower()
+        if "golden hour to sunset" in text:
+            windows.append((sunset - 60, sunset))
+        elif "golden hour" in text:
+            windows += [(sunrise, sunrise + 60), (sunset - 60, sunset)]
+        elif "blue hour" in text:
+            windows += [(sunrise - 40, sunrise), (sunset, sunset + 40)]
+        elif "sunrise" in text or "sunset" in text:
+            if "sunrise" in text:
+                windows.append((sunrise - 30, sunrise + 45))
+            if "sunset" in text:
+                windows.append((sunset - 45, sunset + 30))
+        elif "daytime" in text:
+            windows.append((sunrise, sunset))
+        elif "weekdays" in text:
+            if weekday < 5:
+                windows += [(0, 10 * 60), (18 * 60, DAY[1])]
+        elif "saturday" in text:
+            if weekday == 5:
+                windows.append((0, 12 * 60))
+        elif "as early as possible" in text or "after opening" in text:
+            windows.append((max(opens_at, sunrise), max(opens_at, sunrise) + 90))
+        elif "early" in text:
+            windows.append((sunrise, max(sunrise + 120, 10 * 60)))
+        elif "before noon" in text or "morning" in text:
+            windows.append((0, 12 * 60))
+        else:
+            windows.append((sunrise, sunset))  # "Anytime", "Cloudy days", "Any time during opening hours", ...
+    return merge(windows)
+
+
+def sun_times(day, lat, lng, tz):
+    """Sunrise and sunset in local minutes after midnight (NOAA approximation, about a minute off)."""
+    gamma = 2 * math.pi / 365 * (day.timetuple().tm_yday - 1)
+    equation_of_time = 229.18 * (
+        0.000075
+        + 0.001868 * math.cos(gamma)
+        - 0.032077 * math.sin(gamma)
+        - 0.014615 * math.cos(2 * gamma)
+        - 0.040849 * math.sin(2 * gamma)
+    )
+    declination = (
+        0.006918
+        - 0.399912 * math.cos(gamma)
+        + 0.070257 * math.sin(gamma)
+        - 0.006758 * math.cos(2 * gamma)
+        + 0.000907 * math.sin(2 * gamma)
+        - 0.002697 * math.cos(3 * gamma)
+        + 0.00148 * math.sin(3 * gamma)
+    )
+    phi = math.radians(lat)
+    cos_hour_angle = math.cos(math.radians(90.833)) / (math.cos(phi) * math.cos(declination)) - math.tan(
+        phi
+    ) * math.tan(declination)
+    hour_angle = math.degrees(math.acos(max(-1.0, min(1.0, cos_hour_angle))))
+    offset = datetime(day.year, day.month, day.day, 12, tzinfo=ZoneInfo(tz)).utcoffset() / timedelta(minutes=1)
+    noon = 720 - 4 * lng - equation_of_time + offset
+    return noon - 4 * hour_angle, noon + 4 * hour_angle
+
+
+def place_windows(place, day, sunrise, sunset, span, dwell, strict=False):
+    """Return `(windows, best_time, reason)`; `windows` is empty when the place cannot be shot that day."""
+    open_intervals = opening_hours(place.get("hours"), day, sunset)
+    unverified = open_intervals is None
+    if unverified:
+        open_intervals = [(sunrise, sunset)]
+    open_intervals = intersect(open_intervals, [span])
+    if not open_intervals:
+        return [], False, "closed"
+    preferred = best_time_windows(place.get("best_time_to_visit"), day, sunrise, sunset, open_intervals[0][0])
+    windows = [(start, end) for start, end in intersect(open_intervals, preferred) if end - start >= dwell]
+    best_time = bool(windows)
+    if not windows and not strict:
+        windows = [(start, end) for start, end in open_intervals if end - start >= dwell]
+    if not windows:
+        return [], False, "outside best time" if strict else "window too short"
+    return windows, best_time, "hours unverified" if unverified else None
+
+
+def travel_matrix(lat, lng, minutes_per_metre, extra=1, block=2048):
+    """Travel minutes between all points as float32, plus `extra` trailing all-zero rows/columns.
+
+    Haversine via unit vectors: sin²(θ/2) = |p - q|² / 4 = (1 - p·q) / 2, so each
+    row block is one matrix product instead of per-pair trigonometry.
+    """
+    n = len(lat)
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    points = np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+    scale = 2 * EARTH_RADIUS_M * minutes_per_metre
+    travel = np.zeros((n + extra, n + extra), dtype=np.float32)
+    for start in range(0, n, block):
+        rows = slice(start, min(start + block, n))
+        half_chord = np.clip((1.0 - points[rows] @ points.T) / 2, 0.0, 1.0)
+        np.sqrt(half_chord, out=half_chord)
+        np.arcsin(half_chord, out=half_chord)
+        travel[rows, :n] = half_chord * scale
+    return travel
+
+
+def window_arrays(windows):
+    width = max((len(w) for w in windows), default=1) or 1
+    starts = np.full((len(windows), width), np.inf)
+    ends = np.full((len(windows), width), -np.inf)
+    for index, place_windows_ in enumerate(windows):
+        for slot, (start, end) in enumerate(place_windows_):
+            starts[index, slot], ends[index, slot] = start, end
+    return starts, ends
+
+
+class TourSolver:
+    """Time-window tour over the places `0..n-1` of `travel`.
+
+    The last node of `travel` is free (zero cost to and from everything): tours
+    end there, and start there too unless a depot node `n` is given.
+    """
+
+    def __init__(self, travel, windows, dwell, day_start, depot=False):
+        self.travel = travel
+        self.windows = windows
+        self.dwell = dwell
+        self.day_start = day_start
+        self.n = len(windows)
+        self.free = len(travel) - 1
+        self.first = self.n if depot else self.free
+        self.starts, self.ends = window_arrays(windows)
+        self.checks = 0
+
+    def begin_times(self, arrival, candidates):
+        """Earliest feasible start at each candidate for the given arrival times (inf when none)."""
+        begin = np.maximum(arrival[:, None], self.starts[candidates])
+        ok = begin + self.dwell <= self.ends[candidates]
+        return np.where(ok, begin, np.inf)
+
+    def schedule(self, route):
+        """Start time at every stop of `route` (first and last nodes excluded), or None if a window is missed."""
+        self.checks += 1
+        travel, dwell = self.travel, self.dwell
+        clock_ = self.day_start
+        previous = route[0]
+        starts = []
+        for node in route[1:-1]:
+            arrival = clock_ + float(travel[previous, node])
+            for start, end in self.windows[node]:
+                begin = max(arrival, start)
+                if begin + dwell <= end:
+                    break
+            else:
+                return None
+            starts.append(begin)
+            clock_ = begin + dwell
+            previous = node
+        return starts
+
+    def cost(self, route):
+        return float(self.travel[route[:-1], route[1:]].sum())
+
+    def nearest_neighbour(self):
+        route = [self.first]
+        visited = np.zeros(self.n, dtype=bool)
+        candidates = np.arange(self.n)
+        clock_ = self.day_start
+        while True:
+            begin = self.begin_times(clock_ + self.travel[route[-1], : self.n].astype(np.float64), candidates)
+            slot = begin.argmin(axis=1)
+            begin = begin[candidates, slot]
+            begin[visited] = np.inf
+            soonest = begin.min()
+            if not np.isfinite(soonest):
+                break
+            # Among stops that can start as soon, take the one whose window closes first.
+            ties = np.flatnonzero(begin <= soonest + 0.5)
+            node = int(ties[np.argmin(self.ends[ties, slot[ties]])])
+            route.append(node)
+            visited[node] = True
+            clock_ = begin[node] + self.dwell
+        route.append(self.free)
+        return route
+
+    def two_opt(self, route):
+        r = np.asarray(route)
+        a, b = r[:-1], r[1:]
+        edge = self.travel[a, b]
+        delta = self.travel[a[:, None], a[None, :]] + self.travel[b[:, None], b[None, :]]
+        delta -= edge[:, None] + edge[None, :]
+        # Reversing route[i+1..j]; the segment must hold at least two stops.
+        delta[np.tril_indices(len(a), 1)] = 0
+        for flat in np.argsort(delta, axis=None)[:MOVE_CHECKS]:
+            i, j = divmod(int(flat), len(a))
+            if delta[i, j] >= -1e-3:
+                break
+            candidate = route[: i + 1] + route[i + 1 : j + 1][::-1] + route[j + 1 :]
+            if self.schedule(candidate) is not None:
+                return candidate
+        return None
+
+    def or_opt(self, route):
+        r = np.asarray(route)
+        length = len(r)
+        best = None
+        for size in (1, 2, 3):
+            if length - 2 < size:
+                break
+            first = np.arange(1, length - size)  # segment r[s .. s+size-1]
+            head, tail = r[first], r[first + size - 1]
+            before, after = r[first - 1], r[first + size]
+            gain = self.travel[before, head] + self.travel[tail, after] - self.travel[before, after]
+            a, b = r[:-1], r[1:]
+            cost = self.travel[a[None, :], head[:, None]] + self.travel[tail[:, None], b[None, :]]
+            cost -= self.travel[a, b][None, :]
+            delta = cost - gain[:, None]
+            positions = np.arange(length - 1)
+            delta[(positions[None, :] >= first[:, None] - 1) & (positions[None, :] <= first[:, None] + size - 1)] = 0
+            for flat in np.argsort(delta, axis=None)[:MOVE_CHECKS]:
+                s_index, p = divmod(int(flat), length - 1)
+                if delta[s_index, p] >= -1e-3 or (best is not None and delta[s_index, p] >= best[0]):
+                    break
+                s = int(first[s_index])
+                segment = route[s : s + size]
+                rest = route[:s] + route[s + size :]
+                at = p + 1 if p < s else p + 1 - size
+                candidate = rest[:at] + segment + rest[at:]
+                if self.schedule(candidate) is not None:
+                    best = (delta[s_index, p], candidate)
+                    break
+        return None if best is None else best[1]
+
+    def improve(self, route):
+        while True:
+            candidate = self.two_opt(route) or self.or_opt(route)
+            if candidate is None:
+                return route
+            route = candidate
+
+    def insert(self, route):
+        """Add left-out places by cheapest feasible insertion; return how many were added."""
+        added = 0
+        while True:
+            in_route = np.zeros(len(self.travel), dtype=bool)
+            in_route[route] = True
+            left = np.flatnonzero(~in_route[: self.n])
+            if not len(left):
+                return added
+            starts = self.schedule(route)
+            leave = np.array([self.day_start] + [start + self.dwell for start in starts])
+            r = np.asarray(route)
+            a, b = r[:-1], r[1:]
+            # Only pairs where the place itself can still be reached inside one of its windows.
+            arrival = leave[None, :] + self.travel[a[None, :], left[:, None]]
+            reachable = np.isfinite(self.begin_times(arrival.ravel(), np.repeat(left, len(a))).min(axis=1))
+            delta = self.travel[a[None, :], left[:, None]] + self.travel[left[:, None], b[None, :]]
+            delta -= self.travel[a, b][None, :]
+            delta = np.where(reachable.reshape(delta.shape), delta, np.inf)
+            for flat in np.argsort(delta, axis=None)[:INSERTION_CHECKS]:
+                u, p = divmod(int(flat), len(a))
+                if not np.isfinite(delta[u, p]):
+                    return added  # every remaining pair is unreachable
+                candidate = route[: p + 1] + [int(left[u])] + route[p + 1 :]
+                if self.schedule(candidate) is not None:
+                    route[:] = candidate
+                    added += 1
+                    break
+            else:
+                return added
+
+    def solve(self, rounds=20):
+        route = self.nearest_neighbour()
+        for _ in range(rounds):
+            route = self.improve(route)
+            if not self.insert(route):
+                break
+        return route
+
+
+def select_places(places, numbers=None, accessibility=None):
+    selected = []
+    for index, place in enumerate(places):
+        number = place.get("place_number") or index + 1
+        if numbers and number not in numbers:
+            continue
+        if accessibility and place.get("accessibility") not in accessibility:
+            continue
+        if not (place.get("coordinates") or {}).get("lat"):
+            continue
+        selected.append((number, place))
+    return selected
+
+
+def plan_day(
+    selected, day, span=None, dwell=20, speed_kmh=12.0, detour=1.3, start_at=None, strict=False, tz="Europe/Berlin"
+):
+    lat = [place["coordinates"]["lat"] for _, place in selected]
+    lng = [place["coordinates"]["lng"] for _, place in selected]
+    sunrise, sunset = sun_times(day, float(np.mean(lat)), float(np.mean(lng)), tz)
+    span = span or (sunrise - 45, sunset + 45)
+
+    windows, best, skipped = [], [], []
+    for number, place in selected:
+        place_windows_, best_time, reason = place_windows(place, day, sunrise, sunset, span, dwell, strict)
+        windows.append(place_windows_)
+        best.append((best_time, reason))
+        if not place_windows_:
+            skipped.append({"place_number": number, "title": place.get("title"), "reason": reason})
+
+    minutes_per_metre = detour / (speed_kmh * 1000 / 60)
+    depot = [start_at] if start_at else []
+    travel = travel_matrix(lat + [p[0] for p in depot], lng + [p[1] for p in depot], minutes_per_metre)
+    solver = TourSolver(travel, windows, dwell, span[0], depot=bool(start_at))
+    route = solver.solve()
+    starts = solver.schedule(route)
+
+    stops = []
+    leave = span[0]
+    previous = route[0]
+    for node, start in zip(route[1:-1], starts):
+        number, place = selected[node]
+        travel_minutes = float(travel[previous, node])
+        best_time, note = best[node]
+        stops.append(
+            {
+                "place_number": number,
+                "title": place.get("title"),
+                "lat": place["coordinates"]["lat"],
+                "lng": place["coordinates"]["lng"],
+                "arrive": clock(leave + travel_minutes),
+                "start": clock(start),
+                "leave": clock(start + dwell),
+                "travel_km": round(travel_minutes / minutes_per_metre / 1000, 2),
+                "travel_minutes": round(travel_minutes, 1),
+                "best_time": best_time,
+                "windows": [f"{clock(s)}-{clock(e)}" for s, e in windows[node]],
+                **({"note": note} if note else {}),
+            }
+        )
+        leave, previous = start + dwell, node
+
+    visited = {stop["place_number"] for stop in stops}
+    skipped += [
+        {"place_number": number, "title": place.get("title"), "reason": "no time left"}
+        for (number, place), place_windows_ in zip(selected, windows)
+        if place_windows_ and number not in visited
+    ]
+    return {
+        "date": day.isoformat(),
+        "sunrise": clock(sunrise),
+        "sunset": clock(sunset),
+        "day": [clock(span[0]), clock(span[1])],
+        "settings": {"dwell_minutes": dwell, "speed_kmh": speed_kmh, "detour": detour, "strict": strict},
+        "start_at": list(start_at) if start_at else None,
+        "stops": stops,
+        "skipped": skipped,
+        "travel_km": round(sum(stop["travel_km"] for stop in stops), 2),
+        "travel_minutes": round(sum(stop["travel_minutes"] for stop in stops), 1),
+        "schedule_checks": solver.checks,
+    }
+
+
+def print_tour(tour, places_count):
+    print(f"Tour for {tour['date']}: sunrise {tour['sunrise']}, sunset {tour['sunset']}, day {'-'.join(tour['day'])}")
+    for index, stop in enumerate(tour["stops"], 1):
+        flag = "" if stop["best_time"] else "  (outside best time)"
+        note = f"  [{stop['note']}]" if stop.get("note") else ""
+        print(
+            f"{index:3d}. {stop['start']}-{stop['leave']}  {stop['travel_km']:5.1f} km  "
+            f"#{stop['place_number']:<3d} {stop['title']}{flag}{note}"
+        )
+    reasons = {}
+    for entry in tour["skipped"]:
+        reasons[entry["reason"]] = reasons.get(entry["reason"], 0) + 1
+    print(
+        f"Visited {len(tour['stops'])} of {places_count} places, {tour['travel_km']:.1f} km "
+        f"({tour['travel_minutes'] / 60:.1f} h) of travel"
+    )
+    if reasons:
+        print("Skipped: " + ", ".join(f"{count} {reason}" for reason, count in sorted(reasons.items())))
+
+
+def main():
+    default_places = Path(__file__).resolve().parent.parent / "output" / "places.json"
+    parser = argparse.ArgumentParser(description="Plan a one-day photo tour with opening hours and best-light windows.")
+    parser.add_argument("places", nargs="?", default=str(default_places), help="places.json from extract_places.py")
+    parser.add_argument("--date", default=None, help="Shoot date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--start", default=None, help="Day start HH:MM (default: 45 min before sunrise)")
+    parser.add_argument("--end", default=None, help="Day end HH:MM (default: 45 min after sunset)")
+    parser.add_argument("--from", dest="start_at", default=None, help="Start point LAT,LNG (default: first stop)")
+    parser.add_argument("--dwell", type=float, default=20, help="Minutes spent at each place")
+    parser.add_argument(
+        "--speed-kmh",
+        type=float,
+        default=12,
+        help="Average door-to-door speed: about 4.5 walking, 12 by bike or U-/S-Bahn",
+    )
+    parser.add_argument("--detour", type=float, default=1.3, help="Street distance over straight-line distance")
+    parser.add_argument("--places", dest="numbers", default=None, help="Comma-separated place numbers to choose from")
+    parser.add_argument("--accessibility", default=None, help="Comma-separated levels to keep, e.g. easy,medium")
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Skip places whose best time does not fit their opening hours instead of shooting them anyway",
+    )
+    parser.add_argument("--tz", default="Europe/Berlin", help="Time zone for sunrise and sunset")
+    parser.add_argument("-o", "--output", default=None, help="Write the tour as JSON")
+    args = parser.parse_args()
+
+    places = json.loads(Path(args.places).read_text(encoding="utf-8"))
+    numbers = {int(n) for n in args.numbers.split(",")} if args.numbers else None
+    accessibility = set(args.accessibility.split(",")) if args.accessibility else None
+    selected = select_places(places, numbers, accessibility)
+    if not selected:
+        parser.error("no places with coordinates match the selection")
+    day = Date.fromisoformat(args.date) if args.date else Date.today()
+    start_at = tuple(float(v) for v in args.start_at.split(",")) if args.start_at else None
+
+    span = None
+    if args.start or args.end:
+        coordinates = selected[0][1]["coordinates"]
+        sunrise, sunset = sun_times(day, coordinates["lat"], coordinates["lng"], args.tz)
+        span = (
+            parse_clock(args.start) if args.start else sunrise - 45,
+            parse_clock(args.end) if args.end else sunset + 45,
+        )
+    tour = plan_day(selected, day, span, args.dwell, args.speed_kmh, args.detour, start_at, args.strict, args.tz)
+    print_tour(tour, len(selected))
+    if args.output:
+        Path(args.output).write_text(json.dumps(tour, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -96,6 +96,83 @@ const getPlaceImages = (place) => {
   return [];
 };
 
+const variantsFor = (place, src) =>
+  (place.image_variants && place.image_variants[src]) || [];
+
+const srcsetFor = (variants) =>
+  variants.map((variant) => `${variant.path} ${variant.width}w`).join(", ");
+
+// Responsive image built from build_image_variants.py output; falls back to the
+// full-size file when a place has no variants. The full-size file is only
+// fetched when the image is clicked.
+const pictureFor = (place, src, alt, sizes) => {
+  const variants = variantsFor(place, src);
+  const img = document.createElement("img");
+  img.alt = alt;
+  img.loading = "lazy";
+  if (!variants.length) {
+    img.src = src;
+    return img;
+  }
+
+  const picture = document.createElement("picture");
+  const formats = [...new Set(variants.map((variant) => variant.format))];
+  formats
+    .filter((format) => format !== "jpeg")
+    .forEach((format) => {
+      const source = document.createElement("source");
+      source.type = `image/${format}`;
+      source.srcset = srcsetFor(variants.filter((variant) => variant.format === format));
+      source.sizes = sizes;
+      picture.appendChild(source);
+    });
+
+  const fallback = variants.filter((variant) => variant.format === "jpeg");
+  if (fallback.length) {
+    img.srcset = srcsetFor(fallback);
+    img.sizes = sizes;
+    img.src = fallback[0].path;
+  } else {
+    img.src = src;
+  }
+  picture.appendChild(img);
+
+  const link = document.createElement("a");
+  link.href = src;
+  link.target = "_blank";
+  link.rel = "noopener noreferrer";
+  link.className = "panel-hero-link";
+  link.appendChild(picture);
+  return link;
+};
+
+const thumbnailFor = (place) => {
+  if (place.thumb) return place.thumb;
+  const images = getPlaceImages(place);
+  if (!images.length) return null;
+  const variants = variantsFor(place, images[0]);
+  if (!variants.length) return null;
+  return variants.reduce((best, variant) => (variant.bytes < best.bytes ? variant : best)).path;
+};
+
+const tooltipFor = (place) => {
+  const thumbnail = thumbnailFor(place);
+  const content = document.createElement("div");
+  content.className = "marker-tooltip";
+  if (thumbnail) {
+    const img = document.createElement("img");
+    img.src = thumbnail;
+    img.alt = "";
+    content.appendChild(img);
+  }
+  const label = document.createElement("span");
+  label.textContent = place.title || "Untitled";
+  content.appendChild(label);
+  return content;
+};
+
+const PANEL_IMAGE_SIZES = "(max-width: 900px) 100vw, 420px";
+
 const renderPanel = (place) => {
   panelTitle.textContent = place.title || "Untitled";
   panelLocation.innerHTML = "";
@@ -149,18 +226,14 @@ const renderPanel = (place) => {
   const images = getPlaceImages(place);
   if (images.length) {
     if (images.length === 1) {
-      const img = document.createElement("img");
-      img.src = images[0];
-      img.alt = place.title || "";
-      panelHero.appendChild(img);
+      panelHero.appendChild(pictureFor(place, images[0], place.title || "", PANEL_IMAGE_SIZES));
     } else {
       const gallery = document.createElement("div");
       gallery.className = "panel-hero-gallery";
       images.forEach((src, index) => {
-        const img = document.createElement("img");
-        img.src = src;
-        img.alt = `${place.title || ""} (${index + 1})`;
-        gallery.appendChild(img);
+        gallery.appendChild(
+          pictureFor(place, src, `${place.title || ""} (${index + 1})`, PANEL_IMAGE_SIZES)
+        );
       });
       panelHero.appendChild(gallery);
     }
@@ -191,15 +264,76 @@ const markerFor = (place) => {
   });
 };
 
-fetch("data/places.json")
-  .then((resp) => resp.json())
+// Marker index + lazily fetched detail shards written by export_web_bundle.py.
+// Falls back to the monolithic places.json when no bundle has been exported.
+const BUNDLE_ROOT = "data/bundle/";
+const shardRequests = new Map();
+
+const loadShard = (name) => {
+  if (!shardRequests.has(name)) {
+    shardRequests.set(
+      name,
+      fetch(BUNDLE_ROOT + name).then((resp) => {
+        if (!resp.ok) throw new Error(`Failed to load ${name}: ${resp.status}`);
+        return resp.json();
+      })
+    );
+  }
+  return shardRequests.get(name);
+};
+
+const placesFromIndex = (index) =>
+  index.places.map((row) => {
+    const entry = Object.fromEntries(index.fields.map((field, i) => [field, row[i]]));
+    const place = {
+      id: entry.id,
+      title: entry.title,
+      accessibility: entry.accessibility,
+      coordinates: entry.lat != null && entry.lng != null ? { lat: entry.lat, lng: entry.lng } : null,
+      thumb: entry.thumb || null,
+    };
+    const shard = index.shards[Math.floor(entry.id / index.shard_size)];
+    place.loadDetails = () =>
+      loadShard(shard).then((details) => ({ ...place, ...details[String(entry.id)] }));
+    return place;
+  });
+
+const loadPlaces = () =>
+  fetch(`${BUNDLE_ROOT}bundle.json`, { cache: "no-cache" })
+    .then((resp) => {
+      if (!resp.ok) throw new Error(`No bundle (${resp.status})`);
+      return resp.json();
+    })
+    .then((bundle) => loadShard(bundle.index))
+    .then(placesFromIndex)
+    .catch((err) => {
+      console.warn("Falling back to data/places.json:", err.message);
+      return fetch("data/places.json").then((resp) => resp.json());
+    });
+
+const openPlace = (place) => {
+  if (!place.loadDetails) {
+    renderPanel(place);
+    return;
+  }
+  panelTitle.textContent = place.title || "Untitled";
+  place
+    .loadDetails()
+    .then(renderPanel)
+    .catch((err) => {
+      panelLocation.textContent = "Failed to load details.";
+      console.error(err);
+    });
+};
+
+loadPlaces()
   .then((places) => {
     const markers = [];
     places.forEach((place) => {
       if (!place.coordinates) return;
       const marker = markerFor(place).addTo(map);
-      marker.on("click", () => renderPanel(place));
-      marker.bindTooltip(place.title || "Untitled", {
+      marker.on("click", () => openPlace(place));
+      marker.bindTooltip(tooltipFor(place), {
         direction: "top",
         opacity: 0.85,
       });
@@ -0,0 +1,125 @@
+"""Rewrite engine for the address abbreviation/typo table.
+
+Rules live in `address_rules.json` as ordered stages of `{pattern, replacement}`
+entries, applied one after another exactly like the `re.sub` chain they were
+taken from: later rules see earlier rules' output, and that matters, since
+expanding `Av.` to `Avenida` changes the word boundaries the next rule tests
+(`Av.Menton`, `Avda.Cnel.`). Most rules match a literal word, so each rule's
+literal prefix is looked up in the case-folded address first and rules whose
+prefix is absent are skipped without running their regex; a typical address
+pays for a few substring tests and one or two substitutions.
+
+`normalize_address` applies the default rules file to a raw cartilla address;
+the geocoder and the offline street index both key on its output, and
+`address_key` (normalized address plus location, folded) is what providers
+sharing one geocoding lookup have in common.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+
+from geocode_cache import cache_key
+
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().with_name("address_rules.json")
+MULTISPACE = re.compile(r"\s{2,}")
+REGEX_SPECIAL = set("\\.^$*+?{}[]|()")
+
+
+def literal_prefix(pattern: str) -> str | None:
+    """Text every match of `pattern` starts with (after `\\b` and `\\s*`), if obvious.
+
+    Only plain characters up to the first regex construct count, minus the
+    last one when a quantifier makes it optional. Patterns with a top-level
+    alternation, or without a literal start, return None and are always run.
+    """
+    if "|" in pattern:
+        return None
+    while pattern.startswith("\\b") or pattern.startswith("\\s*"):
+        pattern = pattern[2:] if pattern.startswith("\\b") else pattern[3:]
+    end = 0
+    while end < len(pattern) and pattern[end] not in REGEX_SPECIAL:
+        end += 1
+    if end < len(pattern) and pattern[end] in "?*{":
+        end -= 1
+    return pattern[:end] or None
+
+
+def fold_for_prefilter(text: str) -> str:
+    # casefold() covers what re.IGNORECASE matches, except dotless ı, which it matches to i.
+    return text.casefold().replace("\u0131", "i")
+
+
+class RuleStage:
+    """One stage's rules, applied in order; each rule is skipped when its literal prefix is absent."""
+
+    def __init__(self, rules: list[dict]) -> None:
+        self.rules = []
+        for rule in rules:
+            ignore_case = rule.get("ignore_case", True)
+            prefix = literal_prefix(rule["pattern"])
+            if prefix is not None and ignore_case:
+                prefix = fold_for_prefilter(prefix)
+            regex = re.compile(rule["pattern"], re.IGNORECASE if ignore_case else 0)
+            self.rules.append((regex, rule["replacement"], prefix, ignore_case))
+
+    def apply(self, text: str) -> str:
+        folded = None
+        for regex, replacement, prefix, ignore_case in self.rules:
+            if prefix is not None:
+                if not ignore_case:
+                    if prefix not in text:
+                        continue
+                else:
+                    if folded is None:
+                        folded = fold_for_prefilter(text)
+                    if prefix not in folded:
+                        continue
+            rewritten = regex.sub(replacement, text)
+            if rewritten != text:
+                text = rewritten
+                folded = None
+        return text
+
+
+class AddressRewriter:
+    """Precompiled `cleanup` and `rewrite` stages loaded from a rules file."""
+
+    def __init__(self, rules: dict) -> None:
+        self.cleanup = RuleStage(rules.get("cleanup", []))
+        self.rewrite = RuleStage(rules.get("rewrite", []))
+
+    @classmethod
+    def from_file(cls, path: Path = DEFAULT_RULES_PATH) -> "AddressRewriter":
+        return cls(json.loads(path.read_text(encoding="utf-8")))
+
+    def apply(self, text: str) -> str:
+        text = self.cleanup.apply(text)
+        text = MULTISPACE.sub(" ", text).strip(" ,;-")
+        text = self.rewrite.apply(text)
+        return " ".join(text.split())
+
+
+# Abbreviation/typo table from address_rules.json, compiled once per process.
+ADDRESS_REWRITER = AddressRewriter.from_file()
+
+
+def normalize_text(value: str | None) -> str:
+    if not value:
+        return ""
+    return " ".join(value.replace("\u00a0", " ").split())
+
+
+def normalize_address(value: str | None) -> str:
+    text = normalize_text(value)
+    if not text:
+        return ""
+    return ADDRESS_REWRITER.apply(text)
+
+
+def address_key(provider: dict) -> str:
+    """Canonical identity of a provider's address: everything the query variants depend on."""
+    return cache_key(f"{normalize_address(provider.get('address'))}, {normalize_text(provider.get('location'))}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Check and time the compiled address rewriter against the original rule chain.
+
+`legacy_normalize_address` is the sequential `re.sub` implementation that
+`normalize_address` replaced, kept verbatim as the reference. The script
+first asserts both produce identical output for every provider address (and
+every address prefix in the geocode cache, if present), for `EDGE_CASES`,
+and for `--fuzz` addresses stitched together from the rules' own words with
+random separators and case, then times both over the full providers list.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from geocode_cartilla_medica import normalize_address, normalize_text
+
+
+def legacy_normalize_address(value: str | None) -> str:
+    text = normalize_text(value)
+    if not text:
+        return ""
+
+    text = re.sub(r"\bPiso-Depto\.?:\s*[^-]*", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bPiso-Depto\.?\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bDepto\.?:\s*[^-]*", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bPta\.?\s*Baja\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s*-\s*Ciudad Autónoma De Buenos Aires\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s*-\s*Ciudad De Buenos Aires\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s*-\s*CABA\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bDirec\b\.?", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bDepto\b\.?", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bPb\b\.?", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\bPb\b", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\b1°\b", "1", text)
+    text = re.sub(r"\b2º\b", "2", text)
+    text = re.sub(r"\b3º\b", "3", text)
+    text = re.sub(r"\b4º\b", "4", text)
+    text = re.sub(r"\b5°\b", "5", text)
+    text = re.sub(r"\b1834\s+1834\b", "1834", text)
+    text = re.sub(r"\s{2,}", " ", text).strip(" ,;-")
+
+    regex_rules = [
+        (r"\bPeron\s*,\s*Pte\.?\b", "Teniente General Juan Domingo Peron"),
+        (r"\bPte\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
+        (r"\bTte\.?\s+Gral\.?\s+Juan\s+Domingo\s+Peron\b", "Teniente General Juan Domingo Peron"),
+        (r"\bTte\.?\s+Gral\.?\s+J\.?\s*D\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
+        (r"\bTte\.?\s+G\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
+        (r"\bTte\.?\s+Gral\b\.?", "Teniente General"),
+        (r"\bTte\.?\b", "Teniente"),
+        (r"\bAvda\.?\b", "Avenida"),
+        (r"\bAv\.?\b", "Avenida"),
+        (r"\bGral\.?\b", "General"),
+        (r"\bDr\.?\b", "Doctor"),
+        (r"\bDra\.?\b", "Doctora"),
+        (r"\bCnel\.?\b", "Coronel"),
+        (r"\bBme\b", "Bartolome"),
+        (r"\bPuyrredon\b", "Pueyrredon"),
+        (r"\bBillingurst\b", "Billinghurst"),
+        (r"\bMent[oó]n\b", "Melián"),
+        (r"\bMenton\b", "Melian"),
+        (r"\bAv\.?\s*Ment[oó]n\b", "Avenida Melián"),
+        (r"\bAvenida\.?\s*Ment[oó]n\b", "Avenida Melián"),
+        (r"\bJuan\s*R\.?\s*De\s*Velasco\b", "Juan Ramírez de Velasco"),
+        (r"\bLobo\s*De\s*La\s*Vega\b", "Lope de Vega"),
+        (r"\bBaldomero\s*Fdez\s*Moreno\b", "Baldomero Fernández Moreno"),
+        (r"\bAv\.?\s*Gral\.?\s*J\.?\s*G\.?\s*Artigas\b", "Avenida General José Gervasio Artigas"),
+        (r"\bAvenida\.?\s*General\.?\s*J\.?\s*G\.?\s*Artigas\b", "Avenida General José Gervasio Artigas"),
+        (r"\bTte\.?\s*Gral\.?\s*J\.?\s*D\.?\s*Per[oó]n\b", "Teniente General Juan Domingo Perón"),
+        (r"\bTeniente General\s+J\.?\s*D\.?\s*Per[oó]n\b", "Teniente General Juan Domingo Perón"),
+        (r"\bPte\.?\b", "Presidente"),
+        (r"\bJ\.?\s*D\.?\s+Peron\b", "Juan Domingo Peron"),
+        (r"\bJuan\s+D\.?\s+Peron\b", "Juan Domingo Peron"),
+        (r"\bM\.?\b", "Mariscal"),
+    ]
+    for pattern, replacement in regex_rules:
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+
+    return " ".join(text.split())
+
+
+# Abbreviations glued to the next word, where expanding one changes the word
+# boundary the following rule sees.
+EDGE_CASES = [
+    "Av. Menton 1234",
+    "Av.Menton 1234",
+    "Avda.Menton 560",
+    "Avda.Cnel. Diaz 2421",
+    "Dr.Mentón 12",
+    "Tte.Gral.D. Peron 2314",
+    "Av.M. Acosta 30",
+    "R. Dr.Pte 50",
+    "3 B, 1°Piso-Depto.:D. 4",
+    "Av. Gral. J.G. Artigas 1200",
+    "Tte. Gral. J.D. Perón 1500",
+]
+
+FUZZ_WORDS = [
+    "Av", "Av.", "Avda.", "Avenida", "Tte", "Tte.", "Gral", "Gral.", "G.", "J.", "D.", "J.D.", "J.G.", "Juan",
+    "Domingo", "Peron", "Perón", "Pte", "Pte.", "Dr.", "Dra", "Cnel.", "Bme", "Mitre", "Puyrredon", "Billingurst",
+    "Menton", "Mentón", "R.", "De", "Velasco", "Lobo", "La", "Vega", "Baldomero", "Fdez", "Moreno", "Artigas",
+    "General", "Teniente", "M.", "Corrientes", "1234", "560", "1834", "1°", "2º", "Piso-Depto.:", "3 B", "Pb",
+    "Depto", "Pta Baja", "- CABA", "- Ciudad Autónoma De Buenos Aires", "Direc.", ",",
+]
+
+
+def fuzz_addresses(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    addresses = []
+    for _ in range(count):
+        words = [rng.choice(FUZZ_WORDS) for _ in range(rng.randint(2, 6))]
+        words = [word.upper() if rng.random() < 0.1 else word for word in words]
+        addresses.append("".join(rng.choice([" ", " ", "", ", "]) + word for word in words).strip())
+    return addresses
+
+
+def collect_addresses(document_path: Path, cache_path: Path | None) -> list[str]:
+    document = json.loads(document_path.read_text(encoding="utf-8"))
+    addresses = [provider.get("address") or "" for provider in document.get("providers", [])]
+    if cache_path is not None and cache_path.exists():
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        addresses.extend(query.split(",", 1)[0] for query in cache)
+    return addresses
+
+
+def time_function(func, addresses: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for address in addresses:
+            func(address)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    output_dir = Path(__file__).resolve().parent.parent / "output"
+    parser = argparse.ArgumentParser(description="Equivalence check and micro-benchmark for normalize_address.")
+    parser.add_argument("input", nargs="?", default=str(output_dir / "cartilla_medica.json"), help="cartilla_medica.json")
+    parser.add_argument("--cache", default=str(output_dir / "geocode_cache.json"), help="Legacy JSON cache to draw extra addresses from")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions; the best run is reported")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Generated addresses to check equivalence on")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated addresses")
+    args = parser.parse_args()
+
+    addresses = collect_addresses(Path(args.input), Path(args.cache) if args.cache else None)
+    checked = list(dict.fromkeys(addresses + EDGE_CASES + fuzz_addresses(args.fuzz, args.seed)))
+
+    mismatches = [
+        (address, expected, actual)
+        for address in checked
+        if (expected := legacy_normalize_address(address)) != (actual := normalize_address(address))
+    ]
+    for address, expected, actual in mismatches[:20]:
+        print(f"MISMATCH {address!r}\n  legacy:   {expected!r}\n  compiled: {actual!r}")
+    print(f"Equivalence: {len(checked) - len(mismatches)}/{len(checked)} distinct addresses match")
+
+    legacy_time = time_function(legacy_normalize_address, addresses, args.repeat)
+    compiled_time = time_function(normalize_address, addresses, args.repeat)
+    print(f"Addresses: {len(addresses)}")
+    print(f"legacy:   {legacy_time * 1000:8.2f} ms ({legacy_time / len(addresses) * 1e6:.1f} us/address)")
+    print(f"compiled: {compiled_time * 1000:8.2f} ms ({compiled_time / len(addresses) * 1e6:.1f} us/address)")
+    print(f"speedup:  {legacy_time / compiled_time:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Compare the columnar provider export with the pretty-printed JSON.
+
+For the same document (optionally with every provider replicated `--scale`
+times, to stand in for a nationwide cartilla) this reports file sizes and the
+time to:
+
+* parse the JSON output (what every downstream tool does today);
+* open the columnar file and read the columns a map or filter needs
+  (specialty, lat, lon);
+* rebuild every provider dict from the columns;
+* write both formats.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from provider_columns import ProviderColumns, write_columns
+from provider_spatial_index import default_paths
+
+
+def best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Benchmark the columnar provider export against JSON.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Cartilla JSON (geocoded or not)")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate providers this many times")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs per measurement")
+    args = parser.parse_args()
+
+    document = json.loads(Path(args.input).expanduser().read_text(encoding="utf-8"))
+    document["providers"] = document.get("providers", []) * args.scale
+    count = len(document["providers"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "cartilla.json"
+        columns_path = Path(tmp) / "cartilla.columns.npz"
+        compressed_path = Path(tmp) / "cartilla.columns.deflate.npz"
+
+        def write_json() -> None:
+            json_path.write_bytes((json.dumps(document, ensure_ascii=False, indent=2) + "\n").encode("utf-8"))
+
+        json_write = best_of(args.repeat, write_json)
+        columns_write = best_of(args.repeat, lambda: write_columns(columns_path, document))
+        write_columns(compressed_path, document, compress=True)
+
+        def load_json() -> None:
+            json.loads(json_path.read_bytes())
+
+        def open_columns() -> None:
+            with ProviderColumns(columns_path) as columns:
+                columns.column("specialty")
+                np.asarray(columns.column("lat")) + np.asarray(columns.column("lon"))
+
+        def rebuild_providers() -> None:
+            with ProviderColumns(columns_path) as columns:
+                list(columns)
+
+        def open_compressed() -> None:
+            with ProviderColumns(compressed_path) as columns:
+                columns.column("specialty")
+                np.asarray(columns.column("lat")) + np.asarray(columns.column("lon"))
+
+        rows = [
+            ("json parse", json_path.stat().st_size, best_of(args.repeat, load_json)),
+            ("columns: specialty+lat+lon", columns_path.stat().st_size, best_of(args.repeat, open_columns)),
+            ("columns: all provider dicts", columns_path.stat().st_size, best_of(args.repeat, rebuild_providers)),
+            ("deflated: specialty+lat+lon", compressed_path.stat().st_size, best_of(args.repeat, open_compressed)),
+        ]
+
+    print(f"Providers: {count}")
+    print(f"{'load':30s} {'bytes':>12s} {'ms':>9s}")
+    for name, size, seconds in rows:
+        print(f"{name:30s} {size:12d} {seconds * 1000:9.2f}")
+    print(f"write: json {json_write * 1000:.1f} ms, columns {columns_write * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Load-test the provider query server with concurrent keep-alive clients.
+
+Requests are a mix of `/search` (name/specialty prefixes, specialty and
+barrio filters), `/near` (k nearest and radius queries around random located
+providers) and `/sections`, generated from the same cartilla JSON. Each
+client keeps one connection open and sends its next request as soon as the
+previous response arrives; the report gives throughput and latency
+percentiles per endpoint and overall. Without `--url`, a server is started
+on a free local port for the duration of the run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from provider_query_server import barrio_of
+from provider_search_index import tokenize
+from provider_spatial_index import default_paths
+
+
+def build_targets(document: dict, count: int, rng: random.Random) -> list[str]:
+    providers = document.get("providers", [])
+    located = [p for p in providers if p.get("lat") is not None and p.get("lon") is not None]
+    barrios = sorted({b for b in map(barrio_of, located) if b})
+    targets = []
+    for _ in range(count):
+        provider = rng.choice(providers)
+        kind = rng.random()
+        if kind < 0.45:
+            text = f"{provider.get('specialty') or ''} {provider.get('name') or ''}"
+            words = [token for token in tokenize(text) if len(token) > 2]
+            query = " ".join(word[: rng.randint(3, len(word))] for word in rng.sample(words, min(2, len(words))))
+            target = f"/search?q={quote(query)}"
+            if barrios and rng.random() < 0.3:
+                target += f"&barrio={quote(rng.choice(barrios))}"
+        elif kind < 0.55:
+            target = f"/search?specialty={quote(provider.get('specialty') or '')}&limit=50"
+        elif kind < 0.95 and located:
+            anchor = rng.choice(located)
+            lat = anchor["lat"] + rng.uniform(-0.01, 0.01)
+            lon = anchor["lon"] + rng.uniform(-0.01, 0.01)
+            target = f"/near?lat={lat:.6f}&lon={lon:.6f}"
+            if rng.random() < 0.5:
+                target += f"&specialty={quote(anchor.get('specialty') or '')}"
+            target += f"&radius={rng.choice((300, 800, 2000))}" if rng.random() < 0.5 else "&limit=10"
+        else:
+            target = "/sections"
+        targets.append(target)
+    return targets
+
+
+async def client(host: str, port: int, targets: list[str], latencies: dict[str, list[float]], errors: list[str]):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b""):
+                    break
+                name, _, value = header.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            elapsed = time.perf_counter() - started
+            if b" 200 " not in status_line:
+                errors.append(f"{status_line.decode().strip()} for {target}")
+            latencies.setdefault(urlsplit(target).path, []).append(elapsed)
+    finally:
+        writer.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(host: str, port: int, targets: list[str], clients: int):
+    latencies: dict[str, list[float]] = {}
+    errors: list[str] = []
+    shares = [targets[n::clients] for n in range(clients)]
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, share, latencies, errors) for share in shares if share))
+    return time.perf_counter() - started, latencies, errors
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(input_path: str, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("provider_query_server.py")), input_path, "--port", str(port)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    # The server reports on stderr once it is listening.
+    for line in server.stderr:
+        if line.startswith("Serving"):
+            return server
+    server.kill()
+    raise SystemExit("provider_query_server.py exited before listening")
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Load-test provider_query_server.py.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Geocoded cartilla JSON")
+    parser.add_argument("--url", default=None, help="Running server, e.g. http://127.0.0.1:8765 (default: start one)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="Concurrent connections per round")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per round")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    document = json.loads(Path(args.input).expanduser().read_text(encoding="utf-8"))
+    targets = build_targets(document, args.requests, random.Random(args.seed))
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = start_server(args.input, port)
+    try:
+        asyncio.run(run(host, port, targets[: min(200, len(targets))], 4))  # warm-up
+        for clients in args.clients:
+            elapsed, latencies, errors = asyncio.run(run(host, port, targets, clients))
+            overall = [value for values in latencies.values() for value in values]
+            print(
+                f"{clients:3d} clients: {len(overall) / elapsed:8.0f} req/s, "
+                f"p50 {percentile(overall, 0.5) * 1000:6.2f} ms, p99 {percentile(overall, 0.99) * 1000:6.2f} ms"
+                + (f", {len(errors)} errors (first: {errors[0]})" if errors else "")
+            )
+            for path, values in sorted(latencies.items()):
+                print(
+                    f"    {path:10s} {len(values):6d} requests, "
+                    f"p50 {percentile(values, 0.5) * 1000:6.2f} ms, p99 {percentile(values, 0.99) * 1000:6.2f} ms"
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Time provider text search: substring scan over the JSON vs the inverted index.
+
+Queries are built from tokens of random providers (a specialty word plus a
+street or name word, each cut to a random prefix, as typed into a search box)
+and each is answered by a folded substring scan over every record, by a
+token-prefix scan with the same semantics as the index, and by
+`SearchIndex.search`, after checking that the index returns the same providers
+as the token scan. `--scale N` replicates every provider N times to simulate a
+larger (e.g. nationwide) cartilla.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from geocode_cache import fold_text
+from provider_search_index import FIELDS, SearchIndex, default_paths, tokenize
+
+
+def mean_ms(func, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def random_query(rng: random.Random, provider: dict) -> str:
+    words = []
+    for field in ("specialty", rng.choice(("name", "address"))):
+        tokens = [t for t in tokenize(provider.get(field) or "") if len(t) > 2]
+        if tokens:
+            token = rng.choice(tokens)
+            words.append(token[: rng.randint(3, len(token))])
+    return " ".join(words)
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Benchmark the provider search index against a linear scan.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Cartilla JSON")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate providers this many times")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random queries")
+    parser.add_argument("--limit", type=int, default=20, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    document = json.loads(Path(args.input).read_text(encoding="utf-8"))
+    providers = document.get("providers", []) * max(1, args.scale)
+
+    start = time.perf_counter()
+    index = SearchIndex.build(providers)
+    build_s = time.perf_counter() - start
+
+    folded = [" ".join(fold_text(p.get(field) or "") for field in FIELDS) for p in providers]
+    token_sets = [set(tokenize(text)) for text in folded]
+
+    def substring_scan(query):
+        words = fold_text(query).split()
+        return [i for i, text in enumerate(folded) if all(word in text for word in words)][: args.limit]
+
+    def token_scan(query):
+        words = tokenize(query)
+        return [
+            i for i, tokens in enumerate(token_sets) if all(any(t.startswith(w) for t in tokens) for w in words)
+        ]
+
+    rng = random.Random(args.seed)
+    queries = [random_query(rng, rng.choice(providers)) for _ in range(args.queries)]
+
+    for query in queries[:20]:
+        expected = token_scan(query)
+        got = index.search(query, limit=len(providers))
+        assert sorted(i for _, i in got) == expected, query
+
+    scan_queries = queries[: max(1, min(len(queries), 200_000 // max(1, len(providers))))]
+    print(f"Providers: {len(providers)}, queries: {len(queries)}, index build {build_s * 1000:.1f} ms")
+    print(f"substring scan: {mean_ms(substring_scan, scan_queries):9.3f} ms/query")
+    print(f"token scan:     {mean_ms(token_scan, scan_queries):9.3f} ms/query")
+    print(f"index search:   {mean_ms(lambda q: index.search(q, args.limit), queries):9.3f} ms/query")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Time nearest-provider queries: linear haversine scan vs the spatial index.
+
+Queries random points within ~2 km of random providers (someone looking for a
+doctor near where they are) and reports the mean per-query time of a
+pure-Python scan, a vectorised NumPy scan, and `SpatialIndex.nearest`/`within`,
+after checking every query's index answer against the NumPy scan.
+`--scale N` replicates every provider N times with ~300 m of jitter to
+simulate a larger cartilla; `--national N` instead scatters N points over
+Argentina's latitudes (-55 to -22), far from the grid's reference latitude.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from provider_spatial_index import EARTH_RADIUS_M, SpatialIndex, default_paths, haversine_m
+
+
+def python_haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def scaled_providers(providers: list[dict], scale: int, seed: int) -> list[dict]:
+    located = [p for p in providers if p.get("lat") is not None and p.get("lon") is not None]
+    if scale <= 1:
+        return located
+    rng = random.Random(seed)
+    jitter = 300 / 111_000
+    return [
+        {**p, "lat": p["lat"] + rng.uniform(-jitter, jitter), "lon": p["lon"] + rng.uniform(-jitter, jitter)}
+        for _ in range(scale)
+        for p in located
+    ]
+
+
+def national_providers(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [{"lat": rng.uniform(-55, -22), "lon": rng.uniform(-73, -53)} for _ in range(count)]
+
+
+def mean_ms(func, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Benchmark the provider spatial index against brute force.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Geocoded cartilla JSON")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate providers this many times")
+    parser.add_argument("--national", type=int, default=0, help="Use this many points spread over Argentina instead")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random query points")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per nearest query")
+    parser.add_argument("--radius", type=float, default=1000.0, help="Radius for within queries, metres")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.national:
+        providers = national_providers(args.national, args.seed)
+    else:
+        document = json.loads(Path(args.input).read_text(encoding="utf-8"))
+        providers = scaled_providers(document.get("providers", []), args.scale, args.seed)
+    lats = np.array([p["lat"] for p in providers])
+    lons = np.array([p["lon"] for p in providers])
+
+    start = time.perf_counter()
+    index = SpatialIndex.build(providers)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    spread = 2000 / 111_000
+    queries = [
+        (float(lats[i]) + rng.uniform(-spread, spread), float(lons[i]) + rng.uniform(-spread, spread))
+        for i in (rng.randrange(len(providers)) for _ in range(args.queries))
+    ]
+    k = args.k
+
+    def python_scan(lat, lon):
+        dists = sorted(python_haversine_m(lat, lon, p["lat"], p["lon"]) for p in providers)
+        return dists[:k]
+
+    def numpy_scan(lat, lon):
+        dists = haversine_m(lat, lon, lats, lons)
+        return np.sort(np.partition(dists, k - 1)[:k])
+
+    mismatches = 0
+    for lat, lon in queries:
+        dists = haversine_m(lat, lon, lats, lons)
+        expected = np.sort(np.partition(dists, k - 1)[:k])
+        got = [d for d, _ in index.nearest(lat, lon, k)]
+        within = {i for _, i in index.within(lat, lon, args.radius)}
+        mismatches += not np.allclose(got, expected) or within != set(np.flatnonzero(dists <= args.radius).tolist())
+    assert not mismatches, f"{mismatches} of {len(queries)} queries disagree with the brute-force scan"
+
+    python_queries = queries[: max(1, min(len(queries), 2_000_000 // max(1, len(providers))))]
+    print(f"Providers: {len(providers)}, queries: {len(queries)}, k={k}, index build {build_s * 1000:.1f} ms")
+    print(f"python scan:   {mean_ms(python_scan, python_queries):9.3f} ms/query")
+    print(f"numpy scan:    {mean_ms(numpy_scan, queries):9.3f} ms/query")
+    print(f"index nearest: {mean_ms(lambda lat, lon: index.nearest(lat, lon, k), queries):9.3f} ms/query")
+    print(f"index within:  {mean_ms(lambda lat, lon: index.within(lat, lon, args.radius), queries):9.3f} ms/query")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Time offline street geocoding on a synthetic OSM-like extract.
+
+Street names are taken from the cartilla addresses (so they go through the
+real `normalize_address` rules) and laid out as straight streets with a
+house-number anchor every `--step` numbers on each side, the way address
+points are spread in a Buenos Aires extract. Queries are random numbers on
+those streets written the way the geocoder's query variants are; the report
+splits the lookup into query parsing (address normalization and street-key
+matching) and locating the number (binary search plus interpolation).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from address_rules import normalize_address
+from osm_street_index import StreetIndex, street_key
+from provider_search_index import default_paths
+
+
+def per_call_us(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def synthetic_addresses(streets: list[str], max_number: int, step: int, rng: random.Random):
+    for n, street in enumerate(streets):
+        lat0, lon0 = -34.55 - rng.random() * 0.1, -58.50 + rng.random() * 0.15
+        dlat, dlon = rng.uniform(-1, 1) * 1e-5, rng.uniform(-1, 1) * 1e-5
+        for number in range(1 + n % 2, max_number, step):
+            side = 2e-4 if number % 2 else -2e-4
+            yield street, str(number), lat0 + number * dlat + side, lon0 + number * dlon, "", ""
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Benchmark StreetIndex lookups on a synthetic extract.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Cartilla JSON (for street names)")
+    parser.add_argument("--max-number", type=int, default=6000, help="Highest house number per street")
+    parser.add_argument("--step", type=int, default=7, help="Numbers between anchors on one street")
+    parser.add_argument("--queries", type=int, default=20000, help="Number of random lookups")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    document = json.loads(Path(args.input).read_text(encoding="utf-8"))
+    streets = {}
+    for provider in document.get("providers", []):
+        match = re.match(r"^(.*?\D)\s*\d", normalize_address(provider.get("address")))
+        if match and street_key(match.group(1)):
+            streets.setdefault(street_key(match.group(1)), match.group(1).strip())
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    index, stats = StreetIndex.build(synthetic_addresses(list(streets.values()), args.max_number, args.step, rng))
+    build_s = time.perf_counter() - start
+
+    names = list(streets.values())
+    suffix = "Ciudad Autónoma De Buenos Aires, Buenos Aires, Argentina"
+    queries = [f"{rng.choice(names)} {rng.randint(1, args.max_number)}, {suffix}" for _ in range(args.queries)]
+    parsed = [index.parse(query) for query in queries]
+    located = [p for p in parsed if p is not None]
+    hits = sum(1 for query in queries if index.lookup(query))
+
+    print(f"Streets: {stats['streets']}, anchors: {stats['anchors']}, build {build_s * 1000:.0f} ms")
+    print(f"Queries: {len(queries)}, parsed {len(located)}, resolved {hits}")
+    print(f"parse:  {per_call_us(index.parse, queries):7.2f} us/query")
+    print(f"locate: {per_call_us(lambda p: index.locate(*p), located):7.2f} us/query")
+    print(f"lookup: {per_call_us(index.lookup, queries):7.2f} us/query")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Diff a new cartilla extraction against the previous geocoded output.
+
+Providers are matched by a stable record identity: folded name, specialty
+and normalized address (`address_rules.normalize_address`), so a reflowed
+"Av." or a changed floor/unit does not count as a change. The address keeps
+its accents, as geocode cache keys do: "Perón" and "Peron" geocode apart. Each new provider
+is then one of:
+
+* unchanged — same identity as a previous provider; its coordinates,
+  geocode and geocode query are carried over;
+* moved — same name and specialty as a previous provider that is gone, at a
+  different address;
+* added — no previous provider with its name and specialty left to match.
+
+Moved and added providers, and unchanged ones the previous run could not
+place, get the coordinates of any previous provider already geocoded at
+their address (many doctors share a clinic); only the rest are left to
+geocode. Unplaced unchanged providers are queued again rather than keeping
+the null result forever: the geocode cache answers them from its negative
+entries until `--negative-ttl-days` lets them be retried. Previous providers
+nobody matched are reported as removed.
+
+    python cartilla_delta.py cartilla_medica.json cartilla_medica_geocoded.json \\
+        -o cartilla_medica_delta.json --changelog cartilla_medica_changes.json
+
+`geocode_cartilla_medica.py --previous` runs the same step before geocoding.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from collections import defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+
+from address_rules import address_key, normalize_address, normalize_text
+from geocode_cache import cache_key, fold_text
+
+
+CARRIED_FIELDS = ("geocode_query", "lat", "lon", "geocode")
+SUMMARY_FIELDS = ("name", "specialty", "location", "address", "phone", "source_page")
+
+
+def person_key(provider: dict) -> tuple[str, str]:
+    return fold_text(normalize_text(provider.get("name"))), fold_text(normalize_text(provider.get("specialty")))
+
+
+def record_identity(provider: dict) -> tuple[str, str, str]:
+    """Name + specialty (case- and accent-folded) + normalized address (case-folded only, like cache keys)."""
+    return (*person_key(provider), cache_key(normalize_address(provider.get("address"))))
+
+
+def is_located(provider: dict) -> bool:
+    return provider.get("lat") is not None and provider.get("lon") is not None
+
+
+def summary(provider: dict) -> dict:
+    return {field: provider.get(field) for field in SUMMARY_FIELDS}
+
+
+def carry(target: dict, source: dict) -> None:
+    for field in CARRIED_FIELDS:
+        if field in source:
+            target[field] = source[field]
+
+
+def apply_delta(providers: list[dict], previous: list[dict]) -> dict:
+    """Carry previous geocoding onto `providers` in place; return the changelog.
+
+    `pending` in the result lists the indexes of moved, added and unplaced
+    unchanged providers still without coordinates: the only ones worth
+    geocoding.
+    """
+    by_identity: dict[tuple, deque[int]] = defaultdict(deque)
+    for index, provider in enumerate(previous):
+        by_identity[record_identity(provider)].append(index)
+    located_addresses: dict[str, dict] = {}
+    for provider in previous:
+        if is_located(provider):
+            located_addresses.setdefault(address_key(provider), provider)
+
+    matched = [False] * len(previous)
+    unmatched: list[int] = []
+    unlocated: list[int] = []
+    unchanged = 0
+    for index, provider in enumerate(providers):
+        candidates = by_identity.get(record_identity(provider))
+        if candidates:
+            # Duplicate identities (a doctor listed twice) pair up in document order.
+            old = candidates.popleft()
+            matched[old] = True
+            carry(provider, previous[old])
+            unchanged += 1
+            if not is_located(provider):
+                unlocated.append(index)
+        else:
+            unmatched.append(index)
+
+    gone_by_person: dict[tuple, deque[int]] = defaultdict(deque)
+    for old, provider in enumerate(previous):
+        if not matched[old]:
+            gone_by_person[person_key(provider)].append(old)
+
+    added, moved, pending = [], [], []
+    carried_by_address = 0
+    for index in unmatched:
+        provider = providers[index]
+        candidates = gone_by_person.get(person_key(provider))
+        if candidates:
+            old = candidates.popleft()
+            matched[old] = True
+            moved.append({**summary(provider), "previous_address": previous[old].get("address")})
+        else:
+            added.append(summary(provider))
+    for index in sorted(unmatched + unlocated):
+        provider = providers[index]
+        same_address = located_addresses.get(address_key(provider))
+        if same_address is not None:
+            carry(provider, same_address)
+            carried_by_address += 1
+        elif not is_located(provider):
+            pending.append(index)
+
+    removed = [summary(provider) for old, provider in enumerate(previous) if not matched[old]]
+    return {
+        "counts": {
+            "providers": len(providers),
+            "previous_providers": len(previous),
+            "unchanged": unchanged,
+            "unchanged_unlocated": len(unlocated),
+            "moved": len(moved),
+            "added": len(added),
+            "removed": len(removed),
+            "carried_by_address": carried_by_address,
+            "located": sum(1 for p in providers if is_located(p)),
+            "addresses_to_geocode": len({address_key(providers[index]) for index in pending}),
+        },
+        "added": added,
+        "removed": removed,
+        "moved": moved,
+        "pending": pending,
+    }
+
+
+def write_json(document: dict, path: Path, indent: int | None = 2) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(document, ensure_ascii=False, indent=indent) + "\n", encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def changelog_document(changes: dict, current: Path, previous: Path) -> dict:
+    return {
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "current": str(current),
+        "previous": str(previous),
+        **{key: value for key, value in changes.items() if key != "pending"},
+    }
+
+
+def format_counts(counts: dict) -> str:
+    return (
+        f"{counts['unchanged']} unchanged ({counts['unchanged_unlocated']} unplaced), {counts['moved']} moved, "
+        f"{counts['added']} added, {counts['removed']} removed; {counts['located']}/{counts['providers']} located, "
+        f"{counts['addresses_to_geocode']} addresses left to geocode"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Carry geocoding over from the previous cartilla and list changes.")
+    parser.add_argument("input", help="New cartilla_medica.json from extract_cartilla_medica.py")
+    parser.add_argument("previous", help="Previous cartilla_medica_geocoded.json")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Output JSON for the geocoder. Defaults to <input stem>_delta.json next to the input.",
+    )
+    parser.add_argument(
+        "--changelog",
+        default=None,
+        help="Changelog JSON path. Defaults to <output stem>.changes.json next to the output.",
+    )
+    args = parser.parse_args()
+
+    input_path = Path(args.input).expanduser().resolve()
+    previous_path = Path(args.previous).expanduser().resolve()
+    output_path = (
+        Path(args.output).expanduser().resolve()
+        if args.output
+        else input_path.with_name(f"{input_path.stem}_delta.json")
+    )
+    changelog_path = (
+        Path(args.changelog).expanduser().resolve()
+        if args.changelog
+        else output_path.with_name(f"{output_path.stem}.changes.json")
+    )
+
+    document = json.loads(input_path.read_bytes())
+    previous = json.loads(previous_path.read_bytes())
+    changes = apply_delta(document.get("providers", []), previous.get("providers", []))
+    write_json(document, output_path)
+    write_json(changelog_document(changes, input_path, previous_path), changelog_path)
+    print(f"Wrote {output_path}")
+    print(f"Wrote {changelog_path}")
+    print(f"Delta: {format_counts(changes['counts'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,13 @@ It emits a JSON document with:
 * a lightweight patient/document header
 * a flat `providers` list for easy search by name, specialty, and location
 * a section summary with per-specialty counts
+
+With `--ndjson` the providers are instead streamed one JSON object per line as
+they are parsed, and everything else goes to a small `.meta.json` sidecar, so
+memory stays flat however large the cartilla is.
+
+With `--columns` the providers are also written column-wise with interned
+strings (`provider_columns.py`) to `<output>.columns.npz`.
 """
 
 from __future__ import annotations
@@ -15,11 +22,19 @@ from __future__ import annotations
 import argparse
 import json
 import re
-import subprocess
+import sys
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from pipeline_common.metrics import METRICS, add_metrics_arguments, metrics_session  # noqa: E402
+from pipeline_common.pdf_text import PdfTextLayer, add_text_cache_arguments  # noqa: E402
+
+if TYPE_CHECKING:
+    from provider_columns import ColumnWriter
 
 
 BOILERPLATE = {
@@ -41,13 +56,9 @@ PHONEISH_TOKENS = (
 )
 
 
-def run(cmd: list[str]) -> str:
-    return subprocess.check_output(cmd).decode("utf-8", "ignore")
-
-
-def parse_pdfinfo(pdf_path: Path) -> dict:
+def parse_pdfinfo(pdf_path: Path, text_layer: PdfTextLayer | None = None) -> dict:
     info = {}
-    for line in run(["pdfinfo", str(pdf_path)]).splitlines():
+    for line in (text_layer or PdfTextLayer()).pdfinfo(pdf_path).splitlines():
         if ":" not in line:
             continue
         key, value = line.split(":", 1)
@@ -55,9 +66,17 @@ def parse_pdfinfo(pdf_path: Path) -> dict:
     return info
 
 
-def extract_pages(pdf_path: Path) -> list[str]:
-    text = run(["pdftotext", "-layout", str(pdf_path), "-"])
-    return text.split("\f")
+def iter_pages(pdf_path: Path, text_layer: PdfTextLayer | None = None) -> Iterator[str]:
+    """Yield `pdftotext -layout` pages as they are produced (or read from the text cache)."""
+    yield from (text_layer or PdfTextLayer()).iter_pages(pdf_path)
+
+
+def extract_pages(pdf_path: Path, text_layer: PdfTextLayer | None = None) -> list[str]:
+    return list(iter_pages(pdf_path, text_layer))
+
+
+def extract_page_range(pdf_path: Path, first: int, last: int, text_layer: PdfTextLayer | None = None) -> list[str]:
+    return (text_layer or PdfTextLayer()).page_range(pdf_path, first, last)
 
 
 def split_heading(raw: str) -> tuple[str, str | None]:
@@ -95,99 +114,239 @@ def parse_patient_display_name(lines: Iterable[str]) -> str | None:
     return None
 
 
-def parse_document(pdf_path: Path) -> dict:
-    pages = extract_pages(pdf_path)
-    pdf_info = parse_pdfinfo(pdf_path)
-
-    patient_display_name = None
-    current_section: tuple[str, str | None] | None = None
-    current_record: dict | None = None
-    state: str | None = None
-    providers: list[dict] = []
-    section_counts: Counter[tuple[str, str | None]] = Counter()
-
-    for page_number, page_text in enumerate(pages, start=1):
-        lines = [line.rstrip() for line in page_text.splitlines()]
-
-        if page_number == 1:
-            preface = []
-            post_results = []
-            seen_results = False
-            for line in lines:
-                if line.strip() == "Resultados":
-                    seen_results = True
-                    continue
-                (post_results if seen_results else preface).append(line)
-
-            if patient_display_name is None:
-                patient_display_name = parse_patient_display_name(preface)
-            lines = post_results
-
-        for raw_line in lines:
-            stripped = raw_line.strip()
-            if not stripped or stripped.startswith("Pág.") or stripped == "Cartilla médica":
+# Line events produced by `classify_page`: the per-line string work (stripping,
+# boilerplate filtering, heading detection) is done once up front, so it can run
+# in worker processes while the stateful record assembly stays serial.
+NAME, ADDRESS, PHONE, TEXT, PATIENT = "name", "address", "phone", "text", "patient"
+
+
+def classify_page(page_number: int, page_text: str) -> list[tuple]:
+    """Turn one page into `(kind, value[, heading])` events, dropping boilerplate."""
+    lines = page_text.splitlines()
+    events: list[tuple] = []
+
+    if page_number == 1:
+        preface = []
+        post_results = []
+        seen_results = False
+        for line in lines:
+            if line.strip() == "Resultados":
+                seen_results = True
                 continue
-            if stripped.lower() in BOILERPLATE:
+            (post_results if seen_results else preface).append(line)
+
+        events.append((PATIENT, parse_patient_display_name(preface)))
+        lines = post_results
+
+    for raw_line in lines:
+        stripped = raw_line.strip()
+        if not stripped or stripped.startswith("Pág.") or stripped == "Cartilla médica":
+            continue
+        if stripped.lower() in BOILERPLATE:
+            continue
+
+        if stripped.startswith("Nombre:"):
+            events.append((NAME, stripped.split(":", 1)[1].strip()))
+        elif stripped.startswith("Dirección:"):
+            events.append((ADDRESS, stripped.split(":", 1)[1].strip()))
+        elif stripped.startswith("Teléfono:"):
+            events.append((PHONE, stripped.split(":", 1)[1].strip()))
+        else:
+            heading = split_heading(stripped) if looks_like_heading(stripped) else None
+            events.append((TEXT, stripped, heading))
+    return events
+
+
+class ProviderRecord:
+    """A provider whose lines are still arriving.
+
+    Address and phone lines are collected as fragments and joined once, when
+    the record is emitted as a dict.
+    """
+
+    __slots__ = ("specialty", "location", "name", "address", "phone", "source_page")
+
+    def __init__(self, section: tuple[str, str | None] | None, name: str, source_page: int) -> None:
+        self.specialty, self.location = section if section else (None, None)
+        self.name = name
+        self.address: list[str] = []
+        self.phone: list[str] = []
+        self.source_page = source_page
+
+    def as_dict(self) -> dict:
+        return {
+            "specialty": self.specialty,
+            "location": self.location,
+            "name": self.name,
+            "address": " ".join(self.address),
+            "phone": " ".join(self.phone),
+            "source_page": self.source_page,
+        }
+
+
+def add_fragment(fragments: list[str], value: str) -> None:
+    # Empty lines before the first fragment add nothing, like `"" + value` did.
+    if value or fragments:
+        fragments.append(value)
+
+
+class CartillaParser:
+    """Incremental `Nombre:/Dirección:/Teléfono:` state machine.
+
+    Feed pages in order; each call yields the providers that were completed by
+    that page. Section and patient summaries accumulate on the parser.
+    """
+
+    def __init__(self) -> None:
+        self.patient_display_name: str | None = None
+        self.current_section: tuple[str, str | None] | None = None
+        self.current_record: ProviderRecord | None = None
+        self.state: str | None = None
+        self.record_count = 0
+        self.section_counts: Counter[tuple[str, str | None]] = Counter()
+        self._sections: dict[tuple[str, str | None], tuple[str, str | None]] = {}
+
+    def set_section(self, heading: tuple[str, str | None]) -> None:
+        # Headings repeat on every page of a section; keep one interned copy so
+        # every provider in it shares the same specialty and location strings.
+        section = self._sections.get(heading)
+        if section is None:
+            specialty, location = heading
+            section = self._sections[heading] = (sys.intern(specialty), location and sys.intern(location))
+        self.current_section = section
+
+    def feed_page(self, page_number: int, page_text: str) -> Iterator[dict]:
+        return self.feed_events(page_number, classify_page(page_number, page_text))
+
+    def feed_events(self, page_number: int, events: Iterable[tuple]) -> Iterator[dict]:
+        for event in events:
+            kind, value = event[0], event[1]
+            if kind == PATIENT:
+                if self.patient_display_name is None:
+                    self.patient_display_name = value
                 continue
 
-            if stripped.startswith("Nombre:"):
-                current_record = {
-                    "specialty": current_section[0] if current_section else None,
-                    "location": current_section[1] if current_section else None,
-                    "name": stripped.split(":", 1)[1].strip(),
-                    "address": "",
-                    "phone": "",
-                    "source_page": page_number,
-                }
-                providers.append(current_record)
-                if current_record["specialty"] is not None:
-                    section_counts[(current_record["specialty"], current_record["location"])] += 1
-                state = "address"
+            current_record = self.current_record
+            if kind == NAME:
+                if current_record is not None:
+                    yield current_record.as_dict()
+                current_section = self.current_section
+                self.current_record = ProviderRecord(current_section, value, page_number)
+                self.record_count += 1
+                if current_section is not None:
+                    self.section_counts[current_section] += 1
+                self.state = "address"
                 continue
 
+            heading = event[2] if kind == TEXT else None
             if current_record is None:
-                if looks_like_heading(stripped):
-                    current_section = split_heading(stripped)
+                if heading is not None:
+                    self.set_section(heading)
                 continue
 
-            if stripped.startswith("Dirección:"):
-                value = stripped.split(":", 1)[1].strip()
-                current_record["address"] += (" " if current_record["address"] else "") + value
-                state = "address"
+            if kind == ADDRESS:
+                add_fragment(current_record.address, value)
+                self.state = "address"
                 continue
 
-            if stripped.startswith("Teléfono:"):
-                value = stripped.split(":", 1)[1].strip()
-                current_record["phone"] += (" " if current_record["phone"] else "") + value
-                state = "phone"
+            if kind == PHONE:
+                add_fragment(current_record.phone, value)
+                self.state = "phone"
                 continue
 
-            if state == "address":
-                current_record["address"] += (" " if current_record["address"] else "") + stripped
+            if self.state == "address":
+                add_fragment(current_record.address, value)
                 continue
 
-            if state == "phone":
-                if looks_like_heading(stripped):
-                    current_record = None
-                    state = None
-                    current_section = split_heading(stripped)
+            if self.state == "phone":
+                if heading is not None:
+                    yield current_record.as_dict()
+                    self.current_record = None
+                    self.state = None
+                    self.set_section(heading)
                 else:
-                    current_record["phone"] += (" " if current_record["phone"] else "") + stripped
+                    add_fragment(current_record.phone, value)
                 continue
 
             # Defensive fallback: preserve text rather than drop it.
-            current_record["phone"] += (" " if current_record["phone"] else "") + stripped
-
-    sections = [
-        {
-            "specialty": specialty,
-            "location": location,
-            "provider_count": count,
-        }
-        for (specialty, location), count in section_counts.items()
+            add_fragment(current_record.phone, value)
+
+    def close(self) -> Iterator[dict]:
+        if self.current_record is not None:
+            yield self.current_record.as_dict()
+            self.current_record = None
+            self.state = None
+
+    def parse(self, pages: Iterable[str]) -> Iterator[dict]:
+        for page_number, page_text in enumerate(pages, start=1):
+            yield from self.feed_page(page_number, page_text)
+        yield from self.close()
+
+    def parse_events(self, page_events: Iterable[tuple[int, list[tuple]]]) -> Iterator[dict]:
+        for page_number, events in page_events:
+            yield from self.feed_events(page_number, events)
+        yield from self.close()
+
+    def sections(self) -> list[dict]:
+        return [
+            {
+                "specialty": specialty,
+                "location": location,
+                "provider_count": count,
+            }
+            for (specialty, location), count in self.section_counts.items()
+        ]
+
+
+def classify_page_range(
+    pdf_path: Path, first: int, last: int, text_layer: PdfTextLayer | None = None, keep_text: bool = False
+) -> list[tuple[int, list[tuple], str | None]]:
+    """Worker: extract and classify pages `first..last` (1-based, inclusive)."""
+    pages = extract_page_range(pdf_path, first, last, text_layer)
+    return [
+        (first + offset, classify_page(first + offset, text), text if keep_text else None)
+        for offset, text in enumerate(pages)
     ]
 
-    return {
+
+def page_ranges(page_count: int, jobs: int, chunks_per_job: int = 4) -> list[tuple[int, int]]:
+    chunk = max(1, -(-page_count // (jobs * chunks_per_job)))
+    return [(first, min(first + chunk - 1, page_count)) for first in range(1, page_count + 1, chunk)]
+
+
+def iter_page_events(
+    pdf_path: Path, jobs: int = 1, page_count: int | None = None, text_layer: PdfTextLayer | None = None
+) -> Iterator[tuple[int, list[tuple]]]:
+    """Yield `(page_number, events)` in page order, extracting ranges in parallel when `jobs > 1`.
+
+    Only extraction and line classification run in the pool; the results are
+    consumed in page order, so section headings and records that span range
+    boundaries are assembled exactly as in a serial run. When the text cache
+    is enabled but cold, the workers send their page text back so the cache
+    is filled as in a serial run.
+    """
+    if jobs <= 1 or not page_count:
+        for page_number, page_text in enumerate(iter_pages(pdf_path, text_layer), start=1):
+            yield page_number, classify_page(page_number, page_text)
+        return
+
+    fill = text_layer is not None and text_layer.cache_dir is not None and not text_layer.is_cached(pdf_path)
+    texts = []
+    ranges = page_ranges(page_count, jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(classify_page_range, pdf_path, first, last, text_layer, fill) for first, last in ranges]
+        for future in futures:
+            for page_number, events, text in future.result():
+                texts.append(text)
+                yield page_number, events
+    if fill:
+        # A full pdftotext run ends with a form feed; keep the empty tail it leaves after splitting.
+        text_layer.store_pages(pdf_path, texts + [""])
+
+
+def build_document(pdf_path: Path, pdf_info: dict, parser: CartillaParser, providers: list[dict] | None) -> dict:
+    sections = parser.sections()
+    document = {
         "source": {
             "pdf_path": str(pdf_path),
             "title": pdf_info.get("Title"),
@@ -195,18 +354,57 @@ def parse_document(pdf_path: Path) -> dict:
             "author": pdf_info.get("Author"),
             "creator": pdf_info.get("Creator"),
             "producer": pdf_info.get("Producer"),
-            "pages": int(pdf_info["Pages"]) if pdf_info.get("Pages", "").isdigit() else None,
+            "pages": page_count_from_info(pdf_info),
             "creation_date": pdf_info.get("CreationDate"),
             "mod_date": pdf_info.get("ModDate"),
         },
         "patient": {
-            "display_name": patient_display_name,
+            "display_name": parser.patient_display_name,
         },
-        "record_count": len(providers),
+        "record_count": parser.record_count,
         "section_count": len(sections),
         "sections": sections,
-        "providers": providers,
     }
+    if providers is not None:
+        document["providers"] = providers
+    return document
+
+
+def page_count_from_info(pdf_info: dict) -> int | None:
+    return int(pdf_info["Pages"]) if pdf_info.get("Pages", "").isdigit() else None
+
+
+def parse_document(pdf_path: Path, jobs: int = 1, text_layer: PdfTextLayer | None = None) -> dict:
+    pdf_info = parse_pdfinfo(pdf_path, text_layer)
+    parser = CartillaParser()
+    events = iter_page_events(pdf_path, jobs, page_count_from_info(pdf_info), text_layer)
+    with METRICS.stage("extract_and_parse"):
+        providers = list(parser.parse_events(events))
+    METRICS.count("providers", len(providers))
+    return build_document(pdf_path, pdf_info, parser, providers)
+
+
+def stream_document(
+    pdf_path: Path,
+    ndjson_path: Path,
+    jobs: int = 1,
+    text_layer: PdfTextLayer | None = None,
+    columns: ColumnWriter | None = None,
+) -> dict:
+    """Write providers to `ndjson_path` (and `columns`) as parsed; return the document without them."""
+    pdf_info = parse_pdfinfo(pdf_path, text_layer)
+    parser = CartillaParser()
+    events = iter_page_events(pdf_path, jobs, page_count_from_info(pdf_info), text_layer)
+    with METRICS.stage("extract_parse_and_write_ndjson"), ndjson_path.open("w", encoding="utf-8") as out:
+        for provider in parser.parse_events(events):
+            out.write(json.dumps(provider, ensure_ascii=False) + "\n")
+            if columns is not None:
+                columns.append(provider)
+    METRICS.count("providers", parser.record_count)
+    METRICS.add_bytes("written", ndjson_path.stat().st_size)
+    document = build_document(pdf_path, pdf_info, parser, None)
+    document["providers_path"] = str(ndjson_path)
+    return document
 
 
 def main() -> int:
@@ -223,19 +421,69 @@ def main() -> int:
         default=None,
         help="Output JSON path. Defaults to cartilla_medica/output/cartilla_medica.json next to this script.",
     )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help=(
+            "Stream providers to <output>.ndjson as they are parsed and write the rest of the "
+            "document to <output>.meta.json, keeping memory flat on very large PDFs."
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Extract and classify page ranges in this many processes. Output is identical to a serial run.",
+    )
+    parser.add_argument(
+        "--columns",
+        action="store_true",
+        help="Also write providers column-wise with interned strings to <output>.columns.npz.",
+    )
+    add_text_cache_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    with metrics_session(args):
+        return extract(args)
+
 
+def extract(args: argparse.Namespace) -> int:
     pdf_path = Path(args.pdf).expanduser().resolve()
+    text_layer = PdfTextLayer.from_args(args)
     if args.output:
         out_path = Path(args.output).expanduser().resolve()
     else:
         out_path = Path(__file__).resolve().parent.parent / "output" / "cartilla_medica.json"
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    document = parse_document(pdf_path)
+    columns = None
+    if args.columns:
+        # Imported here so plain extraction keeps working without NumPy.
+        from provider_columns import ColumnWriter, columns_path
+
+        columns = ColumnWriter(columns_path(out_path))
+    if args.ndjson:
+        ndjson_path = out_path.with_suffix(".ndjson")
+        document = stream_document(pdf_path, ndjson_path, jobs=args.jobs, text_layer=text_layer, columns=columns)
+        out_path = out_path.with_suffix(".meta.json")
+        print(f"Wrote {ndjson_path}")
+    else:
+        document = parse_document(pdf_path, jobs=args.jobs, text_layer=text_layer)
+        if columns is not None:
+            columns.extend(document["providers"])
     document["generated_at"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
-    out_path.write_text(json.dumps(document, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if columns is not None:
+        with METRICS.stage("write_columns"):
+            written = columns.close(document)
+        METRICS.add_bytes("written", written)
+        print(f"Wrote {columns.path}")
+
+    with METRICS.stage("write_json"):
+        data = (json.dumps(document, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+        out_path.write_bytes(data)
+    METRICS.add_bytes("written", len(data))
     print(f"Wrote {out_path}")
     print(f"Providers: {document['record_count']}, sections: {document['section_count']}")
     return 0
@@ -0,0 +1,238 @@
+"""SQLite-backed cache for geocoder lookups.
+
+Every lookup is committed on its own, so a run costs O(1) I/O per miss instead
+of rewriting the whole cache, and a crash can at worst lose the entry being
+written. Resolved queries and negative results (the geocoder found nothing)
+live in separate tables, each row stamped with the time it was stored so that
+stale entries can be expired with a TTL.
+
+Entries are keyed by `cache_key(query)`, a case- and whitespace-insensitive
+form of the query, so trivially different spellings of the same address share
+one entry. Accents are kept: Nominatim answers "Peron" and "Perón" differently.
+Each row also keeps the query text it was first stored under, which is what
+`items()` and `export_json()` return.
+
+The legacy `geocode_cache.json` (query -> result or null) is imported
+automatically the first time a database is opened next to it.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Iterator
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    query TEXT PRIMARY KEY,
+    text TEXT,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS misses (
+    query TEXT PRIMARY KEY,
+    text TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+DAY = 86400.0
+SQLITE_HEADER = b"SQLite format 3\x00"
+KEY_FORMAT = "casefold-v2"
+# Keys of this format were folded with accents stripped, merging distinct queries.
+ACCENT_FOLDED_FORMAT = "folded-v1"
+
+
+def is_legacy_json(path: Path) -> bool:
+    """True when `path` names a legacy JSON cache rather than an SQLite database (new or existing)."""
+    if path.suffix == ".json":
+        return True
+    if not path.is_file() or path.stat().st_size == 0:
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_HEADER)) != SQLITE_HEADER
+
+
+def fold_text(value: str) -> str:
+    """Lower-case, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.split())
+
+
+def cache_key(query: str) -> str:
+    """Lower-case and collapse whitespace in each comma-separated part, keeping accents."""
+    parts = [" ".join(part.casefold().split()) for part in query.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class GeocodeCache:
+    """Thread-safe query -> result store with separate negative entries and TTLs."""
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_days: float | None = None,
+        negative_ttl_days: float | None = None,
+        legacy_json: Path | None = None,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl_days * DAY if ttl_days else None
+        self.negative_ttl = negative_ttl_days * DAY if negative_ttl_days else None
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade_keys()
+        if legacy_json is not None and legacy_json.exists():
+            self.migrate_json(legacy_json)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "GeocodeCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _upgrade_keys(self) -> None:
+        """Bring rows written under an older key format up to `KEY_FORMAT`.
+
+        Rows keyed by the raw query are re-keyed, keeping the raw query as
+        their text; the first entry per key wins. Rows from the accent-folding
+        format cannot be told apart any more, so they are dropped together with
+        the legacy JSON import markers, and the JSON is imported again.
+        """
+        for table in ("results", "misses"):
+            columns = [r[1] for r in self._conn.execute(f"PRAGMA table_info({table})")]
+            if "text" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN text TEXT")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'key_format'").fetchone()
+        if row is not None and row[0] == KEY_FORMAT:
+            return
+        with self._conn:
+            if row is not None and row[0] == ACCENT_FOLDED_FORMAT:
+                self._conn.execute("DELETE FROM results")
+                self._conn.execute("DELETE FROM misses")
+                self._conn.execute("DELETE FROM meta WHERE key LIKE 'migrated:%'")
+            for table, columns in (("results", "lat, lon, payload, stored_at"), ("misses", "stored_at")):
+                rows = self._conn.execute(f"SELECT query, {columns} FROM {table} ORDER BY stored_at").fetchall()
+                self._conn.execute(f"DELETE FROM {table}")
+                placeholders = ", ".join("?" * (len(columns.split(",")) + 2))
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} (query, text, {columns}) VALUES ({placeholders})",
+                    [(cache_key(r[0]), r[0]) + tuple(r[1:]) for r in rows],
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('key_format', ?)", (KEY_FORMAT,)
+            )
+
+    def _expired(self, stored_at: float, ttl: float | None) -> bool:
+        return ttl is not None and time.time() - stored_at > ttl
+
+    def get(self, query: str) -> tuple[bool, dict | None]:
+        """Return `(hit, result)`; a hit with a `None` result is a cached negative."""
+        query = cache_key(query)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at FROM results WHERE query = ?", (query,)
+            ).fetchone()
+            if row is not None:
+                if self._expired(row[1], self.ttl):
+                    return False, None
+                return True, json.loads(row[0])
+            row = self._conn.execute("SELECT stored_at FROM misses WHERE query = ?", (query,)).fetchone()
+        if row is not None and not self._expired(row[0], self.negative_ttl):
+            return True, None
+        return False, None
+
+    def __contains__(self, query: str) -> bool:
+        return self.get(query)[0]
+
+    def put(self, query: str, result: dict | None, stored_at: float | None = None) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock, self._conn:
+            self._put(query, result, stored_at)
+
+    def _put(self, query: str, result: dict | None, stored_at: float) -> None:
+        key = cache_key(query)
+        if result:
+            self._conn.execute("DELETE FROM misses WHERE query = ?", (key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (query, text, lat, lon, payload, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, result["lat"], result["lon"], json.dumps(result, ensure_ascii=False), stored_at),
+            )
+        else:
+            self._conn.execute("DELETE FROM results WHERE query = ?", (key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO misses (query, text, stored_at) VALUES (?, ?, ?)", (key, query, stored_at)
+            )
+
+    def items(self) -> Iterator[tuple[str, dict | None]]:
+        """All entries by their stored query text, positives first, ignoring TTLs."""
+        with self._lock:
+            positives = self._conn.execute(
+                "SELECT COALESCE(text, query), payload FROM results ORDER BY query"
+            ).fetchall()
+            negatives = self._conn.execute("SELECT COALESCE(text, query) FROM misses ORDER BY query").fetchall()
+        for query, payload in positives:
+            yield query, json.loads(payload)
+        for (query,) in negatives:
+            yield query, None
+
+    def as_dict(self) -> dict[str, dict | None]:
+        return dict(self.items())
+
+    def counts(self) -> tuple[int, int]:
+        with self._lock:
+            positives = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            negatives = self._conn.execute("SELECT COUNT(*) FROM misses").fetchone()[0]
+        return positives, negatives
+
+    def __len__(self) -> int:
+        return sum(self.counts())
+
+    def migrate_json(self, json_path: Path) -> int:
+        """Import a legacy JSON cache once; returns the number of entries imported."""
+        marker = f"migrated:{json_path.resolve()}"
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return 0
+        legacy = json.loads(json_path.read_text(encoding="utf-8"))
+        # The JSON cache has no timestamps; its file mtime is the best lower bound.
+        stored_at = json_path.stat().st_mtime
+        imported = 0
+        with self._lock, self._conn:
+            for query, result in legacy.items():
+                key = cache_key(query)
+                exists = self._conn.execute(
+                    "SELECT 1 FROM results WHERE query = ? UNION ALL SELECT 1 FROM misses WHERE query = ?",
+                    (key, key),
+                ).fetchone()
+                if exists:
+                    continue
+                self._put(query, result, stored_at)
+                imported += 1
+            self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(imported)))
+        return imported
+
+    def export_json(self, json_path: Path) -> None:
+        """Write the legacy JSON format atomically (for tools that still read it)."""
+        tmp_path = json_path.with_name(json_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.as_dict(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        tmp_path.replace(json_path)
@@ -1,92 +1,56 @@
 #!/usr/bin/env python3
 """Geocode Cartilla Médica addresses with OpenStreetMap Nominatim.
 
-This script enriches the extracted JSON with coordinates using a cached,
-single-threaded lookup flow that respects the public Nominatim usage policy.
+This script enriches the extracted JSON with coordinates using a cached lookup
+flow. Lookups run on the concurrent engine in `geocoding_engine.py`; against the
+public Nominatim instance it is still held to 1 request/second, while a
+self-hosted instance can be driven with `--rate` and `--concurrency`.
+
+With `--street-index` (built by `osm_street_index.py` from a local OSM
+extract) addresses are first placed offline by street and house number;
+only those the index cannot place go through the cache and Nominatim.
+
+Unresolved addresses are kept in a work queue (`geocode_queue.py`) next to
+the output, and the output is rewritten every `--checkpoint-every` seconds,
+so a killed run continues with `--resume`. Several processes can drain one
+queue (start the first normally, the others with `--resume`), and `--shard`
+plus `--merge-queue` split a run across machines. `--columns` also writes
+the result column-wise (`provider_columns.py`) next to the output.
+
+With `--previous` (the last geocoded output) a republished cartilla only
+geocodes what changed: `cartilla_delta.py` carries coordinates over to
+unchanged providers and writes a changelog of added, removed and moved ones.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
-import time
-import urllib.parse
-import urllib.request
+import os
 import re
+import sys
+import time
 from pathlib import Path
-
-
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
-USER_AGENT = "cartilla-medica-geocoder/1.0 (local-batch-geocoding)"
-
-
-def normalize_text(value: str | None) -> str:
-    if not value:
-        return ""
-    return " ".join(value.replace("\u00a0", " ").split())
-
-
-def normalize_address(value: str | None) -> str:
-    text = normalize_text(value)
-    if not text:
-        return ""
-
-    text = re.sub(r"\bPiso-Depto\.?:\s*[^-]*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bPiso-Depto\.?\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bDepto\.?:\s*[^-]*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bPta\.?\s*Baja\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s*-\s*Ciudad Autónoma De Buenos Aires\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s*-\s*Ciudad De Buenos Aires\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s*-\s*CABA\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bDirec\b\.?", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bDepto\b\.?", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bPb\b\.?", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\bPb\b", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\b1°\b", "1", text)
-    text = re.sub(r"\b2º\b", "2", text)
-    text = re.sub(r"\b3º\b", "3", text)
-    text = re.sub(r"\b4º\b", "4", text)
-    text = re.sub(r"\b5°\b", "5", text)
-    text = re.sub(r"\b1834\s+1834\b", "1834", text)
-    text = re.sub(r"\s{2,}", " ", text).strip(" ,;-")
-
-    regex_rules = [
-        (r"\bPeron\s*,\s*Pte\.?\b", "Teniente General Juan Domingo Peron"),
-        (r"\bPte\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
-        (r"\bTte\.?\s+Gral\.?\s+Juan\s+Domingo\s+Peron\b", "Teniente General Juan Domingo Peron"),
-        (r"\bTte\.?\s+Gral\.?\s+J\.?\s*D\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
-        (r"\bTte\.?\s+G\.?\s+Peron\b", "Teniente General Juan Domingo Peron"),
-        (r"\bTte\.?\s+Gral\b\.?", "Teniente General"),
-        (r"\bTte\.?\b", "Teniente"),
-        (r"\bAvda\.?\b", "Avenida"),
-        (r"\bAv\.?\b", "Avenida"),
-        (r"\bGral\.?\b", "General"),
-        (r"\bDr\.?\b", "Doctor"),
-        (r"\bDra\.?\b", "Doctora"),
-        (r"\bCnel\.?\b", "Coronel"),
-        (r"\bBme\b", "Bartolome"),
-        (r"\bPuyrredon\b", "Pueyrredon"),
-        (r"\bBillingurst\b", "Billinghurst"),
-        (r"\bMent[oó]n\b", "Melián"),
-        (r"\bMenton\b", "Melian"),
-        (r"\bAv\.?\s*Ment[oó]n\b", "Avenida Melián"),
-        (r"\bAvenida\.?\s*Ment[oó]n\b", "Avenida Melián"),
-        (r"\bJuan\s*R\.?\s*De\s*Velasco\b", "Juan Ramírez de Velasco"),
-        (r"\bLobo\s*De\s*La\s*Vega\b", "Lope de Vega"),
-        (r"\bBaldomero\s*Fdez\s*Moreno\b", "Baldomero Fernández Moreno"),
-        (r"\bAv\.?\s*Gral\.?\s*J\.?\s*G\.?\s*Artigas\b", "Avenida General José Gervasio Artigas"),
-        (r"\bAvenida\.?\s*General\.?\s*J\.?\s*G\.?\s*Artigas\b", "Avenida General José Gervasio Artigas"),
-        (r"\bTte\.?\s*Gral\.?\s*J\.?\s*D\.?\s*Per[oó]n\b", "Teniente General Juan Domingo Perón"),
-        (r"\bTeniente General\s+J\.?\s*D\.?\s*Per[oó]n\b", "Teniente General Juan Domingo Perón"),
-        (r"\bPte\.?\b", "Presidente"),
-        (r"\bJ\.?\s*D\.?\s+Peron\b", "Juan Domingo Peron"),
-        (r"\bJuan\s+D\.?\s+Peron\b", "Juan Domingo Peron"),
-        (r"\bM\.?\b", "Mariscal"),
-    ]
-    for pattern, replacement in regex_rules:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-
-    return " ".join(text.split())
+from typing import Iterable
+
+from address_rules import address_key, normalize_address, normalize_text
+from cartilla_delta import apply_delta, changelog_document, format_counts, write_json
+from geocode_cache import GeocodeCache, is_legacy_json
+from geocoding_engine import (
+    NOMINATIM_URL,
+    GeocodeError,
+    GeocodingEngine,
+    NominatimBackend,
+    ReplayBackend,
+)
+from geocode_queue import Progress, WorkQueue, parse_shard
+from osm_street_index import StreetIndex, compare_with_cache, format_comparison
+from provider_columns import columns_path, write_columns
+from query_planner import QueryPlanner, address_pattern, format_simulation, simulate
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from pipeline_common.metrics import METRICS, add_metrics_arguments, metrics_session  # noqa: E402
 
 
 def build_query(provider: dict) -> str:
@@ -99,9 +63,9 @@ def build_query(provider: dict) -> str:
     return ", ".join(dict.fromkeys(parts))
 
 
-def build_query_variants(provider: dict) -> list[str]:
-    """Generate progressively looser queries for fallback geocoding."""
-    variants: list[str] = []
+def build_typed_query_variants(provider: dict) -> list[tuple[str, str]]:
+    """Generate progressively looser queries for fallback geocoding, each tagged with its shape."""
+    variants: list[tuple[str, str]] = []
 
     address = normalize_address(provider.get("address"))
     location = normalize_text(provider.get("location"))
@@ -109,52 +73,129 @@ def build_query_variants(provider: dict) -> list[str]:
     base_parts = [address, location, "Buenos Aires", "Argentina"]
     base_parts = [part for part in base_parts if part]
     if base_parts:
-        variants.append(", ".join(dict.fromkeys(base_parts)))
+        variants.append(("full", ", ".join(dict.fromkeys(base_parts))))
 
     if address:
-        variants.append(", ".join([address, "Buenos Aires", "Argentina"]))
+        variants.append(("address_city", ", ".join([address, "Buenos Aires", "Argentina"])))
 
     if location and address:
-        variants.append(", ".join([address, location, "Argentina"]))
+        variants.append(("address_location", ", ".join([address, location, "Argentina"])))
 
     if address:
         stripped_city = re.sub(r"\s*-\s*(Ciudad Autónoma De Buenos Aires|Ciudad De Buenos Aires|CABA)\b", "", address, flags=re.IGNORECASE).strip()
         if stripped_city and stripped_city != address:
-            variants.append(", ".join([stripped_city, "Buenos Aires", "Argentina"]))
+            variants.append(("without_city", ", ".join([stripped_city, "Buenos Aires", "Argentina"])))
 
     if address:
         street_number = re.match(r"^(.+?\d+)", address)
         if street_number:
-            variants.append(", ".join([street_number.group(1).strip(), "Buenos Aires", "Argentina"]))
-
-    # Preserve order while deduplicating.
-    return list(dict.fromkeys(variants))
-
-
-def geocode(query: str) -> dict | None:
-    params = {
-        "q": query,
-        "format": "jsonv2",
-        "limit": "1",
-        "addressdetails": "1",
-        "countrycodes": "ar",
-    }
-    url = f"{NOMINATIM_URL}?{urllib.parse.urlencode(params)}"
-    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-    with urllib.request.urlopen(req, timeout=30) as resp:
-        payload = json.loads(resp.read().decode("utf-8"))
-    if not payload:
-        return None
-    match = payload[0]
-    return {
-        "lat": float(match["lat"]),
-        "lon": float(match["lon"]),
-        "display_name": match.get("display_name"),
-        "class": match.get("class"),
-        "type": match.get("type"),
-        "importance": match.get("importance"),
-        "place_id": match.get("place_id"),
-    }
+            variants.append(("street_number", ", ".join([street_number.group(1).strip(), "Buenos Aires", "Argentina"])))
+
+    # Preserve order while deduplicating; a query keeps the shape it was first generated as.
+    unique: dict[str, str] = {}
+    for kind, query in variants:
+        unique.setdefault(query, kind)
+    return [(kind, query) for query, kind in unique.items()]
+
+
+def build_query_variants(provider: dict) -> list[str]:
+    """Generate progressively looser queries for fallback geocoding."""
+    return [query for _, query in build_typed_query_variants(provider)]
+
+
+def group_pending(providers: list[dict], candidates: Iterable[int]) -> dict[str, list[tuple[int, dict]]]:
+    """Group the unlocated providers among `candidates` (indexes) by address, for the geocode queue."""
+    groups: dict[str, list[tuple[int, dict]]] = {}
+    for index in candidates:
+        provider = providers[index]
+        if provider.get("lat") is None or provider.get("lon") is None:
+            groups.setdefault(address_key(provider), []).append((index, provider))
+    return groups
+
+
+def resolve_provider(
+    engine: GeocodingEngine,
+    cache: GeocodeCache,
+    provider: dict,
+    street_index: StreetIndex | None = None,
+    planner: QueryPlanner | None = None,
+):
+    """Walk a provider's query variants until one resolves, consulting the cache first.
+
+    Returns `(query, result, failed)`; `failed` means a lookup gave up, so the
+    address is worth retrying in a later run. With a street index, every
+    variant is tried offline before any cache or network lookup; local results
+    are not cached, as the index answers faster. With a planner, the variants
+    sent on are reordered and pruned by their learned success rates.
+    """
+    queries = build_query_variants(provider)
+    if street_index is not None:
+        with METRICS.timer("local_lookup_s"):
+            local = next(((q, r) for q in queries if (r := street_index.lookup(q))), None)
+        METRICS.count("local_hits" if local else "local_misses")
+        if local:
+            METRICS.histogram("first_success_variant", "local")
+            return (*local, False)
+    if planner is not None:
+        with METRICS.timer("plan_variants_s"):
+            planned = planner.plan(address_pattern(provider), build_typed_query_variants(provider), cache.get)
+        queries = [query for _, query in planned]
+    query = queries[0] if queries else None
+    result = None
+    for variant, query in enumerate(queries):
+        hit, result = cache.get(query)
+        METRICS.count("cache_hits" if hit else "cache_misses")
+        if not hit:
+            try:
+                with METRICS.timer("lookup_latency_s"):
+                    result = engine.lookup(query)
+            except GeocodeError as exc:
+                print(f"Lookup failed: {exc}")
+                METRICS.count("lookup_failures")
+                METRICS.histogram("first_success_variant", "failed")
+                return query, None, True
+            cache.put(query, result)
+
+        if result:
+            METRICS.histogram("first_success_variant", variant)
+            break
+    else:
+        METRICS.histogram("first_success_variant", "none")
+    return query, result, False
+
+
+def planner_samples(documents: list[list[dict]]):
+    """`(pattern, typed variants)` once per distinct address across provider lists."""
+    seen = set()
+    for providers in documents:
+        for provider in providers:
+            key = address_key(provider)
+            if key not in seen:
+                seen.add(key)
+                yield address_pattern(provider), build_typed_query_variants(provider)
+
+
+def apply_results(providers: list[dict], queue: WorkQueue) -> None:
+    """Copy every finished group's query and result onto its providers."""
+    for members, query, result in queue.results():
+        for index in members:
+            provider = providers[index]
+            provider["geocode_query"] = query
+            if result:
+                provider["lat"] = result["lat"]
+                provider["lon"] = result["lon"]
+                provider["geocode"] = result
+            else:
+                provider["geocode"] = None
+
+
+def write_document(document: dict, path: Path) -> int:
+    """Write atomically, so a checkpoint interrupted mid-write leaves the previous one intact."""
+    data = (json.dumps(document, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+    return len(data)
 
 
 def main() -> int:
@@ -174,75 +215,356 @@ def main() -> int:
     parser.add_argument(
         "--cache",
         default=None,
-        help="Optional cache JSON path. Defaults to geocode_cache.json next to the output file.",
+        help=(
+            "Optional SQLite cache path. Defaults to geocode_cache.sqlite next to the output file; "
+            "a geocode_cache.json beside it is imported on first use. A legacy JSON cache given here "
+            "(deprecated) is imported into the .sqlite file next to it."
+        ),
+    )
+    parser.add_argument(
+        "--cache-ttl-days",
+        type=float,
+        default=None,
+        help="Treat cached results older than this many days as misses. Defaults to never expiring.",
+    )
+    parser.add_argument(
+        "--negative-ttl-days",
+        type=float,
+        default=None,
+        help="Retry queries that found nothing after this many days. Defaults to never retrying.",
+    )
+    parser.add_argument(
+        "--export-json-cache",
+        action="store_true",
+        help="Also write the cache back out as geocode_cache.json for tools that read the legacy format.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["nominatim", "replay"],
+        default="nominatim",
+        help="Lookup backend. 'replay' answers offline from --replay-file (a query -> result JSON map).",
+    )
+    parser.add_argument(
+        "--street-index",
+        default=None,
+        help=(
+            "Street/house-number index built by osm_street_index.py from a local OSM extract. "
+            "Addresses it can place are resolved offline; --backend only sees the rest."
+        ),
+    )
+    parser.add_argument(
+        "--nominatim-url",
+        default=NOMINATIM_URL,
+        help="Nominatim search endpoint. Point this at a self-hosted instance to lift the public rate limit.",
+    )
+    parser.add_argument(
+        "--replay-file",
+        default=None,
+        help="Query -> result JSON map for --backend replay. Defaults to the cache contents.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help=(
+            "Max requests per second; 0 means unthrottled. Always capped at 1 for the public Nominatim instance, "
+            "and unthrottled by default for other endpoints."
+        ),
     )
     parser.add_argument(
         "--sleep",
         type=float,
-        default=1.1,
-        help="Seconds to sleep between lookups. Defaults to 1.1 to stay under the public 1 req/s guidance.",
+        default=None,
+        metavar="SECONDS",
+        help="Deprecated: seconds between requests, kept as an alias for --rate 1/SECONDS (0 is --rate 0).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Providers resolved in parallel (default 8). Forced to 1 for the public Nominatim instance.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=4,
+        help="Retries per lookup on HTTP 429/5xx or network errors, with exponential backoff.",
+    )
+    parser.add_argument(
+        "--plan-variants",
+        action="store_true",
+        help=(
+            "Reorder and prune each address's query variants by the success rates the cache shows for "
+            "similar addresses, to spend fewer requests per resolved address."
+        ),
+    )
+    parser.add_argument(
+        "--plan-history",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Earlier cartilla JSON files whose cached lookups the planner also learns from. Repeatable.",
+    )
+    parser.add_argument(
+        "--previous",
+        default=None,
+        metavar="PATH",
+        help=(
+            "Previous geocoded output. Unchanged providers keep its coordinates and only new, moved or "
+            "still unplaced addresses are geocoded; a changelog is written to <output name>.changes.json."
+        ),
+    )
+    parser.add_argument(
+        "--columns",
+        action="store_true",
+        help="Also write providers column-wise with interned strings to <output>.columns.npz.",
+    )
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="Work queue path. Defaults to <output name>.queue.sqlite next to the output file.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue the run recorded in --queue instead of starting over; also how further workers "
+            "join a running queue. Addresses whose lookups failed are retried."
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        metavar="K/N",
+        help="Only resolve every N-th address, starting at the K-th (0-based), e.g. one shard per machine.",
+    )
+    parser.add_argument(
+        "--merge-queue",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Import addresses finished in another queue file (e.g. another shard's). Repeatable.",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=float,
+        default=60.0,
+        metavar="SECONDS",
+        help="Rewrite the output with the results so far this often (default 60). 0 disables checkpoints.",
     )
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    if args.sleep is not None:
+        if args.rate is not None:
+            parser.error("--sleep is the deprecated form of --rate; pass only --rate")
+        print("--sleep is deprecated; use --rate (requests per second) instead", file=sys.stderr)
+        args.rate = 1.0 / args.sleep if args.sleep > 0 else 0.0
+    with metrics_session(args):
+        return geocode(args)
 
+
+def geocode(args: argparse.Namespace) -> int:
     input_path = Path(args.input).expanduser().resolve()
     if args.output:
         output_path = Path(args.output).expanduser().resolve()
     else:
         output_path = input_path.with_name("cartilla_medica_geocoded.json")
-    cache_path = Path(args.cache).expanduser().resolve() if args.cache else output_path.with_name("geocode_cache.json")
-
-    document = json.loads(input_path.read_text(encoding="utf-8"))
-    cache = {}
-    if cache_path.exists():
-        cache = json.loads(cache_path.read_text(encoding="utf-8"))
-
-    provider_count = 0
-    geocoded_count = 0
-
-    for provider in document.get("providers", []):
-        provider_count += 1
-        if provider.get("lat") is not None and provider.get("lon") is not None:
-            geocoded_count += 1
-            continue
-
-        queries = build_query_variants(provider)
-        provider["geocode_query"] = queries[0] if queries else None
-
-        result = None
-        for query in queries:
-            provider["geocode_query"] = query
-            if query in cache:
-                result = cache[query]
-            else:
-                result = geocode(query)
-                cache[query] = result
-                cache_path.write_text(json.dumps(cache, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-                time.sleep(args.sleep)
-
-            if result:
-                break
+    cache_path = Path(args.cache).expanduser().resolve() if args.cache else output_path.with_name("geocode_cache.sqlite")
+    legacy_cache_path = cache_path.with_suffix(".json")
+    if is_legacy_json(cache_path):
+        legacy_cache_path, cache_path = cache_path, cache_path.with_suffix(".sqlite")
+        print(
+            f"--cache {legacy_cache_path.name} is a legacy JSON cache, which is deprecated; "
+            f"it is imported into {cache_path} and that database is used",
+            file=sys.stderr,
+        )
+
+    with METRICS.stage("read_input"):
+        raw = input_path.read_bytes()
+        document = json.loads(raw)
+    METRICS.add_bytes("read", len(raw))
+    cache = GeocodeCache(
+        cache_path,
+        ttl_days=args.cache_ttl_days,
+        negative_ttl_days=args.negative_ttl_days,
+        legacy_json=legacy_cache_path,
+    )
 
-        if result:
-            provider["lat"] = result["lat"]
-            provider["lon"] = result["lon"]
-            provider["geocode"] = result
-            geocoded_count += 1
+    if args.backend == "replay":
+        if args.replay_file:
+            replay_results = json.loads(Path(args.replay_file).expanduser().read_text(encoding="utf-8"))
         else:
-            provider["geocode"] = None
-
-    document["geocoding"] = {
-        "provider": "OpenStreetMap Nominatim",
-        "query_template": "name, address, location, Buenos Aires, Argentina",
-        "cached": True,
-        "input_count": provider_count,
-        "geocoded_count": geocoded_count,
-        "unresolved_count": provider_count - geocoded_count,
-    }
-
-    output_path.write_text(json.dumps(document, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            replay_results = cache.as_dict()
+        backend = ReplayBackend(
+            replay_results,
+            rate=1000.0 if args.rate is None else args.rate,
+            concurrency=args.concurrency or 8,
+        )
+    else:
+        backend = NominatimBackend(args.nominatim_url, rate=args.rate, concurrency=args.concurrency or 8)
+    engine = GeocodingEngine(backend, retries=args.retries)
+    street_index = None
+    if args.street_index:
+        with METRICS.stage("load_street_index"):
+            street_index = StreetIndex.load(Path(args.street_index).expanduser())
+
+    providers = document.get("providers", [])
+    provider_count = len(providers)
+    delta = None
+    if args.previous:
+        # Re-applied on --resume too: the queue only holds the addresses the delta left unlocated.
+        previous_path = Path(args.previous).expanduser().resolve()
+        with METRICS.stage("delta"):
+            delta = apply_delta(providers, json.loads(previous_path.read_bytes()).get("providers", []))
+            changelog_path = output_path.with_name(f"{output_path.stem}.changes.json")
+            write_json(changelog_document(delta, input_path, previous_path), changelog_path)
+        print(f"Delta against {previous_path}: {format_counts(delta['counts'])}")
+        print(f"Wrote {changelog_path}")
+    queue_path = (
+        Path(args.queue).expanduser().resolve()
+        if args.queue
+        else output_path.with_name(f"{output_path.stem}.queue.sqlite")
+    )
+    fingerprint = hashlib.sha256(raw).hexdigest()
+    queue = WorkQueue(queue_path)
+
+    if args.resume:
+        if queue.meta("input_sha256") != fingerprint:
+            queue.close()
+            print(
+                f"Cannot resume: {queue_path} was not built from {input_path}. "
+                "Run without --resume to start over."
+            )
+            return 2
+        reopened = queue.reopen()
+        print(f"Resuming {queue_path}" + (f" ({reopened} addresses reopened)" if reopened else ""))
+    else:
+        # Many doctors share a clinic address: resolve each distinct address once.
+        with METRICS.stage("build_queue"):
+            groups = group_pending(providers, range(len(providers)) if delta is None else delta["pending"])
+            pending_count = sum(len(members) for members in groups.values())
+            queue.reset(groups, fingerprint)
+        if groups:
+            print(
+                f"Pending: {pending_count} providers, {len(groups)} distinct addresses "
+                f"(dedup ratio {pending_count / len(groups):.2f}x)"
+            )
+    for merge_path in args.merge_queue:
+        print(f"Merged {queue.merge(Path(merge_path).expanduser().resolve())} addresses from {merge_path}")
+
+    counts = queue.counts()
+    group_count = sum(groups for groups, _ in counts.values())
+    finished = sum(counts.get(status, (0, 0))[0] for status in ("done", "failed"))
+    progress = Progress(group_count, finished)
+
+    planner = None
+    if args.plan_variants:
+        with METRICS.stage("plan_variants"):
+            history = [providers] + [
+                json.loads(Path(path).expanduser().read_text(encoding="utf-8")).get("providers", [])
+                for path in args.plan_history
+            ]
+            samples = list(planner_samples(history))
+            planner = QueryPlanner()
+            learned = planner.learn(samples, cache.get)
+            simulation = simulate(samples, cache.get)
+        print(f"Variant planner: learned from {learned} cached addresses")
+        print(f"Variant planner (held-out replay): {format_simulation(simulation)}")
+
+    def resolve(claim: tuple[str, dict]):
+        return resolve_provider(engine, cache, claim[1], street_index, planner)
+
+    def geocoding_summary(complete: bool) -> dict:
+        geocoded_count = sum(1 for p in providers if p.get("lat") is not None and p.get("lon") is not None)
+        summary = {
+            "provider": "OpenStreetMap Nominatim" if args.backend == "nominatim" else args.backend,
+            "query_template": "name, address, location, Buenos Aires, Argentina",
+            "cached": True,
+            "input_count": provider_count,
+            "geocoded_count": geocoded_count,
+            "unresolved_count": provider_count - geocoded_count,
+            "distinct_addresses": group_count,
+            "complete": complete,
+            "queue": str(queue_path),
+        }
+        if delta is not None:
+            summary["delta"] = {"previous": str(previous_path), "changelog": str(changelog_path), **delta["counts"]}
+        return summary
+
+    checkpoint_at = time.monotonic() + args.checkpoint_every
+    resolved_now = 0
+    with METRICS.stage("resolve"):
+        for (key, _), (query, result, failed) in engine.map(resolve, queue.claims(args.shard)):
+            queue.complete(key, query, result, failed)
+            resolved_now += bool(result)
+            progress.update(requests=engine.request_count)
+            if args.checkpoint_every and time.monotonic() >= checkpoint_at:
+                with METRICS.stage("checkpoint"):
+                    queue.flush()
+                    apply_results(providers, queue)
+                    document["geocoding"] = geocoding_summary(complete=False)
+                    write_document(document, output_path)
+                checkpoint_at = time.monotonic() + args.checkpoint_every
+        queue.flush()
+    if group_count:
+        progress.finish(requests=engine.request_count)
+
+    apply_results(providers, queue)
+    counts = queue.counts()
+    outstanding = sum(counts.get(status, (0, 0))[0] for status in ("pending", "claimed"))
+    failed_count = counts.get("failed", (0, 0))[0]
+    document["geocoding"] = geocoding_summary(complete=outstanding == 0)
+    geocoded_count = document["geocoding"]["geocoded_count"]
+    requests_per_success = round(engine.request_count / resolved_now, 3) if resolved_now else None
+    document["geocoding"]["requests_per_success"] = requests_per_success
+    if planner is not None:
+        document["geocoding"]["variant_planner"] = {
+            "learned_addresses": learned,
+            "variants": planner.summary(),
+            "simulation": simulation,
+        }
+    if street_index is not None:
+        local_count = METRICS.counters["local_hits"]
+        with METRICS.stage("compare_street_index"):
+            comparison = compare_with_cache(street_index, cache.as_dict())
+        document["geocoding"]["street_index"] = {
+            "path": str(Path(args.street_index).expanduser().resolve()),
+            "resolved_addresses": local_count,
+            "cache_agreement": comparison,
+        }
+
+    with METRICS.stage("write_json"):
+        written = write_document(document, output_path)
+    METRICS.add_bytes("written", written)
+    if args.columns:
+        with METRICS.stage("write_columns"):
+            METRICS.add_bytes("written", write_columns(columns_path(output_path), document))
+    METRICS.count("providers", provider_count)
+    METRICS.count("distinct_addresses", group_count)
+    METRICS.count("requests", engine.request_count)
+    METRICS.count("retries", engine.retry_count)
+    if args.export_json_cache:
+        cache.export_json(legacy_cache_path)
+    positives, negatives = cache.counts()
+    cache.close()
+    queue.close()
     print(f"Wrote {output_path}")
+    if args.columns:
+        print(f"Wrote {columns_path(output_path)}")
     print(f"Geocoded {geocoded_count}/{provider_count} providers")
-    print(f"Cache: {cache_path}")
+    if outstanding or failed_count:
+        print(
+            f"Queue: {queue_path} ({outstanding} addresses left to other workers or shards, "
+            f"{failed_count} failed; run again with --resume to finish)"
+        )
+    print(f"Cache: {cache_path} ({positives} results, {negatives} negative)")
+    print(f"Requests: {engine.request_count} ({engine.retry_count} retries)")
+    if engine.request_count:
+        print(f"Requests per resolved address this run: {requests_per_success or '-'}")
+    if street_index is not None:
+        print(f"Street index: {local_count}/{group_count} addresses resolved offline")
+        print(f"Street index vs cache: {format_comparison(comparison)}")
     return 0
 
 
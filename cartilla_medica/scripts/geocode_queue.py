@@ -0,0 +1,284 @@
+"""Durable work queue of address groups for resumable geocoding runs.
+
+A queue is a SQLite file (by default next to the output JSON) holding one row
+per distinct address still to geocode: the fields its query variants are
+built from, the indexes of the providers sharing it in the input document,
+and, once resolved, the query that answered and its result. The geocoder
+writes results back in small transactions as lookups complete, so a killed
+run loses at most the last few seconds of work (and those lookups are in the
+geocode cache anyway); `--resume` picks up the remaining groups without
+re-walking the providers.
+
+Workers claim groups in batches under a lease, so several processes (each
+with its own backend) can drain one queue file together; claims of a worker
+that died are released when its lease runs out, or at once by a resuming
+worker on the same host. `--shard K/N` restricts a worker to every N-th
+group, for splitting one input across machines, each with its own queue
+file; `merge` then copies finished groups from the other queue files in.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    seq INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    provider TEXT NOT NULL,
+    members TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    query TEXT,
+    result TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS groups_status ON groups (status, seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+PENDING, CLAIMED, DONE, FAILED = "pending", "claimed", "done", "failed"
+# Only what build_query_variants reads is stored for a group.
+PROVIDER_FIELDS = ("address", "location")
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """`"K/N"` -> `(K, N)` with 0 <= K < N."""
+    index, _, count = value.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"shard must look like K/N, got {value!r}") from None
+    if not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"shard index must be in 0..{shard[1] - 1}, got {value!r}")
+    return shard
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class WorkQueue:
+    """SQLite-backed queue of address groups, used from a single thread per process."""
+
+    def __init__(self, path: Path, lease_s: float = 600.0, flush_every: float = 2.0) -> None:
+        self.path = path
+        self.lease_s = lease_s
+        self.flush_every = flush_every
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._completed: list[tuple] = []
+        self._flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # Setup ---------------------------------------------------------------
+
+    def meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def reset(self, groups: dict[str, list[tuple[int, dict]]], fingerprint: str) -> None:
+        """Replace the queue with `groups` (address key -> [(provider index, provider)])."""
+        rows = (
+            (
+                key,
+                json.dumps({field: members[0][1].get(field) for field in PROVIDER_FIELDS}, ensure_ascii=False),
+                json.dumps([index for index, _ in members]),
+                len(members),
+            )
+            for key, members in groups.items()
+        )
+        with self._conn:
+            self._conn.execute("DELETE FROM groups")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.executemany("INSERT INTO groups (key, provider, members, size) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('input_sha256', ?)", (fingerprint,))
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('created_at', ?)", (str(time.time()),))
+
+    def reopen(self) -> int:
+        """Make failed groups and claims held by dead processes on this host claimable again."""
+        host = self.worker.rsplit(":", 1)[0]
+        stale = []
+        for (worker,) in self._conn.execute("SELECT DISTINCT worker FROM groups WHERE status = ?", (CLAIMED,)):
+            worker_host, _, pid = (worker or "").rpartition(":")
+            if worker_host == host and not pid_alive(int(pid or 0)):
+                stale.append(worker)
+        with self._conn:
+            reopened = self._conn.execute("UPDATE groups SET status = ? WHERE status = ?", (PENDING, FAILED)).rowcount
+            for worker in stale:
+                reopened += self._conn.execute(
+                    "UPDATE groups SET status = ?, worker = NULL WHERE status = ? AND worker = ?",
+                    (PENDING, CLAIMED, worker),
+                ).rowcount
+        return reopened
+
+    def merge(self, other: Path) -> int:
+        """Copy groups finished in another queue file (e.g. another shard's) into this one."""
+        with self._conn:
+            self._conn.execute("ATTACH DATABASE ? AS other", (str(other),))
+            try:
+                merged = self._conn.execute(
+                    f"""
+                    UPDATE groups SET status = '{DONE}', worker = o.worker, query = o.query,
+                        result = o.result, updated_at = o.updated_at, lease_until = NULL
+                    FROM other.groups AS o
+                    WHERE o.key = groups.key AND o.status = '{DONE}' AND groups.status != '{DONE}'
+                    """
+                ).rowcount
+            finally:
+                self._conn.commit()
+                self._conn.execute("DETACH DATABASE other")
+        return merged
+
+    # Work ----------------------------------------------------------------
+
+    def claims(self, shard: tuple[int, int] = (0, 1), batch: int = 32) -> Iterator[tuple[str, dict]]:
+        """Yield `(key, provider)` for claimable groups, claiming `batch` at a time.
+
+        Stops when nothing is left to claim; groups other live workers hold
+        are theirs to finish.
+        """
+        while True:
+            rows = self._claim(shard, batch)
+            if not rows:
+                return
+            for key, provider in rows:
+                yield key, json.loads(provider)
+
+    def _claim(self, shard: tuple[int, int], batch: int) -> list[tuple[str, str]]:
+        now = time.time()
+        index, count = shard
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                """
+                SELECT key, provider FROM groups
+                WHERE (status = ? OR (status = ? AND lease_until < ?)) AND seq % ? = ?
+                ORDER BY seq LIMIT ?
+                """,
+                (PENDING, CLAIMED, now, count, index, batch),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE groups SET status = ?, worker = ?, lease_until = ? WHERE key = ?",
+                [(CLAIMED, self.worker, now + self.lease_s, key) for key, _ in rows],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def complete(self, key: str, query: str | None, result: dict | None, failed: bool = False) -> None:
+        """Record a group's outcome; written out every `flush_every` seconds."""
+        payload = json.dumps(result, ensure_ascii=False) if result else None
+        self._completed.append((FAILED if failed else DONE, query, payload, time.time(), key, self.worker))
+        if time.monotonic() - self._flushed_at >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._completed:
+            with self._conn:
+                # A group whose lease expired and was claimed by another worker is left to that worker.
+                self._conn.executemany(
+                    """
+                    UPDATE groups SET status = ?, query = ?, result = ?, updated_at = ?, lease_until = NULL
+                    WHERE key = ? AND worker = ? AND status = 'claimed'
+                    """,
+                    self._completed,
+                )
+            self._completed = []
+        self._flushed_at = time.monotonic()
+
+    # Reading -------------------------------------------------------------
+
+    def counts(self) -> dict[str, tuple[int, int]]:
+        """status -> (groups, providers)."""
+        rows = self._conn.execute("SELECT status, COUNT(*), SUM(size) FROM groups GROUP BY status").fetchall()
+        return {status: (groups, providers or 0) for status, groups, providers in rows}
+
+    def results(self) -> Iterator[tuple[list[int], str | None, dict | None]]:
+        """`(provider indexes, query, result)` of every resolved or failed group."""
+        rows = self._conn.execute(
+            "SELECT members, query, result FROM groups WHERE status IN (?, ?) ORDER BY seq", (DONE, FAILED)
+        )
+        for members, query, result in rows:
+            yield json.loads(members), query, json.loads(result) if result else None
+
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Progress:
+    """Throttled one-line progress and ETA readout on stderr."""
+
+    def __init__(self, total: int, done: int = 0, interval: float = 2.0) -> None:
+        self.total = total
+        self.done = done
+        self.interval = interval
+        self.started_done = done
+        self.started = time.monotonic()
+        self._printed_at = 0.0
+        self._tty = sys.stderr.isatty()
+
+    def update(self, n: int = 1, **counts: int) -> None:
+        self.done += n
+        now = time.monotonic()
+        if now - self._printed_at >= self.interval:
+            self._printed_at = now
+            self._print(now, counts)
+
+    def finish(self, **counts: int) -> None:
+        self._print(time.monotonic(), counts)
+        if self._tty:
+            sys.stderr.write("\n")
+
+    def _print(self, now: float, counts: dict[str, int]) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        rate = (self.done - self.started_done) / elapsed
+        remaining = self.total - self.done
+        eta = format_duration(remaining / rate) if rate > 0 and remaining > 0 else "-"
+        percent = self.done / self.total if self.total else 1.0
+        extra = "".join(f", {name} {value}" for name, value in counts.items())
+        line = f"[{self.done}/{self.total} groups] {percent:.1%} {rate:.1f}/s ETA {eta}{extra}"
+        sys.stderr.write(f"\r{line}\033[K" if self._tty else line + "\n")
+        sys.stderr.flush()
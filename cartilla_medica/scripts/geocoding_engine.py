@@ -0,0 +1,324 @@
+"""Concurrent, rate-limited geocoding engine for the Cartilla Médica geocoder.
+
+A backend answers one query at a time; the engine wraps it with a token-bucket
+rate limiter, a bounded worker pool and retry/backoff on throttling or server
+errors. Two backends ship with it:
+
+* `NominatimBackend` talks to a Nominatim instance over a pooled keep-alive
+  HTTP connection per worker thread. The public endpoint is always capped at
+  1 request/second, whatever the caller asks for; other endpoints are only
+  throttled when given a positive `rate`.
+* `ReplayBackend` answers from a JSON mapping of query -> result (for example
+  an existing `geocode_cache.json`) with optional simulated latency and
+  failures, so the engine can be exercised fully offline.
+"""
+
+from __future__ import annotations
+
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from geocode_cache import cache_key
+
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+PUBLIC_NOMINATIM_HOST = "nominatim.openstreetmap.org"
+PUBLIC_NOMINATIM_RATE = 1.0
+USER_AGENT = "cartilla-medica-geocoder/1.0 (local-batch-geocoding)"
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class GeocodeError(Exception):
+    """A lookup failed and should not be cached."""
+
+
+class RetryableGeocodeError(GeocodeError):
+    """A lookup failed with a transient error (throttling, 5xx, network)."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Drain the bucket so nobody sends again for `seconds` (e.g. Retry-After)."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class Unthrottled:
+    """Limiter for endpoints without a rate limit; it only honours pauses (e.g. Retry-After)."""
+
+    def __init__(self) -> None:
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def make_limiter(rate: float | None, burst: int = 1) -> TokenBucket | Unthrottled:
+    """A token bucket for a positive `rate`; no throttling for None or a rate of 0 or less."""
+    if rate is None or rate <= 0:
+        return Unthrottled()
+    return TokenBucket(rate, burst)
+
+
+def parse_nominatim_match(match: dict) -> dict:
+    return {
+        "lat": float(match["lat"]),
+        "lon": float(match["lon"]),
+        "display_name": match.get("display_name"),
+        "class": match.get("class"),
+        "type": match.get("type"),
+        "importance": match.get("importance"),
+        "place_id": match.get("place_id"),
+    }
+
+
+class NominatimBackend:
+    """Nominatim over HTTP(S); `rate` None means 1 request/second on the public host and no limit elsewhere."""
+
+    name = "nominatim"
+
+    def __init__(
+        self,
+        url: str = NOMINATIM_URL,
+        rate: float | None = None,
+        burst: int = 1,
+        concurrency: int = 1,
+        timeout: float = 30,
+        user_agent: str = USER_AGENT,
+    ) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in {"http", "https"} or not parsed.hostname:
+            raise ValueError(f"Unsupported Nominatim URL: {url}")
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = parsed.path or "/search"
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+        self.is_public = self.host == PUBLIC_NOMINATIM_HOST
+        if self.is_public:
+            # Public usage policy: an absolute maximum of 1 request per second.
+            if rate is None or rate <= 0:
+                rate = PUBLIC_NOMINATIM_RATE
+            rate = min(rate, PUBLIC_NOMINATIM_RATE)
+            burst = 1
+            concurrency = 1
+        # Self-hosted: None (the default) or 0 leaves requests unthrottled, bounded only by the concurrency.
+        self.rate = rate if rate is not None and rate > 0 else None
+        self.concurrency = max(1, concurrency)
+        self.limiter = make_limiter(self.rate, burst)
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.scheme == "https":
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def lookup(self, query: str) -> dict | None:
+        params = {
+            "q": query,
+            "format": "jsonv2",
+            "limit": "1",
+            "addressdetails": "1",
+            "countrycodes": "ar",
+        }
+        target = f"{self.path}?{urllib.parse.urlencode(params)}"
+        headers = {"User-Agent": self.user_agent, "Connection": "keep-alive"}
+
+        self.limiter.acquire()
+        try:
+            conn = self._connection()
+            conn.request("GET", target, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (http.client.HTTPException, OSError) as exc:
+            self._drop_connection()
+            raise RetryableGeocodeError(f"{type(exc).__name__}: {exc}") from exc
+
+        if resp.status in RETRYABLE_STATUSES:
+            retry_after = parse_retry_after(resp.getheader("Retry-After"))
+            if retry_after:
+                self.limiter.penalize(retry_after)
+            if resp.will_close:
+                self._drop_connection()
+            raise RetryableGeocodeError(f"HTTP {resp.status}", retry_after)
+        if resp.status != 200:
+            raise GeocodeError(f"HTTP {resp.status}: {body[:200]!r}")
+        if resp.will_close:
+            self._drop_connection()
+
+        payload = json.loads(body.decode("utf-8"))
+        if not payload:
+            return None
+        return parse_nominatim_match(payload[0])
+
+
+class ReplayBackend:
+    """Offline stand-in that answers from a query -> result mapping."""
+
+    name = "replay"
+
+    def __init__(
+        self,
+        results: dict[str, dict | None],
+        rate: float = 1000.0,
+        concurrency: int = 8,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.results = {cache_key(query): result for query, result in results.items()}
+        self.rate = rate if rate > 0 else None
+        self.concurrency = max(1, concurrency)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.limiter = make_limiter(self.rate, burst=max(1, int(rate)))
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Path, **kwargs) -> "ReplayBackend":
+        return cls(json.loads(path.read_text(encoding="utf-8")), **kwargs)
+
+    def lookup(self, query: str) -> dict | None:
+        self.limiter.acquire()
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate:
+            with self._random_lock:
+                failed = self._random.random() < self.failure_rate
+            if failed:
+                raise RetryableGeocodeError("simulated HTTP 503")
+        return self.results.get(cache_key(query))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class GeocodingEngine:
+    """Runs backend lookups on a bounded thread pool with retry and backoff."""
+
+    def __init__(
+        self,
+        backend,
+        max_workers: int | None = None,
+        retries: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.backend = backend
+        self.max_workers = max(1, max_workers or backend.concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.request_count = 0
+        self.retry_count = 0
+        self._stats_lock = threading.Lock()
+
+    def lookup(self, query: str) -> dict | None:
+        attempt = 0
+        while True:
+            with self._stats_lock:
+                self.request_count += 1
+            try:
+                return self.backend.lookup(query)
+            except RetryableGeocodeError as exc:
+                if attempt >= self.retries:
+                    raise GeocodeError(f"{query!r}: giving up after {attempt + 1} attempts ({exc})") from exc
+                delay = exc.retry_after or min(self.max_backoff, self.backoff * 2 ** attempt)
+                # Full jitter keeps workers from retrying in lockstep.
+                time.sleep(random.uniform(delay / 2, delay))
+                attempt += 1
+                with self._stats_lock:
+                    self.retry_count += 1
+
+    def map(self, func: Callable[[T], R], items: Iterable[T], max_pending: int | None = None) -> Iterator[tuple[T, R]]:
+        """Apply `func` to every item on the worker pool, yielding in completion order.
+
+        `func` typically calls `self.lookup` one or more times; the limiter
+        inside the backend keeps the aggregate request rate bounded. Items are
+        taken from `items` only as workers free up (at most `max_pending`,
+        default twice the workers, are in flight), so a lazily produced
+        iterable such as a work queue handing out claims is drained at the
+        pace of the lookups.
+        """
+        limit = max_pending or self.max_workers * 2
+        iterator = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {pool.submit(func, item): item for item in itertools.islice(iterator, limit)}
+            while pending:
+                done, _ = wait_futures(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    for next_item in itertools.islice(iterator, 1):
+                        pending[pool.submit(func, next_item)] = next_item
+                    yield item, future.result()
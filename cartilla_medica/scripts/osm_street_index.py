@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""Offline street-level geocoder built from a local OpenStreetMap extract.
+
+Every OSM object tagged with `addr:street` and `addr:housenumber` becomes an
+anchor `(street, number, lat, lon)`. Street names go through the same
+`normalize_address` as the cartilla addresses and are then folded into a
+street key: accents, case and punctuation are dropped, as are street-type
+words ("Avenida", "Calle", ...), which the cartilla uses inconsistently.
+Anchors are sorted by street, side of the street (number parity) and number,
+so a lookup is a dict hit for the street and a binary search for the number:
+
+1. the exact number when OSM has it;
+2. otherwise a linear interpolation between the nearest anchors below and
+   above, on the same side of the street first, when they are at most
+   `MAX_SPAN` numbers apart and close enough on the ground to be one stretch
+   of the same street (not two same-named streets in different barrios);
+3. otherwise the nearest anchor within `SNAP_SPAN` numbers.
+
+Anything else is a miss and is left to Nominatim.
+
+The same street name recurs across localities, so each street is split by
+the `addr:city` of its anchors and remembers the cities and `addr:suburb`
+barrios it runs through. A query is matched against the localities it names
+(the parts after the address, and the " - Localidad" suffix of the address
+itself): the street must be the only one with that name in the named
+locality, or, when the query names no known locality, the only one with that
+name at all. Missing or ambiguous localities are misses, left to Nominatim.
+
+Extracts are read from GeoJSON (a FeatureCollection, or one feature per line
+as written by `osmium export -f geojsonseq`) or, with pyosmium installed
+(pip install osmium), straight from an `.osm.pbf`. The index is persisted as
+a single `.npz` file next to the geocoded JSON:
+
+    python osm_street_index.py build buenos-aires.osm.pbf
+    python osm_street_index.py lookup "Av. Belgrano 2199"
+    python osm_street_index.py evaluate     # agreement with the geocode cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from address_rules import normalize_address
+from geocode_cache import GeocodeCache, fold_text
+from provider_spatial_index import EARTH_RADIUS_M
+
+try:
+    import osmium
+except ImportError:
+    osmium = None
+
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+HOUSE_NUMBER_RE = re.compile(r"\d+")
+NUMBER_RUN_RE = re.compile(r"\b(\d{1,5})\b")
+STREET_TYPES = frozenset({"avenida", "av", "avda", "calle", "pasaje", "pje", "boulevard", "bulevar", "bv", "autopista"})
+GEOJSON_SEQ_SUFFIXES = {".geojsonseq", ".geojsonl", ".jsonl", ".ndjson"}
+
+# Interpolate only between anchors at most this many numbers apart (two Buenos Aires blocks)...
+MAX_SPAN = 200
+# ...and at most this far apart on the ground per number, plus slack (a block of 100 is ~130 m).
+MAX_M_PER_NUMBER = 2.5
+SLACK_M = 100.0
+# Without a bracket, accept the nearest anchor this many numbers away (same lot or the next one).
+SNAP_SPAN = 20
+# Anchors sharing a street and number further apart than this are different streets; drop them.
+AMBIGUOUS_M = 250.0
+SOURCE = "osm_street_index"
+FORMAT = 2
+
+# (street, housenumber, lat, lon, city, suburb); city and suburb may be empty.
+Address = tuple[str, str, float, float, str, str]
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def street_key(name: str) -> str:
+    return fold_street(normalize_address(name))
+
+
+def fold_street(normalized: str) -> str:
+    """Street key of an already normalized name."""
+    tokens = TOKEN_RE.findall(fold_text(normalized))
+    return " ".join(token for token in tokens if token not in STREET_TYPES)
+
+
+def fold_localities(value: str | None) -> list[str]:
+    """Folded names in an OSM locality tag, which may hold several separated by ";"."""
+    return [name for name in (fold_text(part) for part in (value or "").split(";")) if name]
+
+
+# Reading extracts -------------------------------------------------------
+
+
+def centroid(geometry: dict | None) -> tuple[float, float] | None:
+    """(lat, lon) of a GeoJSON geometry: the point itself, or the mean of its (outer) vertices."""
+    if not geometry:
+        return None
+    kind, coords = geometry.get("type"), geometry.get("coordinates")
+    if not coords:
+        return None
+    if kind == "Point":
+        points = [coords]
+    elif kind in ("LineString", "MultiPoint"):
+        points = coords
+    elif kind == "Polygon":
+        points = coords[0][:-1] or coords[0]
+    elif kind == "MultiPolygon":
+        points = coords[0][0][:-1] or coords[0][0]
+    else:
+        return None
+    lon = sum(point[0] for point in points) / len(points)
+    lat = sum(point[1] for point in points) / len(points)
+    return lat, lon
+
+
+def iter_geojson_addresses(path: Path) -> Iterator[Address]:
+    if path.suffix.lower() in GEOJSON_SEQ_SUFFIXES:
+        with path.open(encoding="utf-8") as f:
+            features = (json.loads(line.strip("\x1e \n")) for line in f if line.strip("\x1e \n"))
+            yield from _feature_addresses(features)
+    else:
+        document = json.loads(path.read_text(encoding="utf-8"))
+        yield from _feature_addresses(document.get("features", []))
+
+
+def _feature_addresses(features: Iterable[dict]) -> Iterator[Address]:
+    for feature in features:
+        properties = feature.get("properties") or {}
+        street, number = properties.get("addr:street"), properties.get("addr:housenumber")
+        if not street or not number:
+            continue
+        point = centroid(feature.get("geometry"))
+        if point is not None:
+            yield street, number, point[0], point[1], properties.get("addr:city", ""), properties.get("addr:suburb", "")
+
+
+def iter_pbf_addresses(path: Path) -> list[Address]:
+    if osmium is None:
+        raise RuntimeError(
+            "Reading .pbf extracts needs pyosmium (pip install osmium); "
+            "or convert it first with `osmium export -f geojsonseq`"
+        )
+    found: list[Address] = []
+
+    def places(tags) -> tuple[str, str]:
+        return tags.get("addr:city", ""), tags.get("addr:suburb", "")
+
+    class AddressHandler(osmium.SimpleHandler):
+        def node(self, node):
+            tags = node.tags
+            if "addr:street" in tags and "addr:housenumber" in tags and node.location.valid():
+                location = node.location
+                found.append((tags["addr:street"], tags["addr:housenumber"], location.lat, location.lon, *places(tags)))
+
+        def way(self, way):
+            tags = way.tags
+            if "addr:street" not in tags or "addr:housenumber" not in tags:
+                return
+            points = [(n.location.lat, n.location.lon) for n in way.nodes if n.location.valid()]
+            if len(points) > 1 and points[0] == points[-1]:
+                points = points[:-1]
+            if points:
+                lat = sum(p[0] for p in points) / len(points)
+                lon = sum(p[1] for p in points) / len(points)
+                found.append((tags["addr:street"], tags["addr:housenumber"], lat, lon, *places(tags)))
+
+    AddressHandler().apply_file(str(path), locations=True)
+    return found
+
+
+def read_addresses(path: Path) -> Iterable[Address]:
+    if path.name.lower().endswith(".pbf"):
+        return iter_pbf_addresses(path)
+    return iter_geojson_addresses(path)
+
+
+# Index ------------------------------------------------------------------
+
+
+class StreetIndex:
+    """Streets (a street key within one city) with per-side slices into number-sorted anchor arrays."""
+
+    def __init__(
+        self,
+        keys: list[str],
+        names: list[str],
+        localities: list[frozenset[str]],
+        offsets: np.ndarray,
+        numbers: np.ndarray,
+        lats: np.ndarray,
+        lons: np.ndarray,
+    ) -> None:
+        self.keys = keys
+        self.names = names
+        # Folded city and barrio names each street runs through.
+        self.localities = localities
+        # Street n's even numbers are offsets[2n]:offsets[2n+1], its odd ones offsets[2n+1]:offsets[2n+2].
+        self.offsets = offsets
+        self.numbers = numbers
+        self.lats = lats
+        self.lons = lons
+        self.positions: dict[str, list[int]] = {}
+        for n, key in enumerate(keys):
+            self.positions.setdefault(key, []).append(n)
+        self.known_localities = frozenset().union(*localities)
+        # Python lists make the per-lookup binary searches and reads several times cheaper than NumPy scalars.
+        self._numbers = numbers.tolist()
+        self._offsets = offsets.tolist()
+        self._lats = lats.tolist()
+        self._lons = lons.tolist()
+
+    # Building ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, addresses: Iterable[Address]) -> tuple["StreetIndex", dict]:
+        """Index `(street, housenumber, lat, lon, city, suburb)` rows; returns the index and build stats."""
+        stats = {"addresses": 0, "unparsed": 0, "ambiguous": 0}
+        # Keyed by (street key, folded city); "" collects anchors without a city.
+        points: dict[tuple[str, str], dict[int, list[tuple[float, float]]]] = {}
+        names: dict[tuple[str, str], dict[str, int]] = {}
+        places: dict[tuple[str, str], set[str]] = {}
+        key_cache: dict[str, str] = {}
+        for street, housenumber, lat, lon, city, suburb in addresses:
+            stats["addresses"] += 1
+            match = HOUSE_NUMBER_RE.search(housenumber)
+            key = key_cache.get(street)
+            if key is None:
+                key = key_cache[street] = street_key(street)
+            if not match or not key:
+                stats["unparsed"] += 1
+                continue
+            cities = fold_localities(city)
+            segment = (key, cities[0] if cities else "")
+            points.setdefault(segment, {}).setdefault(int(match.group()), []).append((lat, lon))
+            spellings = names.setdefault(segment, {})
+            spellings[street] = spellings.get(street, 0) + 1
+            places.setdefault(segment, set()).update(cities, fold_localities(suburb))
+
+        # Anchors without a city belong to the street's only city, when it has one.
+        cities_by_key: dict[str, list[str]] = {}
+        for key, city in points:
+            if city:
+                cities_by_key.setdefault(key, []).append(city)
+        for key, cities in cities_by_key.items():
+            if len(cities) == 1 and (key, "") in points:
+                segment = (key, cities[0])
+                for number, located in points.pop((key, "")).items():
+                    points[segment].setdefault(number, []).extend(located)
+                for street, count in names.pop((key, "")).items():
+                    names[segment][street] = names[segment].get(street, 0) + count
+                places[segment].update(places.pop((key, "")))
+
+        segments = sorted(points)
+        offsets = [0]
+        numbers: list[int] = []
+        lats: list[float] = []
+        lons: list[float] = []
+        for segment in segments:
+            by_number = points[segment]
+            for parity in (0, 1):
+                for number in sorted(n for n in by_number if n % 2 == parity):
+                    located = by_number[number]
+                    lat = sum(p[0] for p in located) / len(located)
+                    lon = sum(p[1] for p in located) / len(located)
+                    if len(located) > 1:
+                        if max(distance_m(lat, lon, p[0], p[1]) for p in located) > AMBIGUOUS_M:
+                            stats["ambiguous"] += 1
+                            continue
+                    numbers.append(number)
+                    lats.append(lat)
+                    lons.append(lon)
+                offsets.append(len(numbers))
+        # The most common spelling of each street is the one shown in results.
+        street_names = [max(names[segment].items(), key=lambda item: item[1])[0] for segment in segments]
+        stats["streets"] = len(segments)
+        stats["anchors"] = len(numbers)
+        index = cls(
+            [key for key, _ in segments],
+            street_names,
+            [frozenset(places[segment]) for segment in segments],
+            np.array(offsets, dtype=np.int64),
+            np.array(numbers, dtype=np.int32),
+            np.array(lats, dtype=np.float64),
+            np.array(lons, dtype=np.float64),
+        )
+        return index, stats
+
+    # Persistence ---------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        arrays = {
+            "keys": np.frombuffer("\n".join(self.keys).encode("utf-8"), dtype=np.uint8),
+            "names": np.frombuffer("\n".join(self.names).encode("utf-8"), dtype=np.uint8),
+            "localities": np.frombuffer(
+                "\n".join(";".join(sorted(places)) for places in self.localities).encode("utf-8"), dtype=np.uint8
+            ),
+            "offsets": self.offsets,
+            "numbers": self.numbers,
+            "lats": self.lats,
+            "lons": self.lons,
+        }
+        meta = {
+            "format": FORMAT,
+            "streets": len(self.keys),
+            "anchors": len(self.numbers),
+            "street_types": sorted(STREET_TYPES),
+        }
+        arrays["meta"] = np.array(json.dumps(meta, ensure_ascii=False))
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "StreetIndex":
+        def lines(array: np.ndarray) -> list[str]:
+            text = array.tobytes().decode("utf-8")
+            return text.split("\n") if text else []
+
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != FORMAT or meta["street_types"] != sorted(STREET_TYPES):
+                raise ValueError(f"{path} was built with different street keys; rebuild it")
+            keys = lines(data["keys"])
+            # One line per street; a street without localities is an empty line.
+            localities = data["localities"].tobytes().decode("utf-8").split("\n") if keys else []
+            return cls(
+                keys,
+                lines(data["names"]),
+                [frozenset(filter(None, line.split(";"))) for line in localities],
+                data["offsets"],
+                data["numbers"],
+                data["lats"],
+                data["lons"],
+            )
+
+    # Queries -------------------------------------------------------------
+
+    def parse(self, query: str) -> tuple[int, int] | None:
+        """`(street position, number)` from the address at the start of a query, if the street is indexed.
+
+        Parts of the query are taken up to the first one holding a number, so
+        "Fernandez De La Cruz, Avenida 4402, ..." keeps its whole street. Each
+        number in turn is tried as the house number ("Avenida 9 De Julio 1020").
+        The rest of the query, and any " - Localidad" suffix of the address,
+        picks among same-named streets (see `resolve`).
+        """
+        parts = query.split(",")
+        for end, part in enumerate(parts, 1):
+            if any(ch.isdigit() for ch in part):
+                break
+        else:
+            return None
+        head = " ".join(parts[:end])
+        address = normalize_address(head)
+        for match in NUMBER_RUN_RE.finditer(address):
+            key = fold_street(address[: match.start()])
+            if key in self.positions:
+                terms = {fold_text(part) for part in head.split(" - ")[1:] + parts[end:]}
+                position = self.resolve(key, terms)
+                return None if position is None else (position, int(match.group(1)))
+        return None
+
+    def resolve(self, key: str, terms: set[str]) -> int | None:
+        """The street named `key` in the localities `terms`, or None when that is missing or ambiguous."""
+        candidates = self.positions[key]
+        matching = [position for position in candidates if self.localities[position] & terms]
+        if matching:
+            return matching[0] if len(matching) == 1 else None
+        if terms & self.known_localities:
+            # The query names a locality, and this street is not in it.
+            return None
+        return candidates[0] if len(candidates) == 1 else None
+
+    def _side(self, position: int, parity: int) -> tuple[int, int]:
+        slot = 2 * position + parity
+        return self._offsets[slot], self._offsets[slot + 1]
+
+    def locate(self, position: int, number: int) -> tuple[float, float, str] | None:
+        """`(lat, lon, how)` for a number on an indexed street; `how` is "house", "interpolated" or "nearby"."""
+        numbers, lats, lons = self._numbers, self._lats, self._lons
+        nearest = None
+        for parity in (number % 2, 1 - number % 2):
+            start, end = self._side(position, parity)
+            if start == end:
+                continue
+            at = bisect_left(numbers, number, start, end)
+            if at < end and numbers[at] == number:
+                return lats[at], lons[at], "house"
+            if start < at < end:
+                lo, hi = at - 1, at
+                span = numbers[hi] - numbers[lo]
+                if span <= MAX_SPAN:
+                    if distance_m(lats[lo], lons[lo], lats[hi], lons[hi]) <= MAX_M_PER_NUMBER * span + SLACK_M:
+                        t = (number - numbers[lo]) / span
+                        lat = lats[lo] + t * (lats[hi] - lats[lo])
+                        lon = lons[lo] + t * (lons[hi] - lons[lo])
+                        return lat, lon, "interpolated"
+            for candidate in (at - 1, at):
+                if start <= candidate < end:
+                    distance = abs(numbers[candidate] - number)
+                    if distance <= SNAP_SPAN and (nearest is None or distance < nearest[0]):
+                        nearest = (distance, candidate)
+        if nearest is None:
+            return None
+        at = nearest[1]
+        return lats[at], lons[at], "nearby"
+
+    def lookup(self, query: str) -> dict | None:
+        """A Nominatim-shaped result for a query, or None when the index cannot place it."""
+        parsed = self.parse(query)
+        if parsed is None:
+            return None
+        position, number = parsed
+        located = self.locate(position, number)
+        if located is None:
+            return None
+        lat, lon, how = located
+        return {
+            "lat": lat,
+            "lon": lon,
+            "display_name": f"{number}, {self.names[position]}",
+            "class": None,
+            "type": how,
+            "importance": None,
+            "place_id": None,
+            "source": SOURCE,
+        }
+
+
+def compare_with_cache(index: StreetIndex, cached: dict[str, dict | None]) -> dict:
+    """How the index answers the queries in a geocode cache (query -> Nominatim result or None)."""
+    errors = []
+    by_type: dict[str, int] = {}
+    resolved_misses = 0
+    positives = 0
+    for query, result in cached.items():
+        local = index.lookup(query)
+        if not result:
+            resolved_misses += local is not None
+            continue
+        positives += 1
+        if local is None:
+            continue
+        by_type[local["type"]] = by_type.get(local["type"], 0) + 1
+        errors.append(distance_m(result["lat"], result["lon"], local["lat"], local["lon"]))
+    errors.sort()
+
+    def share(limit: float) -> float:
+        return round(bisect_left(errors, limit) / len(errors), 4) if errors else 0.0
+
+    def percentile(fraction: float) -> float:
+        return round(errors[max(0, math.ceil(fraction * len(errors)) - 1)], 1)
+
+    return {
+        "cached_results": positives,
+        "matched": len(errors),
+        "match_rate": round(len(errors) / positives, 4) if positives else 0.0,
+        "matched_by_type": by_type,
+        "median_error_m": percentile(0.50) if errors else None,
+        "p95_error_m": percentile(0.95) if errors else None,
+        "within_100m": share(100.0),
+        "within_250m": share(250.0),
+        "resolved_cached_misses": resolved_misses,
+    }
+
+
+def format_comparison(report: dict) -> str:
+    if not report["matched"]:
+        return f"matched 0/{report['cached_results']} cached results"
+    return (
+        f"matched {report['matched']}/{report['cached_results']} cached results ({report['match_rate']:.1%}); "
+        f"median error {report['median_error_m']:.0f} m, p95 {report['p95_error_m']:.0f} m, "
+        f"{report['within_100m']:.1%} within 100 m; "
+        f"{report['resolved_cached_misses']} cached misses resolved"
+    )
+
+
+def default_paths() -> tuple[Path, Path]:
+    output_dir = Path(__file__).resolve().parent.parent / "output"
+    return output_dir / "osm_street_index.npz", output_dir / "geocode_cache.json"
+
+
+def main() -> int:
+    index_default, cache_default = default_paths()
+    parser = argparse.ArgumentParser(description="Offline street and house-number geocoding from an OSM extract.")
+    parser.add_argument("--index", default=str(index_default), help="Index .npz path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from an OSM extract")
+    build.add_argument("extract", help=".osm.pbf (needs pyosmium), .geojson or .geojsonseq file")
+
+    lookup = sub.add_parser("lookup", help="Geocode addresses")
+    lookup.add_argument("queries", nargs="+", help='Addresses such as "Av. Belgrano 2199"')
+
+    evaluate = sub.add_parser("evaluate", help="Compare against the Nominatim results in a geocode cache")
+    evaluate.add_argument(
+        "cache",
+        nargs="?",
+        default=str(cache_default),
+        help="geocode_cache.json, or the geocode_cache.sqlite it was migrated into",
+    )
+
+    args = parser.parse_args()
+    index_path = Path(args.index).expanduser().resolve()
+
+    if args.command == "build":
+        index, stats = StreetIndex.build(read_addresses(Path(args.extract).expanduser()))
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(index_path)
+        print(f"Wrote {index_path}")
+        print(
+            f"Indexed {stats['anchors']} house numbers on {stats['streets']} streets "
+            f"from {stats['addresses']} addresses ({stats['unparsed']} unparsed, {stats['ambiguous']} ambiguous)"
+        )
+        return 0
+
+    index = StreetIndex.load(index_path)
+    if args.command == "lookup":
+        for query in args.queries:
+            result = index.lookup(query)
+            if result is None:
+                print(f"{query}: no match")
+            else:
+                lat, lon = result["lat"], result["lon"]
+                print(f"{query}: {lat:.6f}, {lon:.6f}  {result['type']}  {result['display_name']}")
+        return 0
+
+    cache_path = Path(args.cache).expanduser()
+    if not cache_path.exists():
+        parser.error(f"{cache_path} does not exist")
+    if cache_path.suffix == ".sqlite":
+        with GeocodeCache(cache_path) as cache:
+            cached = cache.as_dict()
+    else:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    print(format_comparison(compare_with_cache(index, cached)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Column-wise, dictionary-encoded export of the cartilla providers.
+
+The JSON output repeats the same specialty, location and geocode class/type
+strings for every provider and stores coordinates twice (on the provider and
+in its `geocode` object). This format stores one column per field instead:
+
+* every string field as int32 codes into a per-column dictionary of distinct
+  values (-1 for null), the dictionary as one UTF-8 blob plus offsets;
+* `lat`/`lon`/`importance` as float32 (NaN for null) — about 0.4 m of
+  precision at Buenos Aires — and `source_page`/`place_id` as integers
+  (-1 for null); the geocode's own lat/lon are the provider's;
+* per-row bit masks of which keys a provider (and its geocode) has, so a
+  provider dict is rebuilt with exactly its original keys, in schema order;
+  keys outside the schema go to a JSON `extras` column.
+
+The file is an `.npz` (a zip of `.npy` members, stored uncompressed by
+default so members load without inflating). `ColumnWriter` takes providers
+one at a time and writes each column as its own member on `close`, so a
+producer can stream providers into it. `ProviderColumns` opens the file
+lazily: nothing is read until a column is asked for, and only that column's
+members are.
+
+    python provider_columns.py convert ../output/cartilla_medica_geocoded.json
+    python provider_columns.py info ../output/cartilla_medica_geocoded.columns.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import zipfile
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+# (key, kind) in output key order. Kinds: str (dictionary-coded), float32, int32, int64.
+PROVIDER_SCHEMA = (
+    ("specialty", "str"),
+    ("location", "str"),
+    ("name", "str"),
+    ("address", "str"),
+    ("phone", "str"),
+    ("source_page", "int32"),
+    ("geocode_query", "str"),
+    ("lat", "float32"),
+    ("lon", "float32"),
+    ("geocode", "geocode"),
+)
+GEOCODE_SCHEMA = (
+    ("lat", "coordinate"),
+    ("lon", "coordinate"),
+    ("display_name", "str"),
+    ("class", "str"),
+    ("type", "str"),
+    ("importance", "float32"),
+    ("place_id", "int64"),
+    ("source", "str"),
+)
+# `present` mask layout: provider keys from bit 0, then these two flags, geocode keys from bit 16.
+GEOCODE_NOT_NULL = len(PROVIDER_SCHEMA)
+HAS_EXTRAS = GEOCODE_NOT_NULL + 1
+GEOCODE_SHIFT = 16
+ARRAY_TYPECODES = {"float32": "f", "int32": "i", "int64": "q"}
+NUMPY_DTYPES = {"f": np.float32, "i": np.int32, "q": np.int64}
+
+
+def column_names() -> list[tuple[str, str]]:
+    """Every stored value column as `(column name, kind)`."""
+    columns = [(key, kind) for key, kind in PROVIDER_SCHEMA if kind != "geocode"]
+    columns += [(f"geocode.{key}", kind) for key, kind in GEOCODE_SCHEMA if kind != "coordinate"]
+    return columns + [("extras", "str")]
+
+
+class StringColumn:
+    """Interning dictionary plus codes for one string column, filled row by row."""
+
+    def __init__(self) -> None:
+        self.index: dict[str, int] = {}
+        self.codes = array("i")
+
+    def append(self, value) -> None:
+        if value is None:
+            self.codes.append(-1)
+            return
+        if not isinstance(value, str):
+            raise TypeError(f"expected a string, got {type(value).__name__}")
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.index)
+        self.codes.append(code)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        encoded = [value.encode("utf-8") for value in self.index]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return {
+            "codes": np.frombuffer(self.codes, dtype=np.int32),
+            "offsets": offsets,
+            "blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+
+
+class ColumnWriter:
+    """Streaming writer: `append` providers, then `close(document)` writes the file."""
+
+    def __init__(self, path: Path, compress: bool = False) -> None:
+        self.path = path
+        self.compress = compress
+        self.count = 0
+        self.present = array("L")
+        self.columns: dict[str, StringColumn | array] = {
+            name: StringColumn() if kind == "str" else array(ARRAY_TYPECODES[kind]) for name, kind in column_names()
+        }
+
+    def _append_values(self, prefix: str, schema, record: dict) -> int:
+        mask = 0
+        for bit, (key, kind) in enumerate(schema):
+            if kind in ("geocode", "coordinate"):
+                mask |= (key in record) << bit
+                continue
+            column = self.columns[prefix + key]
+            value = record.get(key)
+            mask |= (key in record) << bit
+            if kind == "str":
+                column.append(value)
+            elif kind == "float32":
+                column.append(math.nan if value is None else float(value))
+            else:
+                column.append(-1 if value is None else int(value))
+        return mask
+
+    def append(self, provider: dict) -> None:
+        mask = self._append_values("", PROVIDER_SCHEMA, provider)
+        extras = {key: value for key, value in provider.items() if key not in PROVIDER_KEYS}
+        geocode = provider.get("geocode")
+        if geocode is not None:
+            mask |= 1 << GEOCODE_NOT_NULL
+            # The geocode's lat/lon are not stored: they are the provider's.
+            mask |= self._append_values("geocode.", GEOCODE_SCHEMA, geocode) << GEOCODE_SHIFT
+            geocode_extras = {key: value for key, value in geocode.items() if key not in GEOCODE_KEYS}
+            if geocode_extras:
+                extras["geocode"] = geocode_extras
+        else:
+            self._append_values("geocode.", GEOCODE_SCHEMA, {})
+        if extras:
+            mask |= 1 << HAS_EXTRAS
+        self.columns["extras"].append(json.dumps(extras, ensure_ascii=False, sort_keys=True) if extras else None)
+        self.present.append(mask)
+        self.count += 1
+
+    def extend(self, providers: Iterable[dict]) -> None:
+        for provider in providers:
+            self.append(provider)
+
+    def close(self, document: dict | None = None) -> int:
+        """Write the columns and `document` (minus its providers) as metadata; returns bytes written."""
+        meta = {
+            "format": FORMAT_VERSION,
+            "count": self.count,
+            "columns": dict(column_names()),
+            "document": {key: value for key, value in (document or {}).items() if key != "providers"},
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp.npz")
+        compression = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(tmp_path, "w", compression=compression, allowZip64=True) as archive:
+            members = {
+                "meta": np.array(json.dumps(meta, ensure_ascii=False)),
+                "present": np.array(self.present, dtype=np.uint32),
+            }
+            for name, column in self.columns.items():
+                if isinstance(column, StringColumn):
+                    for part, values in column.arrays().items():
+                        members[f"{name}.{part}"] = values
+                else:
+                    members[name] = np.frombuffer(column, dtype=NUMPY_DTYPES[column.typecode])
+            for name, values in members.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, values, allow_pickle=False)
+        tmp_path.replace(self.path)
+        return self.path.stat().st_size
+
+
+PROVIDER_KEYS = {key for key, _ in PROVIDER_SCHEMA}
+GEOCODE_KEYS = {key for key, _ in GEOCODE_SCHEMA}
+
+
+def write_columns(path: Path, document: dict, compress: bool = False) -> int:
+    writer = ColumnWriter(path, compress=compress)
+    writer.extend(document.get("providers", []))
+    return writer.close(document)
+
+
+def columns_path(json_path: Path) -> Path:
+    """`x.json` -> `x.columns.npz`, the default export path next to a JSON output."""
+    return json_path.with_name(f"{json_path.stem}.columns.npz")
+
+
+class ProviderColumns:
+    """Lazy reader: columns are loaded and decoded on first access, then kept."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        self.meta = json.loads(str(self._npz["meta"]))
+        if self.meta["format"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has column format {self.meta['format']}, expected {FORMAT_VERSION}")
+        self.kinds: dict[str, str] = self.meta["columns"]
+        self._arrays: dict[str, np.ndarray] = {}
+        self._dictionaries: dict[str, list[str]] = {}
+        self._strings: dict[str, list[str | None]] = {}
+        self._values: dict[str, list] = {}
+        self._layouts: dict[int, tuple] = {}
+        self._present: list[int] | None = None
+
+    def close(self) -> None:
+        self._npz.close()
+
+    def __enter__(self) -> "ProviderColumns":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def document_meta(self) -> dict:
+        return self.meta["document"]
+
+    def _array(self, name: str) -> np.ndarray:
+        values = self._arrays.get(name)
+        if values is None:
+            values = self._arrays[name] = self._npz[name]
+        return values
+
+    def codes(self, name: str) -> np.ndarray:
+        """int32 dictionary codes of a string column (-1 for null)."""
+        return self._array(f"{name}.codes")
+
+    def dictionary(self, name: str) -> list[str]:
+        """Distinct values of a string column, indexed by code."""
+        values = self._dictionaries.get(name)
+        if values is None:
+            offsets = self._array(f"{name}.offsets").tolist()
+            blob = self._array(f"{name}.blob").tobytes()
+            values = self._dictionaries[name] = [
+                blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])
+            ]
+        return values
+
+    def column(self, name: str):
+        """A string column as a list (None for null), or a numeric one as an array (NaN / -1 for null)."""
+        kind = self.kinds[name]
+        if kind != "str":
+            return self._array(name)
+        values = self._strings.get(name)
+        if values is None:
+            dictionary = self.dictionary(name) + [None]  # code -1 picks the trailing None
+            values = self._strings[name] = [dictionary[code] for code in self.codes(name).tolist()]
+        return values
+
+    def values(self, name: str) -> list:
+        """Any column as a list of Python values, None for null (decoded once, then kept)."""
+        values = self._values.get(name)
+        if values is None:
+            if self.kinds[name] == "str":
+                values = self.column(name)
+            else:
+                array = self._array(name)
+                null = np.isnan(array) if array.dtype.kind == "f" else array == -1
+                boxed = array.astype(np.float64 if array.dtype.kind == "f" else np.int64).astype(object)
+                boxed[null] = None
+                values = boxed.tolist()
+            self._values[name] = values
+        return values
+
+    def _layout(self, mask: int) -> tuple[list[tuple[str, list]], list[tuple[str, list]] | None, bool]:
+        """For one `present` mask: provider (key, values) pairs, geocode pairs (None if the
+        geocode is null or absent) and whether the row has extras. Rows share a few masks."""
+        layout = self._layouts.get(mask)
+        if layout is None:
+            fields, geocode = [], None
+            for bit, (key, kind) in enumerate(PROVIDER_SCHEMA):
+                if mask & (1 << bit):
+                    fields.append((key, None if kind == "geocode" else self.values(key)))
+            if mask & (1 << GEOCODE_NOT_NULL):
+                geocode = [
+                    (key, self.values(key if kind == "coordinate" else f"geocode.{key}"))
+                    for bit, (key, kind) in enumerate(GEOCODE_SCHEMA)
+                    if mask & (1 << (bit + GEOCODE_SHIFT))
+                ]
+            layout = self._layouts[mask] = (fields, geocode, bool(mask & (1 << HAS_EXTRAS)))
+        return layout
+
+    def provider(self, row: int) -> dict:
+        fields, geocode_fields, has_extras = self._layout(self.present[row])
+        provider = {}
+        for key, values in fields:
+            if values is not None:
+                provider[key] = values[row]
+            elif geocode_fields is None:
+                provider[key] = None
+            else:
+                provider[key] = {field: field_values[row] for field, field_values in geocode_fields}
+        if has_extras:
+            extras = json.loads(self.column("extras")[row])
+            geocode_extras = extras.pop("geocode", None)
+            if geocode_extras:
+                provider["geocode"].update(geocode_extras)
+            provider.update(extras)
+        return provider
+
+    @property
+    def present(self) -> list[int]:
+        if self._present is None:
+            self._present = self._array("present").tolist()
+        return self._present
+
+    def __iter__(self) -> Iterator[dict]:
+        for row in range(len(self)):
+            yield self.provider(row)
+
+    def document(self) -> dict:
+        """The full document, as the JSON output would load (coordinates at float32 precision)."""
+        return {**self.document_meta, "providers": list(self)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Columnar export of cartilla providers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Write the columnar export of a cartilla JSON")
+    convert.add_argument("input", help="cartilla_medica.json or cartilla_medica_geocoded.json")
+    convert.add_argument("-o", "--output", default=None, help="Output .npz (default: <input>.columns.npz)")
+    convert.add_argument("--compress", action="store_true", help="Deflate the members (smaller, slower to load)")
+    info = sub.add_parser("info", help="Describe a columnar export")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        input_path = Path(args.input).expanduser().resolve()
+        output_path = Path(args.output).expanduser().resolve() if args.output else columns_path(input_path)
+        size = write_columns(output_path, json.loads(input_path.read_bytes()), compress=args.compress)
+        print(f"Wrote {output_path} ({size} bytes, JSON {input_path.stat().st_size} bytes)")
+        return 0
+
+    with ProviderColumns(Path(args.path).expanduser().resolve()) as columns:
+        print(f"{args.path}: {len(columns)} providers")
+        for name, kind in columns.kinds.items():
+            if kind == "str":
+                print(f"  {name:22s} str      {len(columns.dictionary(name)):6d} distinct")
+            else:
+                print(f"  {name:22s} {kind}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Local HTTP query service over the geocoded cartilla.
+
+The document is loaded once into a `Dataset`: each provider is encoded to
+its JSON response fragment up front, specialty and barrio are dictionary
+codes in NumPy arrays for filtering, and the text and spatial indexes from
+`provider_search_index.py` / `provider_spatial_index.py` are built in memory.
+Endpoints (GET, JSON responses):
+
+    /search?q=cardio&specialty=Cardiología&barrio=Palermo&limit=20
+    /near?lat=-34.60&lon=-58.43&radius=800&specialty=Cardiología&limit=20
+    /sections
+    /status
+
+`q` matches name, specialty, address, location and barrio by folded token
+prefix; `specialty` and `barrio` filter by folded exact name. `/near`
+returns the `limit` nearest providers, or with `radius` (metres) those
+within it, nearest first.
+
+The server watches the input file and, when it changes (the geocoder
+replaces it atomically), builds a new dataset in a worker thread and swaps
+it in with one assignment; requests in flight finish on the dataset they
+started with. A file that fails to load leaves the current dataset serving.
+
+    python provider_query_server.py [cartilla_medica_geocoded.json] --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import traceback
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from geocode_cache import fold_text
+from provider_search_index import SearchIndex
+from provider_spatial_index import ALL, SpatialIndex, default_paths
+
+
+RECORD_FIELDS = ("name", "specialty", "address", "location", "phone", "lat", "lon")
+MAX_LIMIT = 500
+MAX_REQUEST_LINE = 8192
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class BadRequest(ValueError):
+    """A query parameter is missing or malformed (HTTP 400)."""
+
+
+def barrio_of(provider: dict) -> str | None:
+    """Neighbourhood from the Nominatim display name: the part before the city
+    (`…, Palermo, Buenos Aires, [Distrito …,] Comuna 14, …`) in CABA, or the
+    locality before `Partido de …` in the province."""
+    if provider.get("barrio"):
+        return provider["barrio"]
+    geocode = provider.get("geocode") or {}
+    parts = [part.strip() for part in (geocode.get("display_name") or "").split(",")]
+    if any(part.startswith("Comuna ") for part in parts) and "Buenos Aires" in parts[1:]:
+        return parts[parts.index("Buenos Aires", 1) - 1]
+    for n, part in enumerate(parts[1:], 1):
+        if part.startswith("Partido de "):
+            return parts[n - 1]
+    return None
+
+
+class Codes:
+    """Dictionary encoding of one string column, looked up by folded value."""
+
+    def __init__(self, values: list[str | None]) -> None:
+        self.names: list[str] = []
+        self.by_folded: dict[str, int] = {}
+        codes = np.full(len(values), -1, dtype=np.int32)
+        for n, value in enumerate(values):
+            if not value:
+                continue
+            folded = fold_text(value)
+            code = self.by_folded.get(folded)
+            if code is None:
+                code = self.by_folded[folded] = len(self.names)
+                self.names.append(value)
+            codes[n] = code
+        self.codes = codes
+
+    def lookup(self, value: str) -> int:
+        """Code of `value`, or -1 (matches nothing) if no provider has it."""
+        return self.by_folded.get(fold_text(value), -1)
+
+
+class Dataset:
+    """Immutable, query-ready snapshot of one cartilla document."""
+
+    def __init__(self, document: dict, source: Path | None = None) -> None:
+        providers = document.get("providers", [])
+        barrios = [barrio_of(provider) for provider in providers]
+        self.source = source
+        self.loaded_at = time.time()
+        self.size = len(providers)
+        self.specialties = Codes([provider.get("specialty") for provider in providers])
+        self.barrios = Codes(barrios)
+        self.records = [
+            json.dumps(
+                {"id": n, **{field: provider.get(field) for field in RECORD_FIELDS}, "barrio": barrio},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            for n, (provider, barrio) in enumerate(zip(providers, barrios))
+        ]
+        searchable = [
+            {**provider, "location": " ".join(filter(None, (provider.get("location"), barrio)))}
+            for provider, barrio in zip(providers, barrios)
+        ]
+        self.text = SearchIndex.build(searchable)
+        self.spatial = SpatialIndex.build(providers)
+        self.sections = json.dumps(
+            {"count": len(document.get("sections", [])), "sections": document.get("sections", [])}, ensure_ascii=False
+        ).encode("utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "Dataset":
+        return cls(json.loads(path.read_bytes()), path)
+
+    def _filter(self, params: dict[str, str]) -> np.ndarray | None:
+        """Boolean mask over providers for the specialty/barrio filters, or None if unfiltered."""
+        mask = None
+        for name, column in (("specialty", self.specialties), ("barrio", self.barrios)):
+            if params.get(name):
+                match = column.codes == column.lookup(params[name])
+                mask = match if mask is None else mask & match
+        return mask
+
+    def search(self, params: dict[str, str]) -> bytes:
+        limit = parse_limit(params)
+        mask = self._filter(params)
+        query = params.get("q", "").strip()
+        if query:
+            # Filtering happens after ranking, so ask the index for every match when filtered.
+            hits = self.text.search(query, limit if mask is None else self.size)
+            if mask is not None:
+                hits = [(score, n) for score, n in hits if mask[n]][:limit]
+            items = [b'{"score":%.4f,"provider":%s}' % (score, self.records[n]) for score, n in hits]
+        elif mask is not None:
+            ids = np.flatnonzero(mask)[:limit]
+            items = [b'{"provider":%s}' % self.records[n] for n in ids.tolist()]
+        else:
+            raise BadRequest("give at least one of q, specialty, barrio")
+        return response_body(items)
+
+    def near(self, params: dict[str, str]) -> bytes:
+        lat, lon = parse_float(params, "lat"), parse_float(params, "lon")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise BadRequest("lat/lon out of range")
+        limit = parse_limit(params)
+        specialty = params.get("specialty")
+        if specialty:
+            code = self.specialties.lookup(specialty)
+            if code < 0:
+                return response_body([])
+            specialty = self.specialties.names[code]
+        if params.get("radius"):
+            radius = parse_float(params, "radius")
+            if radius <= 0:
+                raise BadRequest("radius must be positive")
+            hits = self.spatial.within(lat, lon, radius, specialty)[:limit]
+        else:
+            hits = self.spatial.nearest(lat, lon, limit, specialty)
+        items = [b'{"distance_m":%.1f,"provider":%s}' % (distance, self.records[n]) for distance, n in hits]
+        return response_body(items)
+
+    def status(self) -> dict:
+        return {
+            "source": str(self.source) if self.source else None,
+            "loaded_at": self.loaded_at,
+            "providers": self.size,
+            "located": len(self.spatial.partitions[ALL].ids) if ALL in self.spatial.partitions else 0,
+            "specialties": len(self.specialties.names),
+            "barrios": len(self.barrios.names),
+        }
+
+
+def response_body(items: list[bytes]) -> bytes:
+    return b'{"count":%d,"results":[%s]}' % (len(items), b",".join(items))
+
+
+def parse_float(params: dict[str, str], name: str) -> float:
+    try:
+        value = float(params[name])
+    except KeyError:
+        raise BadRequest(f"missing parameter: {name}") from None
+    except ValueError:
+        raise BadRequest(f"{name} must be a number") from None
+    if not math.isfinite(value):
+        raise BadRequest(f"{name} must be finite")
+    return value
+
+
+def parse_limit(params: dict[str, str]) -> int:
+    try:
+        limit = int(params.get("limit", 20))
+    except ValueError:
+        raise BadRequest("limit must be an integer") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+
+class QueryServer:
+    """Minimal HTTP/1.1 keep-alive server answering from the current `Dataset`."""
+
+    def __init__(self, path: Path, poll_s: float = 2.0) -> None:
+        self.path = path
+        self.poll_s = poll_s
+        self.dataset: Dataset | None = None
+        self.generation = 0
+        self.requests = 0
+        self._signature: tuple | None = None
+        self._failed_signature: tuple | None = None
+
+    def _file_signature(self) -> tuple | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    async def reload(self) -> bool:
+        """Load the input if it changed since the last load; True if a new dataset went live."""
+        signature = self._file_signature()
+        if signature is None or signature in (self._signature, self._failed_signature):
+            return False
+        started = time.perf_counter()
+        try:
+            dataset = await asyncio.to_thread(Dataset.load, self.path)
+        except Exception as exc:
+            # A file written in place and caught half-way, or valid JSON of the wrong shape
+            # (`Dataset` then fails with TypeError/AttributeError): keep serving until it changes again.
+            self._failed_signature = signature
+            print(
+                f"Reload of {self.path} failed, keeping generation {self.generation}: {type(exc).__name__}: {exc}",
+                file=sys.stderr,
+            )
+            return False
+        self._signature = signature
+        self.dataset = dataset
+        self.generation += 1
+        print(
+            f"Loaded {self.path} as generation {self.generation}: {dataset.size} providers "
+            f"in {time.perf_counter() - started:.2f}s",
+            file=sys.stderr,
+        )
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_s)
+            try:
+                await self.reload()
+            except Exception as exc:
+                # Never let one bad poll end hot reload for the life of the server.
+                print(f"Watching {self.path} failed, retrying: {type(exc).__name__}: {exc}", file=sys.stderr)
+
+    def route(self, target: str) -> tuple[int, bytes]:
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        dataset = self.dataset
+        if dataset is None:
+            return 503, b'{"error":"no dataset loaded"}'
+        try:
+            if url.path == "/search":
+                return 200, dataset.search(params)
+            if url.path == "/near":
+                return 200, dataset.near(params)
+            if url.path == "/sections":
+                return 200, dataset.sections
+            if url.path == "/status":
+                status = {**dataset.status(), "generation": self.generation, "requests": self.requests}
+                return 200, json.dumps(status).encode("utf-8")
+        except BadRequest as exc:
+            return 400, json.dumps({"error": str(exc)}).encode("utf-8")
+        except Exception as exc:
+            # Any other failure is a bug; answer it rather than letting `handle` drop the connection.
+            print(f"Request {target} failed: {type(exc).__name__}: {exc}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            return 500, b'{"error":"internal server error"}'
+        return 404, b'{"error":"not found"}'
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                if len(request_line) > MAX_REQUEST_LINE:
+                    break
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.partition(b":")
+                    if name.strip().lower() == b"connection":
+                        keep_alive = value.strip().lower() != b"close"
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                if version == "HTTP/1.0":
+                    keep_alive = False
+                self.requests += 1
+                if method != "GET":
+                    status, body = 405, b'{"error":"only GET is supported"}'
+                else:
+                    status, body = self.route(target)
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n"
+                    b"Content-Length: %d\r\nConnection: %s\r\n\r\n"
+                    % (status, REASONS[status].encode(), len(body), b"keep-alive" if keep_alive else b"close")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        await self.reload()
+        if self.dataset is None:
+            raise SystemExit(f"Cannot load {self.path}")
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_LINE * 2)
+        bound = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Serving {self.path} on http://{bound}", file=sys.stderr, flush=True)
+        watcher = asyncio.create_task(self.watch()) if self.poll_s > 0 else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+
+def main() -> int:
+    input_default, _ = default_paths()
+    parser = argparse.ArgumentParser(description="Serve search and nearest-provider queries over the cartilla.")
+    parser.add_argument("input", nargs="?", default=str(input_default), help="Geocoded cartilla JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=2.0,
+        help="Seconds between checks of the input for changes (0 disables hot reload)",
+    )
+    args = parser.parse_args()
+
+    server = QueryServer(Path(args.input).expanduser().resolve(), poll_s=args.poll)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Accent-folding full-text index over provider name, specialty and address.
+
+Every provider's `name`, `specialty`, `address` and `location` are folded
+(case, accents, whitespace — "Cardiología" and "CARDIOLOGIA" are the same
+token) and split into word tokens. The index holds two postings tables, each
+a sorted vocabulary plus one concatenated array of sorted provider indexes:
+
+* terms: whole tokens;
+* prefixes: edge n-grams of every token up to `max_prefix` characters, so
+  the short, very common prefixes typed first are precomputed. Longer
+  partial tokens are resolved by a binary search over the term vocabulary.
+
+Each posting carries a bit mask of the fields the token occurs in, which the
+ranking weighs (a hit in the name counts more than one in the address)
+together with the token's inverse document frequency. Queries intersect the
+postings of their tokens, shortest list first.
+
+The index is persisted as a single `.npz` file next to cartilla_medica.json:
+
+    python provider_search_index.py build
+    python provider_search_index.py search "cardio palermo"
+    python provider_search_index.py search "gonzalez" --exact
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+from geocode_cache import fold_text
+
+
+FIELDS = ("name", "specialty", "address", "location")
+FIELD_WEIGHTS = {"name": 3.0, "specialty": 2.0, "address": 1.0, "location": 1.0}
+TOKEN_RE = re.compile(r"[^\W_]+")
+# A token matched only as a prefix of an indexed term scores this fraction of a whole-term hit.
+PREFIX_FACTOR = 0.5
+
+
+def tokenize(value: str) -> list[str]:
+    return TOKEN_RE.findall(fold_text(value))
+
+
+class Postings:
+    """Sorted vocabulary with per-entry slices into concatenated id/mask arrays."""
+
+    def __init__(self, vocabulary: list[str], offsets: np.ndarray, ids: np.ndarray, masks: np.ndarray) -> None:
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.ids = ids
+        self.masks = masks
+        self.positions = {entry: n for n, entry in enumerate(vocabulary)}
+
+    @classmethod
+    def from_lists(cls, mapping: dict[str, tuple[list[int], list[int]]]) -> "Postings":
+        vocabulary = sorted(mapping)
+        lengths = np.array([len(mapping[entry][0]) for entry in vocabulary], dtype=np.int64)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Providers are added in index order, so every id list is already sorted.
+        total = int(offsets[-1])
+        ids = np.fromiter((i for entry in vocabulary for i in mapping[entry][0]), dtype=np.int32, count=total)
+        masks = np.fromiter((m for entry in vocabulary for m in mapping[entry][1]), dtype=np.uint8, count=total)
+        return cls(vocabulary, offsets, ids, masks)
+
+    def get(self, entry: str) -> tuple[np.ndarray, np.ndarray] | None:
+        n = self.positions.get(entry)
+        if n is None:
+            return None
+        start, end = self.offsets[n], self.offsets[n + 1]
+        return self.ids[start:end], self.masks[start:end]
+
+    def union_range(self, prefix: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Merged postings of every entry starting with `prefix`."""
+        lo = bisect_left(self.vocabulary, prefix)
+        hi = bisect_left(self.vocabulary, prefix + "\U0010ffff", lo)
+        if lo == hi:
+            return None
+        if hi - lo == 1:
+            return self.get(self.vocabulary[lo])
+        start, end = self.offsets[lo], self.offsets[hi]
+        ids = self.ids[start:end]
+        masks = self.masks[start:end]
+        order = np.argsort(ids, kind="stable")
+        ids, masks = ids[order], masks[order]
+        unique, starts = np.unique(ids, return_index=True)
+        return unique, np.bitwise_or.reduceat(masks, starts)
+
+
+def mask_weights() -> np.ndarray:
+    """Ranking weight of every field bit mask combination."""
+    weights = np.zeros(1 << len(FIELDS), dtype=np.float64)
+    for mask in range(len(weights)):
+        weights[mask] = sum(FIELD_WEIGHTS[field] for bit, field in enumerate(FIELDS) if mask & (1 << bit))
+    return weights
+
+
+class SearchIndex:
+    def __init__(self, terms: Postings, prefixes: Postings, labels: list[str], max_prefix: int) -> None:
+        self.terms = terms
+        self.prefixes = prefixes
+        self.labels = labels
+        self.max_prefix = max_prefix
+        self._mask_weights = mask_weights()
+
+    # Building ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, providers: list[dict], max_prefix: int = 4) -> "SearchIndex":
+        terms: dict[str, tuple[list[int], list[int]]] = {}
+        prefixes: dict[str, tuple[list[int], list[int]]] = {}
+        prefix_cache: dict[str, list[str]] = {}
+        for provider_index, provider in enumerate(providers):
+            doc_terms: dict[str, int] = {}
+            for bit, field in enumerate(FIELDS):
+                value = provider.get(field)
+                if value:
+                    for token in tokenize(value):
+                        doc_terms[token] = doc_terms.get(token, 0) | 1 << bit
+            doc_prefixes: dict[str, int] = {}
+            for token, mask in doc_terms.items():
+                entry = terms.setdefault(token, ([], []))
+                entry[0].append(provider_index)
+                entry[1].append(mask)
+                token_prefixes = prefix_cache.get(token)
+                if token_prefixes is None:
+                    token_prefixes = [token[:n] for n in range(1, min(len(token), max_prefix) + 1)]
+                    prefix_cache[token] = token_prefixes
+                for prefix in token_prefixes:
+                    doc_prefixes[prefix] = doc_prefixes.get(prefix, 0) | mask
+            for prefix, mask in doc_prefixes.items():
+                entry = prefixes.setdefault(prefix, ([], []))
+                entry[0].append(provider_index)
+                entry[1].append(mask)
+        labels = [
+            f"{p.get('name') or ''} | {p.get('specialty') or ''} | {p.get('address') or ''}" for p in providers
+        ]
+        return cls(Postings.from_lists(terms), Postings.from_lists(prefixes), labels, max_prefix)
+
+    # Persistence ---------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        arrays = {}
+        for name, postings in (("terms", self.terms), ("prefixes", self.prefixes)):
+            vocabulary = "\n".join(postings.vocabulary).encode("utf-8")
+            arrays[f"{name}_vocabulary"] = np.frombuffer(vocabulary, dtype=np.uint8)
+            arrays[f"{name}_offsets"] = postings.offsets
+            arrays[f"{name}_ids"] = postings.ids
+            arrays[f"{name}_masks"] = postings.masks
+        arrays["labels"] = np.frombuffer("\n".join(self.labels).encode("utf-8"), dtype=np.uint8)
+        meta = {"fields": list(FIELDS), "max_prefix": self.max_prefix, "providers": len(self.labels)}
+        arrays["meta"] = np.array(json.dumps(meta, ensure_ascii=False))
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        def lines(array: np.ndarray) -> list[str]:
+            text = array.tobytes().decode("utf-8")
+            return text.split("\n") if text else []
+
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["fields"] != list(FIELDS):
+                raise ValueError(f"{path} was built for fields {meta['fields']}; rebuild it")
+            postings = {
+                name: Postings(
+                    lines(data[f"{name}_vocabulary"]),
+                    data[f"{name}_offsets"],
+                    data[f"{name}_ids"],
+                    data[f"{name}_masks"],
+                )
+                for name in ("terms", "prefixes")
+            }
+            labels = lines(data["labels"])
+        return cls(postings["terms"], postings["prefixes"], labels, meta["max_prefix"])
+
+    # Queries -------------------------------------------------------------
+
+    def _token_scores(self, token: str, prefix: bool) -> tuple[np.ndarray, np.ndarray] | None:
+        """Providers matching one query token and the token's score for each."""
+        exact = self.terms.get(token)
+        if not prefix:
+            if exact is None:
+                return None
+            ids, masks = exact
+            return ids, self._idf(len(ids)) * self._mask_weights[masks]
+
+        if len(token) <= self.max_prefix:
+            partial = self.prefixes.get(token)
+        else:
+            partial = self.terms.union_range(token)
+        if partial is None:
+            return None
+        ids, masks = partial
+        idf = self._idf(len(ids))
+        scores = PREFIX_FACTOR * idf * self._mask_weights[masks]
+        if exact is not None:
+            # The prefix postings are a superset of the exact ones; top up whole-term hits.
+            exact_ids, exact_masks = exact
+            scores[np.searchsorted(ids, exact_ids)] += (1 - PREFIX_FACTOR) * idf * self._mask_weights[exact_masks]
+        return ids, scores
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(1 + len(self.labels) / document_frequency)
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> list[tuple[float, int]]:
+        """Best matches for `query` as `(score, provider_index)`, best first.
+
+        Every query token must match. With `prefix` (the default) a token also
+        matches indexed terms it is a prefix of, so partial input such as
+        "cardio pale" finds cardiologists in Palermo.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+        matches = []
+        for token in tokens:
+            match = self._token_scores(token, prefix)
+            if match is None:
+                return []
+            matches.append(match)
+        matches.sort(key=lambda match: len(match[0]))
+
+        ids, scores = matches[0]
+        scores = scores.copy()
+        for other_ids, other_scores in matches[1:]:
+            pos = np.minimum(np.searchsorted(other_ids, ids), len(other_ids) - 1)
+            keep = other_ids[pos] == ids
+            ids = ids[keep]
+            scores = scores[keep] + other_scores[pos[keep]]
+            if not len(ids):
+                return []
+
+        if len(ids) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(ids))
+        # Best score first; ties keep cartilla order.
+        top = top[np.lexsort((ids[top], -scores[top]))]
+        return [(float(scores[i]), int(ids[i])) for i in top]
+
+
+def default_paths() -> tuple[Path, Path]:
+    output_dir = Path(__file__).resolve().parent.parent / "output"
+    return output_dir / "cartilla_medica.json", output_dir / "provider_search_index.npz"
+
+
+def main() -> int:
+    input_default, index_default = default_paths()
+    parser = argparse.ArgumentParser(description="Full-text search over cartilla providers.")
+    parser.add_argument("--index", default=str(index_default), help="Index .npz path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from cartilla_medica.json")
+    build.add_argument("input", nargs="?", default=str(input_default), help="Cartilla JSON")
+    build.add_argument("--max-prefix", type=int, default=4, help="Longest precomputed prefix, in characters")
+
+    search = sub.add_parser("search", help="Search providers by name, specialty or address")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20, help="Number of results")
+    search.add_argument("--exact", action="store_true", help="Match whole tokens only")
+
+    args = parser.parse_args()
+    index_path = Path(args.index).expanduser().resolve()
+
+    if args.command == "build":
+        document = json.loads(Path(args.input).expanduser().read_text(encoding="utf-8"))
+        index = SearchIndex.build(document.get("providers", []), max_prefix=args.max_prefix)
+        index.save(index_path)
+        print(f"Wrote {index_path}")
+        print(
+            f"Indexed {len(index.labels)} providers: {len(index.terms.vocabulary)} terms, "
+            f"{len(index.prefixes.vocabulary)} prefixes, {len(index.terms.ids) + len(index.prefixes.ids)} postings"
+        )
+        return 0
+
+    index = SearchIndex.load(index_path)
+    for score, provider_index in index.search(args.query, args.limit, prefix=not args.exact):
+        print(f"{score:7.2f}  {index.labels[provider_index]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
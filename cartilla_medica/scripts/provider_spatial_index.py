@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Offline spatial index and nearest-provider queries over the geocoded cartilla.
+
+Providers with coordinates are bucketed into a uniform grid (in metres, on a
+local equirectangular projection) per specialty, plus one partition holding
+every provider. Within a partition, points are sorted by grid cell and a
+sorted array of occupied cell keys maps each cell to its slice, so a query
+only touches the cells around the query point and computes exact haversine
+distances for those candidates with NumPy.
+
+The index is persisted as a single `.npz` file next to the geocoded JSON:
+
+    python provider_spatial_index.py build
+    python provider_spatial_index.py near -34.60 -58.43 -k 5 --specialty Cardiología
+    python provider_spatial_index.py within -34.60 -58.43 --radius 800
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+
+EARTH_RADIUS_M = 6_371_008.8
+ALL = None  # Partition key for "any specialty"; no specialty name can collide with it.
+
+
+def haversine_m(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in metres from one point to arrays of points (degrees)."""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridPartition:
+    """Points of one partition sorted by grid cell."""
+
+    def __init__(self, cell_keys: np.ndarray, cell_starts: np.ndarray, lats: np.ndarray, lons: np.ndarray, ids: np.ndarray) -> None:
+        self.cell_keys = cell_keys
+        self.cell_starts = cell_starts
+        self.lats = lats
+        self.lons = lons
+        self.ids = ids
+        # Decoded cell coordinates, for filtering occupied cells directly.
+        self.cell_y = cell_keys >> 32
+        self.cell_x = (cell_keys & 0xFFFFFFFF).astype(np.int64)
+        self.cell_x[self.cell_x >= 1 << 31] -= 1 << 32
+
+
+class SpatialIndex:
+    def __init__(self, origin_lat: float, cell_m: float, partitions: dict[str | None, GridPartition], labels: list[str]) -> None:
+        self.origin_lat = origin_lat
+        self.cell_m = cell_m
+        self.partitions = partitions
+        self.labels = labels
+        self._m_per_deg_lat = math.pi * EARTH_RADIUS_M / 180
+        self._m_per_deg_lon = self._m_per_deg_lat * math.cos(math.radians(origin_lat))
+
+    # Grid geometry -------------------------------------------------------
+
+    def _cells(self, lats: np.ndarray, lons: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        cx = np.floor(lons * self._m_per_deg_lon / self.cell_m).astype(np.int64)
+        cy = np.floor(lats * self._m_per_deg_lat / self.cell_m).astype(np.int64)
+        return cx, cy
+
+    @staticmethod
+    def _key(cx, cy):
+        # Cell coordinates stay far below 2**31 for any lat/lon at metre-scale cells.
+        return (cy << 32) + (cx & 0xFFFFFFFF)
+
+    # Building ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, providers: list[dict], cell_m: float = 500.0) -> "SpatialIndex":
+        located = [
+            (i, float(p["lat"]), float(p["lon"]), p.get("specialty") or "")
+            for i, p in enumerate(providers)
+            if p.get("lat") is not None and p.get("lon") is not None
+        ]
+        ids = np.array([row[0] for row in located], dtype=np.int32)
+        lats = np.array([row[1] for row in located], dtype=np.float64)
+        lons = np.array([row[2] for row in located], dtype=np.float64)
+        specialties = np.array([row[3] for row in located], dtype=object)
+        origin_lat = float(lats.mean()) if len(lats) else 0.0
+
+        index = cls(origin_lat, cell_m, {}, [])
+        groups = {ALL: np.arange(len(ids))}
+        for specialty in dict.fromkeys(specialties.tolist()):
+            if specialty:  # Providers without a specialty are only in the ALL partition.
+                groups[specialty] = np.flatnonzero(specialties == specialty)
+        for key, members in groups.items():
+            index.partitions[key] = index._partition(lats[members], lons[members], ids[members])
+        index.labels = [
+            f"{p.get('name') or ''} | {p.get('specialty') or ''} | {p.get('address') or ''}" for p in providers
+        ]
+        return index
+
+    def _partition(self, lats: np.ndarray, lons: np.ndarray, ids: np.ndarray) -> GridPartition:
+        cx, cy = self._cells(lats, lons)
+        keys = self._key(cx, cy)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        cell_keys, cell_starts = np.unique(keys, return_index=True)
+        cell_starts = np.append(cell_starts, len(keys)).astype(np.int64)
+        return GridPartition(cell_keys, cell_starts, lats[order], lons[order], ids[order])
+
+    # Persistence ---------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        arrays = {"labels": np.array(self.labels, dtype=str)}
+        names = list(self.partitions)
+        for n, name in enumerate(names):
+            part = self.partitions[name]
+            arrays[f"p{n}_cell_keys"] = part.cell_keys
+            arrays[f"p{n}_cell_starts"] = part.cell_starts
+            arrays[f"p{n}_lats"] = part.lats
+            arrays[f"p{n}_lons"] = part.lons
+            arrays[f"p{n}_ids"] = part.ids
+        meta = {"origin_lat": self.origin_lat, "cell_m": self.cell_m, "partitions": names}
+        arrays["meta"] = np.array(json.dumps(meta, ensure_ascii=False))
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SpatialIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            # Indexes saved before ALL was None keyed it by "": read that as ALL.
+            partitions = {
+                (ALL if name == "" else name): GridPartition(
+                    data[f"p{n}_cell_keys"],
+                    data[f"p{n}_cell_starts"],
+                    data[f"p{n}_lats"],
+                    data[f"p{n}_lons"],
+                    data[f"p{n}_ids"],
+                )
+                for n, name in enumerate(meta["partitions"])
+            }
+            labels = data["labels"].tolist()
+        return cls(meta["origin_lat"], meta["cell_m"], partitions, labels)
+
+    # Queries -------------------------------------------------------------
+
+    def _partition_for(self, specialty: str | None) -> GridPartition | None:
+        return self.partitions.get(specialty or ALL)
+
+    def _box_candidates(
+        self, part: GridPartition, cx: int, cy: int, rx: int, ry: int, inner: tuple[int, int] | None = None
+    ) -> np.ndarray:
+        """Point positions in cells with |dx| <= rx and |dy| <= ry from (cx, cy), minus the `inner` box."""
+        if (2 * rx + 1) * (2 * ry + 1) <= len(part.cell_keys):
+            # Small neighbourhood: enumerate its cells and look them up.
+            xs = np.arange(cx - rx, cx + rx + 1, dtype=np.int64)
+            ys = np.arange(cy - ry, cy + ry + 1, dtype=np.int64)
+            gx, gy = np.meshgrid(xs, ys)
+            if inner is not None:
+                outside = (np.abs(gx - cx) > inner[0]) | (np.abs(gy - cy) > inner[1])
+                gx, gy = gx[outside], gy[outside]
+            keys = self._key(gx.ravel(), gy.ravel())
+            if not len(keys):
+                return np.empty(0, dtype=np.int64)
+            pos = np.minimum(np.searchsorted(part.cell_keys, keys), len(part.cell_keys) - 1)
+            hit = pos[part.cell_keys[pos] == keys]
+        else:
+            # Large neighbourhood: cheaper to filter the occupied cells.
+            dx = np.abs(part.cell_x - cx)
+            dy = np.abs(part.cell_y - cy)
+            mask = (dx <= rx) & (dy <= ry)
+            if inner is not None:
+                mask &= (dx > inner[0]) | (dy > inner[1])
+            hit = np.flatnonzero(mask)
+        if not len(hit):
+            return np.empty(0, dtype=np.int64)
+        starts = part.cell_starts[hit]
+        lengths = part.cell_starts[hit + 1] - starts
+        # Concatenated ranges starts[i]..starts[i] + lengths[i], without a Python loop.
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def _extent(self, part: GridPartition, cx: int, cy: int) -> tuple[int, int]:
+        return int(np.abs(part.cell_x - cx).max()), int(np.abs(part.cell_y - cy).max())
+
+    def _reach(self, lat: float, distance_m: float) -> tuple[int, int]:
+        """Cells to search in x and y so that every point within `distance_m` of `lat` is covered.
+
+        Grid y is metres of latitude, which a great-circle distance bounds directly.
+        Grid x uses the metres per degree of longitude at `origin_lat`, so the reach
+        in x is taken at the most poleward latitude the search can touch, where a
+        degree of longitude is shortest.
+        """
+        angle = distance_m / EARTH_RADIUS_M
+        ry = math.ceil(distance_m / self.cell_m * (1 + 1e-9))
+        cos_pole = math.cos(min(math.pi / 2, abs(math.radians(lat)) + angle))
+        if cos_pole <= math.sin(angle / 2):
+            return 1 << 30, ry  # the search reaches a pole: every longitude
+        dlon = math.degrees(2 * math.asin(math.sin(angle / 2) / cos_pole))
+        return math.ceil(dlon * self._m_per_deg_lon / self.cell_m * (1 + 1e-9)), ry
+
+    def nearest(self, lat: float, lon: float, k: int = 5, specialty: str | None = None) -> list[tuple[float, int]]:
+        """The `k` closest providers as `(distance_m, provider_index)`, nearest first."""
+        part = self._partition_for(specialty)
+        if part is None or not len(part.ids) or k <= 0:
+            return []
+        k = min(k, len(part.ids))
+        cx, cy = (int(v[0]) for v in self._cells(np.array([lat]), np.array([lon])))
+        max_x, max_y = self._extent(part, cx, cy)
+
+        # Grow the searched box geometrically until it holds k points...
+        positions = self._box_candidates(part, cx, cy, 0, 0)
+        rx = ry = radius = 0
+        while len(positions) < k:
+            radius = max(1, radius * 2)
+            grown = min(radius, max_x), min(radius, max_y)
+            positions = np.concatenate([positions, self._box_candidates(part, cx, cy, *grown, inner=(rx, ry))])
+            rx, ry = grown
+        dists = haversine_m(lat, lon, part.lats[positions], part.lons[positions])
+
+        # ...then widen it to cover the k-th distance in both directions.
+        kth = np.partition(dists, k - 1)[k - 1]
+        need_x, need_y = self._reach(lat, float(kth))
+        need = max(rx, min(need_x, max_x)), max(ry, min(need_y, max_y))
+        if need != (rx, ry):
+            extra = self._box_candidates(part, cx, cy, *need, inner=(rx, ry))
+            positions = np.concatenate([positions, extra])
+            dists = np.concatenate([dists, haversine_m(lat, lon, part.lats[extra], part.lons[extra])])
+
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top], kind="stable")]
+        return [(float(dists[i]), int(part.ids[positions[i]])) for i in top]
+
+    def within(self, lat: float, lon: float, radius_m: float, specialty: str | None = None) -> list[tuple[float, int]]:
+        """Providers within `radius_m` metres as `(distance_m, provider_index)`, nearest first."""
+        part = self._partition_for(specialty)
+        if part is None or not len(part.ids):
+            return []
+        cx, cy = (int(v[0]) for v in self._cells(np.array([lat]), np.array([lon])))
+        max_x, max_y = self._extent(part, cx, cy)
+        reach_x, reach_y = self._reach(lat, radius_m)
+        positions = self._box_candidates(part, cx, cy, min(reach_x, max_x), min(reach_y, max_y))
+        if not len(positions):
+            return []
+        dists = haversine_m(lat, lon, part.lats[positions], part.lons[positions])
+        inside = np.flatnonzero(dists <= radius_m)
+        inside = inside[np.argsort(dists[inside], kind="stable")]
+        return [(float(dists[i]), int(part.ids[positions[i]])) for i in inside]
+
+
+def default_paths() -> tuple[Path, Path]:
+    output_dir = Path(__file__).resolve().parent.parent / "output"
+    return output_dir / "cartilla_medica_geocoded.json", output_dir / "provider_spatial_index.npz"
+
+
+def main() -> int:
+    input_default, index_default = default_paths()
+    parser = argparse.ArgumentParser(description="Nearest-provider queries over the geocoded cartilla.")
+    parser.add_argument("--index", default=str(index_default), help="Index .npz path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from cartilla_medica_geocoded.json")
+    build.add_argument("input", nargs="?", default=str(input_default), help="Geocoded cartilla JSON")
+    build.add_argument("--cell-m", type=float, default=500.0, help="Grid cell size in metres")
+
+    for name, help_text in (("near", "k nearest providers"), ("within", "providers within a radius")):
+        query = sub.add_parser(name, help=help_text)
+        query.add_argument("lat", type=float)
+        query.add_argument("lon", type=float)
+        query.add_argument("--specialty", default=None, help="Exact specialty name to restrict to")
+        if name == "near":
+            query.add_argument("-k", type=int, default=5, help="Number of providers")
+        else:
+            query.add_argument("--radius", type=float, default=1000.0, help="Radius in metres")
+
+    args = parser.parse_args()
+    index_path = Path(args.index).expanduser().resolve()
+
+    if args.command == "build":
+        document = json.loads(Path(args.input).expanduser().read_text(encoding="utf-8"))
+        index = SpatialIndex.build(document.get("providers", []), cell_m=args.cell_m)
+        index.save(index_path)
+        print(f"Wrote {index_path}")
+        print(f"Indexed {len(index.partitions[ALL].ids)} providers in {len(index.partitions) - 1} specialties")
+        return 0
+
+    index = SpatialIndex.load(index_path)
+    if args.command == "near":
+        results = index.nearest(args.lat, args.lon, args.k, args.specialty)
+    else:
+        results = index.within(args.lat, args.lon, args.radius, args.specialty)
+    for distance, provider_index in results:
+        print(f"{distance:8.0f} m  {index.labels[provider_index]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+"""Adaptive ordering of geocoding query variants.
+
+`build_typed_query_variants` yields the same shapes of query for every
+provider, and the geocoder walks them in a fixed order until one resolves.
+The cache records how each shape fared for every address it was tried on,
+so the planner counts, per address pattern (avenue or street, with or without
+a number, CABA or another locality) and per variant shape, how often a lookup
+of that shape found something. The counts are conditional on the shapes
+before it having failed, which is the situation the planner decides in.
+
+`plan` then orders a provider's variants to cut the expected number of
+requests per resolved address: results already in the cache (free) come
+first, then uncached shapes by estimated success rate, and shapes that have
+practically never succeeded for the pattern are dropped. Rates for sparse
+patterns are shrunk towards the shape's overall rate.
+
+`simulate` replays addresses whose outcomes the cache already knows, under
+the fixed order and under a planner trained on the other addresses, and
+reports requests per success for both.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Callable, Iterable
+
+from address_rules import normalize_address, normalize_text
+from geocode_cache import fold_text
+
+
+CABA_LOCATIONS = {"caba", "ciudad autonoma de buenos aires", "ciudad de buenos aires", "capital federal"}
+AVENUE = re.compile(r"\bAvenida\b", re.IGNORECASE)
+DIGIT = re.compile(r"\d")
+
+Variant = tuple[str, str]
+# query -> (cached, result) as returned by GeocodeCache.get.
+Lookup = Callable[[str], "tuple[bool, dict | None]"]
+
+
+def address_pattern(provider: dict) -> str:
+    """Coarse shape of a provider's address, e.g. `avenue/caba` or `street/none`."""
+    address = normalize_address(provider.get("address"))
+    location = fold_text(normalize_text(provider.get("location")))
+    if not DIGIT.search(address):
+        street = "no_number"
+    elif AVENUE.search(address):
+        street = "avenue"
+    else:
+        street = "street"
+    if not location:
+        place = "none"
+    elif location in CABA_LOCATIONS:
+        place = "caba"
+    else:
+        place = "other"
+    return f"{street}/{place}"
+
+
+class QueryPlanner:
+    """Per-pattern success rates of query variant shapes, learned from cached outcomes."""
+
+    def __init__(self, prior_weight: float = 5.0, min_rate: float = 0.01, min_attempts: int = 30) -> None:
+        self.prior_weight = prior_weight
+        self.min_rate = min_rate
+        self.min_attempts = min_attempts
+        # (pattern, kind) and (None, kind) -> [attempts, successes]
+        self.stats: dict[tuple[str | None, str], list[int]] = {}
+
+    def observe(self, pattern: str, kind: str, success: bool) -> None:
+        for key in ((pattern, kind), (None, kind)):
+            counts = self.stats.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += success
+
+    def learn(self, samples: Iterable[tuple[str, list[Variant]]], lookup: Lookup) -> int:
+        """Count the cached outcome of each variant up to the first that resolved.
+
+        Returns how many addresses contributed at least one outcome.
+        """
+        learned = 0
+        for pattern, variants in samples:
+            seen = False
+            for kind, query in variants:
+                cached, result = lookup(query)
+                if not cached:
+                    break
+                seen = True
+                self.observe(pattern, kind, bool(result))
+                if result:
+                    break
+            learned += seen
+        return learned
+
+    def rate(self, pattern: str, kind: str) -> float:
+        attempts, successes = self.stats.get((None, kind), (0, 0))
+        overall = (successes + 1) / (attempts + 2)
+        attempts, successes = self.stats.get((pattern, kind), (0, 0))
+        return (successes + self.prior_weight * overall) / (attempts + self.prior_weight)
+
+    def pruned(self, pattern: str, kind: str) -> bool:
+        attempts = self.stats.get((None, kind), (0, 0))[0]
+        return attempts >= self.min_attempts and self.rate(pattern, kind) < self.min_rate
+
+    def plan(self, pattern: str, variants: list[Variant], lookup: Lookup | None = None) -> list[Variant]:
+        """Order `variants` for the fewest expected uncached requests.
+
+        Cached hits go first and cached misses last (both cost nothing); the
+        first variant is never dropped, so every address gets at least one try.
+        A shape with fewer than `min_attempts` observations never overtakes
+        the one before it: its rate was only seen after those had failed.
+        """
+        ranked = []
+        ceiling = 1.0
+        for position, (kind, query) in enumerate(variants):
+            cached, result = lookup(query) if lookup else (False, None)
+            if cached:
+                rank = 0 if result else 2
+                ranked.append((rank, 0.0, position, kind, query))
+                continue
+            if position and self.pruned(pattern, kind):
+                continue
+            rate = self.rate(pattern, kind)
+            if self.stats.get((None, kind), (0, 0))[0] < self.min_attempts:
+                rate = min(rate, ceiling)
+            ceiling = rate
+            ranked.append((1, -rate, position, kind, query))
+        ranked.sort()
+        return [(kind, query) for _, _, _, kind, query in ranked]
+
+    def summary(self) -> dict[str, dict[str, float | int]]:
+        """kind -> overall attempts, successes and smoothed rate."""
+        return {
+            kind: {"attempts": attempts, "successes": successes, "rate": round((successes + 1) / (attempts + 2), 4)}
+            for (pattern, kind), (attempts, successes) in sorted(self.stats.items(), key=lambda item: item[0][1])
+            if pattern is None
+        }
+
+
+def replay(variants: list[Variant], outcomes: dict[str, bool]) -> tuple[int, bool] | None:
+    """Requests spent and success when walking `variants`, or None if an outcome is unknown."""
+    requests = 0
+    for _, query in variants:
+        if query not in outcomes:
+            return None
+        requests += 1
+        if outcomes[query]:
+            return requests, True
+    return requests, False
+
+
+def simulate(samples: list[tuple[str, list[Variant]]], lookup: Lookup, holdout: float = 0.3, **planner_args) -> dict:
+    """Requests per success of the fixed order vs. a planner trained on the other addresses.
+
+    Addresses are split by a hash of their variants, so the split is stable
+    between runs; only addresses whose outcome both orders can replay from the
+    cache are scored.
+    """
+    train, test = [], []
+    for sample in samples:
+        bucket = zlib.crc32(sample[1][0][1].encode("utf-8")) % 1000 if sample[1] else 0
+        (test if bucket < holdout * 1000 else train).append(sample)
+    planner = QueryPlanner(**planner_args)
+    planner.learn(train, lookup)
+
+    totals = {"fixed": [0, 0], "planned": [0, 0]}
+    scored = skipped = 0
+    for pattern, variants in test:
+        outcomes = {}
+        for _, query in variants:
+            cached, result = lookup(query)
+            if cached:
+                outcomes[query] = bool(result)
+        runs = {"fixed": replay(variants, outcomes), "planned": replay(planner.plan(pattern, variants), outcomes)}
+        if None in runs.values():
+            skipped += 1
+            continue
+        scored += 1
+        for name, (requests, success) in runs.items():
+            totals[name][0] += requests
+            totals[name][1] += success
+
+    report = {"train_addresses": len(train), "scored_addresses": scored, "unscorable_addresses": skipped}
+    for name, (requests, successes) in totals.items():
+        report[name] = {
+            "requests": requests,
+            "successes": successes,
+            "requests_per_success": round(requests / successes, 3) if successes else None,
+        }
+    return report
+
+
+def format_simulation(report: dict) -> str:
+    fixed, planned = report["fixed"], report["planned"]
+    return (
+        f"{fixed['requests_per_success']} -> {planned['requests_per_success']} requests/success "
+        f"({fixed['requests']} -> {planned['requests']} requests, {fixed['successes']} -> {planned['successes']} "
+        f"resolved, {report['scored_addresses']} held-out addresses)"
+    )
@@ -0,0 +1 @@
+"""Helpers shared by the cartilla_medica and berlin_photo_guide scripts."""
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Check whether the PyMuPDF backend can replace poppler for a script's PDF.
+
+    python pipeline_common/check_pdf_backends.py Cartilla.pdf --parser cartilla --pages 1-40
+    python pipeline_common/check_pdf_backends.py Berlin.pdf --parser places
+
+Both backends' `-layout` page text is run through the script's own parser
+(`CartillaParser` for the cartilla, `parse_places_from_pages` for the Berlin
+guide), and the parsed providers or places are compared record by record.
+Whitespace is not squeezed away: the parsers split heading columns on runs of
+spaces and the guide's columns by character offset, so padding differences
+matter exactly as far as they change what is extracted. The page text
+comparison is still reported for context, followed by the first few
+differing records from each side. Exits with status 1 when more than
+`--max-mismatch` of the records differ, so it can gate switching a script's
+`--pdf-backend`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "cartilla_medica" / "scripts"), str(ROOT / "berlin_photo_guide" / "scripts")]
+from pipeline_common.pdf_backends import MuPdfBackend, PopplerBackend, resolve_backend_name  # noqa: E402
+from pipeline_common.pdf_text import LAYOUT  # noqa: E402
+
+
+def parse_cartilla(pages: list[str], first: int) -> list[dict]:
+    from extract_cartilla_medica import CartillaParser
+
+    parser = CartillaParser()
+    records = []
+    for page_number, text in enumerate(pages, start=first):
+        records.extend(parser.feed_page(page_number, text))
+    records.extend(parser.close())
+    return records
+
+
+def parse_places(pages: list[str], first: int) -> list[dict]:
+    from extract_places import parse_places_from_pages
+
+    return parse_places_from_pages(pages, first)
+
+
+PARSERS = {"cartilla": parse_cartilla, "places": parse_places}
+
+
+def parse_page_spec(spec: str | None, page_count: int) -> tuple[int, int]:
+    if not spec:
+        return 1, page_count
+    first, _, last = spec.partition("-")
+    return int(first), min(int(last or first), page_count)
+
+
+def record_lines(records: list[dict]) -> list[str]:
+    return [json.dumps(record, ensure_ascii=False, sort_keys=True) for record in records]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare what a script parses from poppler and PyMuPDF text.")
+    parser.add_argument("pdf", type=Path, help="PDF to compare on")
+    parser.add_argument("--parser", choices=sorted(PARSERS), required=True, help="Which script's parser to run")
+    parser.add_argument("--pages", default=None, help="Page range, e.g. 1-40 (default: all pages)")
+    parser.add_argument("--show", type=int, default=3, help="Print this many differing records")
+    parser.add_argument(
+        "--max-mismatch",
+        type=float,
+        default=0.0,
+        help="Fraction of parsed records allowed to differ before exiting 1 (default: 0)",
+    )
+    args = parser.parse_args()
+
+    resolve_backend_name("pymupdf")
+    mupdf = MuPdfBackend(args.pdf)
+    poppler = PopplerBackend(args.pdf)
+    first, last = parse_page_spec(args.pages, mupdf.doc.page_count)
+
+    expected_pages = poppler.page_range(first, last, LAYOUT)
+    actual_pages = mupdf.page_range(first, last, LAYOUT)
+    mupdf.close()
+    identical_pages = sum(want == got for want, got in zip(expected_pages, actual_pages))
+
+    parse = PARSERS[args.parser]
+    expected = record_lines(parse(expected_pages, first))
+    actual = record_lines(parse(actual_pages, first))
+    matcher = difflib.SequenceMatcher(None, expected, actual, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    mismatched = max(len(expected), len(actual)) - matched
+
+    print(f"pages {first}-{last}: {identical_pages} of {last - first + 1} with identical text")
+    print(
+        f"{args.parser}: {len(expected)} records from poppler, {len(actual)} from pymupdf, "
+        f"{mismatched} different"
+    )
+    if mismatched:
+        print("\n--- poppler / +++ pymupdf")
+        removed, added = [], []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                removed += expected[i1:i2]
+                added += actual[j1:j2]
+        for line in removed[: args.show]:
+            print(f"- {line}")
+        for line in added[: args.show]:
+            print(f"+ {line}")
+    total = max(len(expected), len(actual))
+    return 1 if total and mismatched / total > args.max_mismatch else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Stage timing, counters and subprocess tracing shared by the pipeline scripts.
+
+Scripts record into the process-wide `METRICS` and expose it through two
+flags added by `add_metrics_arguments`:
+
+    --metrics out.json   write the collected metrics as JSON on exit
+    --profile out.prof   run the whole script under cProfile and dump the stats
+                         (inspect with `python -m pstats out.prof`)
+
+Recording is always on; it is cheap (a lock and a few clock reads per event),
+so the scripts never branch on whether metrics were requested.
+
+What is recorded:
+
+* stages: calls, wall seconds and process CPU seconds per `with METRICS.stage(name)`
+  block. Stages may nest; each is measured on its own, so nested totals overlap.
+  CPU time is for the whole process, so it includes other threads.
+* subprocesses: calls, failures, total and max wall seconds per program, for
+  commands run through `METRICS.run` or traced with `METRICS.subprocess`.
+  Their CPU time is reported in aggregate as `children_cpu_s`.
+* bytes read and written, as reported by the scripts.
+* counters, histograms (value -> count) and samples (reported as count, mean,
+  p50, p95 and max).
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: dict[str, dict] = {}
+            self.subprocesses: dict[str, dict] = {}
+            self.counters: Counter = Counter()
+            self.histograms: dict[str, Counter] = {}
+            self.samples: dict[str, list[float]] = {}
+            self.bytes = {"read": 0, "written": 0}
+            self._started = time.perf_counter()
+            self._cpu_started = time.process_time()
+
+    # Recording -----------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                entry["calls"] += 1
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+
+    @contextmanager
+    def subprocess(self, cmd: list[str]) -> Iterator[None]:
+        """Trace a subprocess the caller drives itself (e.g. a streamed Popen)."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._record_subprocess(cmd, time.perf_counter() - start, failed)
+
+    def run(self, cmd: list[str], **kwargs) -> subprocess.CompletedProcess:
+        """`subprocess.run` with the call traced; stdout captured with `capture_output`/`stdout=PIPE` counts as read."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = subprocess.run(cmd, **kwargs)
+            failed = result.returncode != 0
+        finally:
+            self._record_subprocess(cmd, time.perf_counter() - start, failed)
+        if isinstance(result.stdout, (bytes, str)):
+            self.add_bytes("read", len(result.stdout))
+        return result
+
+    def _record_subprocess(self, cmd: list[str], seconds: float, failed: bool) -> None:
+        program = os.path.basename(str(cmd[0]))
+        with self._lock:
+            entry = self.subprocesses.setdefault(program, {"calls": 0, "failures": 0, "wall_s": 0.0, "max_s": 0.0})
+            entry["calls"] += 1
+            entry["failures"] += int(failed)
+            entry["wall_s"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+
+    def add_bytes(self, direction: str, count: int) -> None:
+        with self._lock:
+            self.bytes[direction] += count
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def histogram(self, name: str, value) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, Counter())[value] += 1
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Observe the wall time of the block, in seconds, as a sample of `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # Reporting -----------------------------------------------------------
+
+    def report(self) -> dict:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with self._lock:
+            samples = {}
+            for name, values in self.samples.items():
+                ordered = sorted(values)
+                samples[name] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+                    "p50": percentile(ordered, 0.50),
+                    "p95": percentile(ordered, 0.95),
+                    "max": ordered[-1] if ordered else 0.0,
+                }
+            return {
+                "script": Path(sys.argv[0]).name,
+                "argv": sys.argv[1:],
+                "wall_s": time.perf_counter() - self._started,
+                "cpu_s": time.process_time() - self._cpu_started,
+                "children_cpu_s": children.ru_utime + children.ru_stime,
+                "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "subprocesses": {name: dict(entry) for name, entry in self.subprocesses.items()},
+                "bytes": dict(self.bytes),
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: {str(key): count for key, count in sorted(counts.items(), key=lambda kv: str(kv[0]))}
+                    for name, counts in self.histograms.items()
+                },
+                "samples": samples,
+            }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        tmp_path.replace(path)
+
+
+METRICS = Metrics()
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        metavar="PATH",
+        help="Write per-stage timings, subprocess durations, byte counts and counters to this JSON file",
+    )
+    parser.add_argument("--profile", default=None, metavar="PATH", help="Dump cProfile stats for the run to this file")
+
+
+@contextmanager
+def metrics_session(args: argparse.Namespace) -> Iterator[Metrics]:
+    """Profile the block if `--profile` was given and write `--metrics` when it exits, even on error."""
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield METRICS
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.metrics:
+            METRICS.write(Path(args.metrics).expanduser())
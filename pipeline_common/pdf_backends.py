@@ -0,0 +1,307 @@
+"""PDF access backends: poppler subprocesses or an in-process PyMuPDF document.
+
+Both expose the same small interface, used through `PdfTextLayer`:
+
+    backend = open_backend("poppler", pdf_path)
+    backend.info()                          # pdfinfo-style "Key: value" text
+    backend.iter_pages(("-layout",))        # page texts, as `pdftotext ... -` split on form feeds
+    backend.page_range(first, last, flags)  # pages first..last (1-based, inclusive)
+    backend.extract_images(pages, prefix)   # writes <prefix>-PPP-NNN.ext like `pdfimages -p`
+    backend.image_digests(pages, native)    # {page: sha256 of the page's embedded images}
+    backend.close()
+
+`PopplerBackend` spawns pdftotext/pdfinfo/pdfimages for every call.
+`MuPdfBackend` opens the document once and serves pages and embedded images
+lazily, so fetching one page or the images of a few pages costs no process
+start or full-document decode. Its `-layout` text is only rebuilt from word
+positions on a character grid like pdftotext's, and both parsers depend on
+that whitespace (heading columns split on runs of spaces, the Berlin guide's
+columns by character offset), so poppler is the default and PyMuPDF is
+opt-in (pip install pymupdf): check_pdf_backends.py compares what the
+parsers extract from a PDF under each backend before switching.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import os
+import re
+import statistics
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from pipeline_common.metrics import METRICS
+
+try:
+    import pymupdf
+except ImportError:  # PyMuPDF < 1.24 only ships the `fitz` name.
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+BACKENDS = ("poppler", "pymupdf")
+
+
+def resolve_backend_name(name: str) -> str:
+    if name == "pymupdf" and pymupdf is None:
+        raise RuntimeError("The pymupdf PDF backend needs PyMuPDF: pip install pymupdf")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return name
+
+
+def open_backend(name: str, pdf_path: Path):
+    name = resolve_backend_name(name)
+    return MuPdfBackend(pdf_path) if name == "pymupdf" else PopplerBackend(pdf_path)
+
+
+def images_digest(paths: Iterable[str | Path]) -> str:
+    """sha256 over the sha256 of each file, in file name order (`-NNN` is the image's order on the page)."""
+    digest = hashlib.sha256()
+    for path in sorted(paths, key=lambda p: os.path.basename(p)):
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+# Poppler -------------------------------------------------------------------
+
+
+def stream_pdftotext(pdf_path: Path, flags: Iterable[str] = ("-layout",), chunk_size: int = 1 << 16) -> Iterator[str]:
+    """Yield pdftotext pages as they are produced, without buffering the whole text."""
+    cmd = ["pdftotext", *flags, str(pdf_path), "-"]
+    with METRICS.subprocess(cmd):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+        pending = ""
+        try:
+            while True:
+                # Time spent blocked on pdftotext, as opposed to parsing what it already produced.
+                with METRICS.stage("pdftotext_read_wait"):
+                    chunk = proc.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                METRICS.add_bytes("read", len(chunk))
+                pending += decoder.decode(chunk)
+                *pages, pending = pending.split("\f")
+                yield from pages
+            yield pending + decoder.decode(b"", final=True)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, proc.args)
+
+
+class PopplerBackend:
+    name = "poppler"
+    # image_digests() hashes extract_images() output, so extracted files give the digest for free.
+    digests_extracted_images = True
+
+    def __init__(self, pdf_path: Path) -> None:
+        self.pdf_path = pdf_path
+
+    def _output(self, cmd: list[str]) -> str:
+        return METRICS.run(cmd, check=True, stdout=subprocess.PIPE).stdout.decode("utf-8", "ignore")
+
+    def info(self) -> str:
+        return self._output(["pdfinfo", str(self.pdf_path)])
+
+    def iter_pages(self, flags: Iterable[str] = ("-layout",)) -> Iterator[str]:
+        return stream_pdftotext(self.pdf_path, flags)
+
+    def page_range(self, first: int, last: int, flags: Iterable[str] = ("-layout",)) -> list[str]:
+        text = self._output(["pdftotext", *flags, "-f", str(first), "-l", str(last), str(self.pdf_path), "-"])
+        # Every page ends in a form feed; drop the empty tail after the last one.
+        return text.split("\f")[: last - first + 1]
+
+    def extract_images(self, pages: Iterable[int], prefix: str, jobs: int = 4, native: bool = False) -> None:
+        fmt = "-all" if native else "-png"
+
+        def extract_page(page):
+            cmd = ["pdfimages", fmt, "-p", "-f", str(page), "-l", str(page), str(self.pdf_path), prefix]
+            METRICS.run(cmd, check=True)
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            list(pool.map(extract_page, sorted(set(pages))))
+
+    def image_digests(self, pages: Iterable[int], jobs: int = 4, native: bool = False) -> dict[int, str]:
+        """`images_digest` per page of what `extract_images` writes for it with the same `native`.
+
+        Poppler has no cheaper way to read embedded image bytes, so the digest
+        is defined over the extraction output: files already extracted for a
+        page hash to the same value without another `pdfimages` run.
+        """
+
+        def digest_page(page):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                self.extract_images([page], os.path.join(tmpdir, "img"), jobs=1, native=native)
+                return page, images_digest(os.path.join(tmpdir, name) for name in os.listdir(tmpdir))
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            return dict(pool.map(digest_page, sorted(set(pages))))
+
+    def close(self) -> None:
+        pass
+
+
+# PyMuPDF -------------------------------------------------------------------
+
+INFO_KEYS = [
+    ("Title", "title"),
+    ("Subject", "subject"),
+    ("Keywords", "keywords"),
+    ("Author", "author"),
+    ("Creator", "creator"),
+    ("Producer", "producer"),
+    ("CreationDate", "creationDate"),
+    ("ModDate", "modDate"),
+]
+
+
+PDF_DATE_RE = re.compile(r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?(Z|[+-]\d{2})?")
+
+
+def format_pdf_date(value: str) -> str:
+    """`D:20240312150405-03'00'` -> `Tue Mar 12 15:04:05 2024 -03`, as pdfinfo prints it."""
+    match = PDF_DATE_RE.match(value)
+    if not match:
+        return value
+    year, month, day, hour, minute, second, zone = match.groups()
+    try:
+        stamp = datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return value
+    text = f"{stamp:%a %b} {stamp.day:2d} {stamp:%H:%M:%S %Y}"
+    if zone:
+        text += " UTC" if zone == "Z" else f" {zone}"
+    return text
+
+
+class MuPdfBackend:
+    name = "pymupdf"
+    digests_extracted_images = False
+
+    def __init__(self, pdf_path: Path) -> None:
+        self.pdf_path = pdf_path
+        with METRICS.stage("pymupdf_open"):
+            self.doc = pymupdf.open(str(pdf_path))
+
+    def info(self) -> str:
+        metadata = self.doc.metadata or {}
+        lines = []
+        for label, key in INFO_KEYS:
+            value = metadata.get(key)
+            if value:
+                if key.endswith("Date"):
+                    value = format_pdf_date(value)
+                lines.append(f"{label + ':':<16}{value}")
+        lines.append(f"{'Pages:':<16}{self.doc.page_count}")
+        return "\n".join(lines) + "\n"
+
+    def page_text(self, index: int, layout: bool = True) -> str:
+        """Text of page `index` (0-based), ending in a newline like pdftotext's."""
+        with METRICS.stage("pymupdf_text"):
+            page = self.doc.load_page(index)
+            if not layout:
+                return page.get_text("text")
+            return layout_text(page.get_text("words"))
+
+    def iter_pages(self, flags: Iterable[str] = ("-layout",)) -> Iterator[str]:
+        layout = "-layout" in flags
+        for index in range(self.doc.page_count):
+            yield self.page_text(index, layout)
+        # pdftotext ends every page with a form feed, so splitting its output leaves an empty tail.
+        yield ""
+
+    def page_range(self, first: int, last: int, flags: Iterable[str] = ("-layout",)) -> list[str]:
+        layout = "-layout" in flags
+        return [self.page_text(index, layout) for index in range(first - 1, min(last, self.doc.page_count))]
+
+    def extract_images(self, pages: Iterable[int], prefix: str, jobs: int = 4, native: bool = False) -> None:
+        # A document handle is not thread-safe, and decoding embedded images is cheap
+        # next to pdfimages' process start, so pages are handled in turn.
+        number = 0
+        for page_number in sorted(set(pages)):
+            if not 1 <= page_number <= self.doc.page_count:
+                continue
+            with METRICS.stage("pymupdf_images"):
+                for image in self.doc.load_page(page_number - 1).get_images(full=True):
+                    xref, smask = image[0], image[1]
+                    path = f"{prefix}-{page_number:03d}-{number:03d}"
+                    number += 1
+                    if native and not smask:
+                        extracted = self.doc.extract_image(xref)
+                        data, ext = extracted["image"], extracted["ext"]
+                    else:
+                        pixmap = pymupdf.Pixmap(self.doc, xref)
+                        if smask:
+                            pixmap = pymupdf.Pixmap(pixmap, pymupdf.Pixmap(self.doc, smask))
+                        if pixmap.n - pixmap.alpha >= 4:  # CMYK and friends: PNG needs RGB.
+                            pixmap = pymupdf.Pixmap(pymupdf.csRGB, pixmap)
+                        data, ext = pixmap.tobytes("png"), "png"
+                    with open(f"{path}.{ext}", "wb") as f:
+                        f.write(data)
+                    METRICS.add_bytes("written", len(data))
+
+    def image_digests(self, pages: Iterable[int], jobs: int = 4, native: bool = False) -> dict[int, str]:
+        """sha256 per page over its images' raw xref streams (and soft masks), without decoding them."""
+        digests = {}
+        for page_number in sorted(set(pages)):
+            if not 1 <= page_number <= self.doc.page_count:
+                continue
+            digest = hashlib.sha256()
+            with METRICS.stage("pymupdf_images"):
+                for image in self.doc.load_page(page_number - 1).get_images(full=True):
+                    for xref in image[:2]:
+                        if xref:
+                            digest.update(hashlib.sha256(self.doc.xref_stream_raw(xref)).digest())
+            digests[page_number] = digest.hexdigest()
+        return digests
+
+    def close(self) -> None:
+        self.doc.close()
+
+
+def layout_text(words: list[tuple]) -> str:
+    """Lay out `page.get_text("words")` on a character grid, the way `pdftotext -layout` does.
+
+    Words are grouped into rows by vertical overlap, the grid pitch is the
+    median character width on the page, and each word starts at the column
+    nearest its left edge measured from the leftmost word on the page (at
+    least one space after the previous word).
+    Vertical gaps of more than one line become blank lines.
+    """
+    if not words:
+        return ""
+    char_width = statistics.median((w[2] - w[0]) / len(w[4]) for w in words if w[4]) or 1.0
+    line_height = statistics.median(w[3] - w[1] for w in words) or 1.0
+    left = min(w[0] for w in words)
+
+    rows: list[list[tuple]] = []
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        middle = (word[1] + word[3]) / 2
+        if rows and middle - rows[-1][0] <= line_height / 2:
+            rows[-1][1].append(word)
+        else:
+            rows.append((middle, [word]))
+
+    lines = []
+    previous_middle = None
+    for middle, row in rows:
+        if previous_middle is not None:
+            blank = round((middle - previous_middle) / line_height) - 1
+            lines.extend([""] * min(max(blank, 0), 2))
+        previous_middle = middle
+        line = ""
+        for word in sorted(row, key=lambda w: w[0]):
+            column = round((word[0] - left) / char_width)
+            line += " " * (max(column - len(line), 1) if line else column) + word[4]
+        lines.append(line)
+    return "\n".join(lines) + "\n"
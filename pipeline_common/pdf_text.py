@@ -0,0 +1,282 @@
+"""Cached PDF page text and pdfinfo, keyed by PDF content hash, backend and flags.
+
+`PdfTextLayer.pages()` returns the pages of a PDF as a `PageStore`. The first
+run for a given PDF, backend and pdftotext flag set streams the backend's
+pages (see pdf_backends.py) and tees them into the cache; later runs, from
+any script, memory-map the cached file and decode only the pages they touch:
+
+    layer = PdfTextLayer.from_args(args)
+    pages = layer.pages(pdf_path)            # PageStore or list of str
+    for text in pages[20:40]: ...
+
+A cached page file is the UTF-8 page texts back to back, followed by a table of
+`page_count + 1` little-endian uint64 offsets, the page count, and an 8-byte
+magic. The table sits at the end so the file can be written while the backend
+is still producing pages. Pages are what `text.split("\\f")` gives for the full
+output, so the last entry is whatever follows the final form feed (normally
+an empty string), exactly as the scripts saw before.
+
+PDF content hashes are memoised by path, size, mtime and inode in
+`hashes.json`, so an unchanged PDF is not re-read just to be hashed. Delete
+the cache directory (default ~/.cache/pdf_text, or $PDF_TEXT_CACHE) to drop
+everything.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from pipeline_common.metrics import METRICS
+from pipeline_common.pdf_backends import BACKENDS, open_backend, resolve_backend_name
+
+MAGIC = b"PDFTXT01"
+TRAILER = struct.Struct("<Q8s")
+OFFSET = struct.Struct("<Q")
+LAYOUT = ("-layout",)
+
+
+def default_cache_dir() -> Path:
+    if os.environ.get("PDF_TEXT_CACHE"):
+        return Path(os.environ["PDF_TEXT_CACHE"]).expanduser()
+    base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "pdf_text"
+
+
+class PageStore:
+    """Read-only, memory-mapped view of a cached page file; pages decode on access."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._map)
+        if size < TRAILER.size:
+            raise ValueError(f"{path} is not a page cache file")
+        count, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        table_start = size - TRAILER.size - (count + 1) * OFFSET.size
+        if magic != MAGIC or table_start < 0:
+            raise ValueError(f"{path} is not a page cache file")
+        self._count = count
+        self._table_start = table_start
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _page(self, index: int) -> str:
+        start, end = struct.unpack_from("<2Q", self._map, self._table_start + index * OFFSET.size)
+        return self._map[start:end].decode("utf-8")
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._page(i) for i in range(*key.indices(self._count))]
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("page index out of range")
+        return self._page(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self._page(index)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def _tee_to_file(pages: Iterable[str], dest: Path) -> Iterator[str]:
+    """Yield `pages` while writing them to `dest` in the page cache format.
+
+    The file only appears once every page has been written; an interrupted run
+    leaves nothing behind.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, prefix=dest.name, suffix=".tmp")
+    offsets = [0]
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for page in pages:
+                data = page.encode("utf-8")
+                out.write(data)
+                offsets.append(offsets[-1] + len(data))
+                yield page
+            out.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+            out.write(TRAILER.pack(len(offsets) - 1, MAGIC))
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, dest)
+        METRICS.add_bytes("written", offsets[-1])
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+class PdfTextLayer:
+    """Page text, pdfinfo and images from a PDF backend, with an optional on-disk text cache.
+
+    `cache_dir=None` disables the cache. `backend` is a name from
+    `pdf_backends.BACKENDS`; one backend instance is kept open per PDF.
+    """
+
+    def __init__(self, cache_dir: Path | None = None, backend: str = "poppler") -> None:
+        self.cache_dir = cache_dir
+        self.backend_name = resolve_backend_name(backend)
+        self._lock = threading.Lock()
+        self._hashes: dict[str, str] = {}
+        self._backends: dict[str, object] = {}
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "PdfTextLayer":
+        cache_dir = None
+        if not args.no_text_cache:
+            cache_dir = Path(args.text_cache).expanduser() if args.text_cache else default_cache_dir()
+        return cls(cache_dir, args.pdf_backend)
+
+    def __getstate__(self):
+        return {"cache_dir": self.cache_dir, "backend": self.backend_name}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["backend"])
+
+    def backend(self, pdf_path: Path):
+        key = os.path.abspath(pdf_path)
+        with self._lock:
+            if key not in self._backends:
+                self._backends[key] = open_backend(self.backend_name, pdf_path)
+            return self._backends[key]
+
+    def close(self) -> None:
+        with self._lock:
+            for backend in self._backends.values():
+                backend.close()
+            self._backends.clear()
+
+    # Keys ----------------------------------------------------------------
+
+    def content_hash(self, pdf_path: Path) -> str:
+        stat = os.stat(pdf_path)
+        memo_key = f"{os.path.abspath(pdf_path)}|{stat.st_size}|{stat.st_mtime_ns}|{stat.st_ino}"
+        memo_path = self.cache_dir / "hashes.json"
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+            try:
+                memo = json.loads(memo_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                memo = {}
+            if memo_key in memo:
+                self._hashes[memo_key] = memo[memo_key]
+                return memo[memo_key]
+            with METRICS.stage("hash_pdf"):
+                digest = hashlib.sha256()
+                with open(pdf_path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+            memo[memo_key] = digest.hexdigest()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = memo_path.with_name(f"{memo_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(memo, indent=1, sort_keys=True), encoding="utf-8")
+            tmp_path.replace(memo_path)
+            self._hashes[memo_key] = memo[memo_key]
+            return memo[memo_key]
+
+    def _entry(self, pdf_path: Path, kind: str, flags: Iterable[str] = ()) -> Path:
+        content = self.content_hash(pdf_path)
+        # Backends lay text out differently, so each gets its own entries.
+        flag_key = hashlib.sha256("\0".join([self.backend_name, *flags]).encode("utf-8")).hexdigest()[:12]
+        return self.cache_dir / content[:2] / f"{content}.{kind}.{flag_key}"
+
+    def is_cached(self, pdf_path: Path, flags: Iterable[str] = LAYOUT) -> bool:
+        return self.cache_dir is not None and self._entry(pdf_path, "pages", tuple(flags)).exists()
+
+    def store_pages(self, pdf_path: Path, pages: Iterable[str], flags: Iterable[str] = LAYOUT) -> None:
+        """Cache pages obtained elsewhere (e.g. from parallel page-range extraction)."""
+        if self.cache_dir is None:
+            return
+        for _ in _tee_to_file(pages, self._entry(pdf_path, "pages", tuple(flags))):
+            pass
+
+    # Queries -------------------------------------------------------------
+
+    def iter_pages(self, pdf_path: Path, flags: Iterable[str] = LAYOUT) -> Iterator[str]:
+        """Yield pages in order: from the cache if present, else from the backend while filling it."""
+        flags = tuple(flags)
+        if self.cache_dir is None:
+            yield from self.backend(pdf_path).iter_pages(flags)
+            return
+        entry = self._entry(pdf_path, "pages", flags)
+        if entry.exists():
+            METRICS.count("text_cache_hits")
+            store = PageStore(entry)
+            try:
+                yield from store
+            finally:
+                store.close()
+            return
+        METRICS.count("text_cache_misses")
+        yield from _tee_to_file(self.backend(pdf_path).iter_pages(flags), entry)
+
+    def pages(self, pdf_path: Path, flags: Iterable[str] = LAYOUT):
+        """All pages, as a memory-mapped `PageStore` when cached (a list otherwise)."""
+        flags = tuple(flags)
+        if self.cache_dir is None:
+            return list(self.backend(pdf_path).iter_pages(flags))
+        entry = self._entry(pdf_path, "pages", flags)
+        if not entry.exists():
+            for _ in self.iter_pages(pdf_path, flags):
+                pass
+        else:
+            METRICS.count("text_cache_hits")
+        return PageStore(entry)
+
+    def page_range(self, pdf_path: Path, first: int, last: int, flags: Iterable[str] = LAYOUT) -> list[str]:
+        """Pages `first..last` (1-based, inclusive); served from the cache when present."""
+        flags = tuple(flags)
+        if self.cache_dir is not None:
+            entry = self._entry(pdf_path, "pages", flags)
+            if entry.exists():
+                store = PageStore(entry)
+                try:
+                    return store[first - 1 : last]
+                finally:
+                    store.close()
+        return self.backend(pdf_path).page_range(first, last, flags)
+
+    def pdfinfo(self, pdf_path: Path) -> str:
+        """`pdfinfo`-style "Key: value" lines."""
+        entry = self._entry(pdf_path, "pdfinfo") if self.cache_dir is not None else None
+        if entry is not None and entry.exists():
+            return entry.read_text(encoding="utf-8")
+        text = self.backend(pdf_path).info()
+        if entry is not None:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            tmp_path.replace(entry)
+        return text
+
+
+def add_text_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--text-cache",
+        default=None,
+        metavar="DIR",
+        help="Directory for cached pdftotext/pdfinfo output (default: $PDF_TEXT_CACHE or ~/.cache/pdf_text)",
+    )
+    parser.add_argument("--no-text-cache", action="store_true", help="Always extract text and pdfinfo afresh")
+    parser.add_argument(
+        "--pdf-backend",
+        choices=BACKENDS,
+        default="poppler",
+        help=(
+            "poppler subprocesses (default) or in-process PyMuPDF, whose layout text is approximate: "
+            "run pipeline_common/check_pdf_backends.py on the PDF before switching"
+        ),
+    )